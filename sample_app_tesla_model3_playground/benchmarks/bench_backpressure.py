@@ -0,0 +1,148 @@
+"""bench_backpressure summary
+Soak test of the sample buffer (moco_buffer.py) between the subscriber and
+a slow application thread. The fake Moco engine sends updates at --ratio
+times the rate the application can process samples. For every buffer policy
+the sample application runs the thread subscriber in a child process, the
+application takes the samples from the buffer and runs the range
+calculation, sleeping --cost ms per sample.
+Reported are the samples processed per second, the samples waiting in the
+buffer, the dropped and spilled samples, the time the subscriber was
+blocked and the resident memory (RSS) after the warm up and at the end. An
+unbounded buffer is shown for comparison: its memory grows for as long as
+the application is behind, with all other policies it stays flat.
+
+Usage: python bench_backpressure.py [--cost MS] [--ratio N] [--duration S]
+                                    [--policies POLICY ...]
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(BENCHMARK_DIR, "..", "src"))
+
+from bench_subscriber import import_sample_app
+from fake_moco_engine import make_certificate
+
+UNBOUNDED = "unbounded"
+
+
+def rss_mb():
+    """Current resident memory of this process in MB"""
+    with open("/proc/self/statm") as statm:
+        return int(statm.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 1e6
+
+
+def run_child(policy, cost, port, certfile, duration, warmup=3.0):
+    """Run one policy and print the results as a JSON line"""
+    app = import_sample_app("127.0.0.1", port, certfile)
+    from range_calculation import RangeCalculation
+
+    if policy == UNBOUNDED:
+        # A capacity that is never reached, as an unbounded queue
+        app.BUFFER_SAMPLES_POLICY, app.BUFFER_SAMPLES_CAPACITY = "drop_oldest", 10 ** 9
+    else:
+        app.BUFFER_SAMPLES_POLICY = policy
+    samples = app.create_sample_buffer()
+    calculation = RangeCalculation(report=lambda message: None)
+    sample = app.signal_store.snapshot()
+    threading.Thread(target=app.get_signals, args=("127.0.0.1", port, app.subscription_list),
+                     daemon=True).start()
+
+    metrics = app.metrics
+
+    def counts():
+        return (metrics.samples_dropped.value, metrics.samples_spilled.value,
+                metrics.subscriber_blocked.value)
+
+    start = time.perf_counter()
+    measuring = False
+    processed = 0
+    while True:
+        now = time.perf_counter()
+        if not measuring and now - start > warmup:
+            measuring = True
+            start = now
+            start_rss = rss_mb()
+            start_counts = counts()
+            processed = 0
+        elif measuring and now - start > duration:
+            break
+        if not len(samples):
+            app.tcp_signal_update.wait(0.5)
+        for row in samples.take(1):
+            sample.values[:] = row
+            calculation.update(sample)
+            time.sleep(cost)
+            processed += 1
+    wall = time.perf_counter() - start
+    dropped, spilled, blocked = [now - before for now, before in zip(counts(), start_counts)]
+    result = {
+        "policy": policy,
+        "processed_per_second": processed / wall,
+        "buffered": len(samples),
+        "dropped": dropped,
+        "spilled": spilled,
+        "blocked_s": blocked,
+        "start_rss_mb": start_rss,
+        "end_rss_mb": rss_mb(),
+        "spill_mb": samples.spill_bytes / 1e6,
+    }
+    print(json.dumps(result), flush=True)
+    # The subscriber thread doesn't stop by itself
+    os._exit(0)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Soak test of the sample buffer policies")
+    parser.add_argument("--cost", type=float, default=10.0, help="processing time per sample in ms")
+    parser.add_argument("--ratio", type=float, default=10.0, help="engine rate as multiple of the consumer rate")
+    parser.add_argument("--duration", type=float, default=20.0, help="measurement time per policy")
+    parser.add_argument("--policies", nargs="*",
+                        default=[UNBOUNDED, "keep_latest", "drop_oldest", "block", "spill"])
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    parser.add_argument("--port", type=int, help=argparse.SUPPRESS)
+    parser.add_argument("--cert", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        run_child(args.child, args.cost / 1000, args.port, args.cert, args.duration)
+        return
+
+    rate = args.ratio * 1000 / args.cost
+    certfile, keyfile = make_certificate()
+    print(f"engine {rate:.0f} updates/s, application {1000 / args.cost:.0f} samples/s\n")
+    print(f"{'policy':<13}{'samples/s':>10}{'buffered':>10}{'dropped':>9}{'spilled':>9}{'blocked s':>10}"
+          f"{'RSS start MB':>14}{'RSS end MB':>12}{'spill MB':>10}")
+    for policy in args.policies:
+        # A new engine per policy, the block policy leaves unsent data in
+        # the send buffer of the engine
+        engine = subprocess.Popen([sys.executable, os.path.join(BENCHMARK_DIR, "fake_moco_engine.py"),
+                                   "--rate", str(rate), "--cert", certfile, "--key", keyfile],
+                                  stdout=subprocess.PIPE, text=True)
+        try:
+            port = int(engine.stdout.readline())
+            child = subprocess.run(
+                [sys.executable, os.path.abspath(__file__), "--child", policy, "--cost", str(args.cost),
+                 "--port", str(port), "--cert", certfile, "--duration", str(args.duration)],
+                stdout=subprocess.PIPE, text=True)
+        finally:
+            engine.terminate()
+            engine.wait()
+        lines = [line for line in child.stdout.splitlines() if line.startswith("{")]
+        if not lines:
+            print(f"{policy:<13} failed")
+            continue
+        result = json.loads(lines[-1])
+        print(f"{policy:<13}{result['processed_per_second']:>10.1f}{result['buffered']:>10}{result['dropped']:>9}"
+              f"{result['spilled']:>9}{result['blocked_s']:>10.1f}{result['start_rss_mb']:>14.1f}"
+              f"{result['end_rss_mb']:>12.1f}{result['spill_mb']:>10.1f}")
+
+
+if __name__ == '__main__':
+    main()
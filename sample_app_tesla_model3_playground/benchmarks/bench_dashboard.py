@@ -0,0 +1,52 @@
+"""bench_dashboard summary
+Cost of the live dashboard (moco_dashboard.py). Reported are the time the
+application thread spends per logged sample (LiveDashboard.append, a put in
+the queue of the drawing process) and the time of the LTTB downsampling
+done in the drawing process, for increasing numbers of samples.
+
+Usage: python bench_dashboard.py [--samples N]
+"""
+
+import argparse
+import math
+import os
+import sys
+import tempfile
+import time
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(BENCHMARK_DIR, "..", "src"))
+
+from moco_dashboard import LiveDashboard, lttb
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Live dashboard benchmark")
+    parser.add_argument("--samples", type=int, default=5000, help="samples appended to the dashboard")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        dashboard = LiveDashboard(os.path.join(directory, "dashboard.png"), fps=2.0).start()
+        rows = [(0.1 * i, 50 + 20 * math.sin(i / 100), 80 - i / 1000, 0.0, 300 - i / 100, i / 100)
+                for i in range(args.samples)]
+        start = time.perf_counter()
+        for row in rows:
+            dashboard.append(row)
+        append_time = (time.perf_counter() - start) / len(rows)
+        start = time.perf_counter()
+        dashboard.close()
+        close_time = time.perf_counter() - start
+        print(f"append {1e6 * append_time:.2f} us/sample, {dashboard.dropped} dropped, "
+              f"final frame after {1000 * close_time:.0f} ms")
+
+    print(f"{'samples':>10}{'LTTB to 1000 points ms':>26}")
+    for count in (2000, 20000, 200000):
+        times = [0.1 * i for i in range(count)]
+        values = [50 + 20 * math.sin(i / 100) for i in range(count)]
+        start = time.perf_counter()
+        lttb(times, values, 1000)
+        print(f"{count:>10}{1000 * (time.perf_counter() - start):>26.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,79 @@
+"""bench_decoder summary
+Decoding time per message of the FrameDecoder, for every installed JSON
+backend (orjson, ujson, json) with and without the fast path for signal
+messages. The messages are generated from the simulated drive of the fake
+Moco engine, or read from a file with one recorded message per line.
+
+Usage: python bench_decoder.py [--messages N] [--repeat R] [file]
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(BENCHMARK_DIR, "..", "src"))
+
+from fake_moco_engine import DriveSimulation, SUPPORTED_SIGNALS
+from moco_decoder import FrameDecoder, JSON_BACKENDS
+
+
+def generate_frames(count):
+    """Signal messages of the simulated drive, as sent by the fake engine"""
+    simulation = DriveSimulation()
+    frames = []
+    while len(frames) < count:
+        values = simulation.tick(0.1)
+        for name in SUPPORTED_SIGNALS:
+            frames.append(json.dumps({"N": name, "V": values[name]}).encode("utf-8"))
+    # A reply among the signal messages, as in a real stream
+    frames[len(frames) // 2] = b'{"REP":"sync"}'
+    return frames[:count]
+
+
+def read_frames(filename):
+    with open(filename, "rb") as frame_file:
+        return [line.rstrip(b"\r\n") for line in frame_file if line.strip()]
+
+
+def bench(decoder, frames, repeat):
+    """Best time over repeat runs, in nanoseconds per message"""
+    decode = decoder.decode
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter_ns()
+        for frame in frames:
+            decode(frame)
+        best = min(best, time.perf_counter_ns() - start)
+    return best / len(frames)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Message decoder benchmark")
+    parser.add_argument("file", nargs="?", help="file with one recorded message per line")
+    parser.add_argument("--messages", type=int, default=100000, help="number of generated messages")
+    parser.add_argument("--repeat", type=int, default=5, help="runs per decoder, the best run is reported")
+    args = parser.parse_args()
+
+    frames = read_frames(args.file) if args.file else generate_frames(args.messages)
+    # Both paths must give the same results as the json module
+    reference = FrameDecoder("json", fast_path=False)
+    for backend in JSON_BACKENDS:
+        for fast_path in (False, True):
+            decoder = FrameDecoder(backend, fast_path)
+            for frame in frames:
+                if decoder.decode(frame) != reference.decode(frame):
+                    raise SystemExit(f"{backend} (fast path {fast_path}) differs for {frame!r}")
+
+    print(f"{len(frames)} messages")
+    print(f"{'backend':<10}{'fast path':>10}{'ns/message':>12}")
+    for backend in JSON_BACKENDS:
+        for fast_path in (False, True):
+            result = bench(FrameDecoder(backend, fast_path), frames, args.repeat)
+            print(f"{backend:<10}{'yes' if fast_path else 'no':>10}{result:>12.0f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,61 @@
+"""bench_dispatch summary
+Benchmark comparing the sequential if-chain on json_parsed["N"], as used
+by get_signals before the SignalDispatcher was added, with the table driven
+SignalDispatcher. The number of subscribed signals is scaled up to several
+hundred to show the cost per frame of both approaches.
+
+Usage: python bench_dispatch.py [number of frames]
+"""
+
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from moco_signals import SignalDispatcher
+
+
+def make_if_chain(names, sinks):
+    """Generate a function with one if statement per signal, like the
+    original receive loop of get_signals
+    """
+    lines = ["def dispatch(json_parsed):"]
+    for i, name in enumerate(names):
+        lines.append(f"    if json_parsed['N'] == {name!r}:")
+        lines.append(f"        sinks[{i}](float(json_parsed['V']))")
+    namespace = {"sinks": sinks}
+    exec("\n".join(lines), namespace)
+    return namespace["dispatch"]
+
+
+def run(signal_count, frame_count):
+    names = [f"Vehicle.Private.Benchmark.Signal{i}.Value" for i in range(signal_count)]
+    # Frames as decoded by json.loads, names are not the interned objects
+    frames = [{"N": "".join(names[i % signal_count]), "V": i * 0.5} for i in range(frame_count)]
+    values = []
+    sinks = [values.append] * signal_count
+
+    if_chain = make_if_chain(names, sinks)
+    start = time.perf_counter()
+    for json_parsed in frames:
+        if_chain(json_parsed)
+    chain_time = time.perf_counter() - start
+
+    dispatcher = SignalDispatcher.from_subscription({"CMD": "vss", "D": ",".join(names)})
+    for name, sink in zip(names, sinks):
+        dispatcher.register(name, sink)
+    dispatch = dispatcher.dispatch
+    start = time.perf_counter()
+    for json_parsed in frames:
+        dispatch(json_parsed["N"], json_parsed["V"])
+    table_time = time.perf_counter() - start
+
+    print(f"{signal_count:>6} signals  if-chain {chain_time / frame_count * 1e9:10.0f} ns/frame"
+          f"  dispatcher {table_time / frame_count * 1e9:8.0f} ns/frame")
+
+
+if __name__ == '__main__':
+    frame_count = int(sys.argv[1]) if len(sys.argv) >= 2 else 100000
+    for signal_count in (7, 50, 200, 500):
+        run(signal_count, frame_count)
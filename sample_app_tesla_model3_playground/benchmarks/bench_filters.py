@@ -0,0 +1,76 @@
+"""bench_filters summary
+Effect of the signal filters (SignalFilter in moco_signals.py) on the values
+passed from the subscriber to the application. The messages of a simulated
+drive are dispatched into the signal store without filters, with the
+change-only filters of the sample application (signal_filters) and with an
+additional deadband on a noisy vehicle speed. Reported are the values passed
+to the application per received message and the dispatch time per message.
+
+Usage: python bench_filters.py [--updates N] [--speed-noise KMH]
+                               [--deadband KMH]
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(BENCHMARK_DIR, "..", "src"))
+
+from fake_moco_engine import DriveSimulation
+from moco_signals import SignalFilter
+from range_calculation import VEHICLE_SPEED, create_signal_store
+from sample_app_moco_playground import signal_filters, subscription_list
+
+
+def generate_messages(updates, speed_noise):
+    """(name, value) of all signals of a simulated drive, 10 updates per second"""
+    simulation = DriveSimulation()
+    messages = []
+    for _ in range(updates):
+        values = simulation.tick(0.1)
+        if speed_noise:
+            values[VEHICLE_SPEED] = round(values[VEHICLE_SPEED] + random.gauss(0, speed_noise), 1)
+        messages.extend(values.items())
+    return messages
+
+
+def bench(messages, filters):
+    """Dispatch the messages, return (passed values, ns per message)"""
+    clock = iter(range(len(messages))).__next__
+    dispatcher, store = create_signal_store(subscription_list)
+    for name, (deadband, heartbeat) in filters.items():
+        # Heartbeat on the message count instead of time: one value per
+        # heartbeat * 70 messages (10 updates of 7 signals per second)
+        dispatcher.set_filter(name, SignalFilter(deadband, heartbeat and heartbeat * 70, clock))
+    dispatch = dispatcher.dispatch
+    start = time.perf_counter()
+    for name, value in messages:
+        dispatch(name, value)
+    elapsed = time.perf_counter() - start
+    passed = sum(store.snapshot().sequence)
+    return passed, 1e9 * elapsed / len(messages)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Values passed with and without signal filters")
+    parser.add_argument("--updates", type=int, default=36000, help="updates of all signals (10 per second)")
+    parser.add_argument("--speed-noise", type=float, default=0.3, help="standard deviation of the speed in km/h")
+    parser.add_argument("--deadband", type=float, default=1.0, help="deadband of the speed in km/h")
+    args = parser.parse_args()
+
+    messages = generate_messages(args.updates, args.speed_noise)
+    deadband_filters = dict(signal_filters)
+    deadband_filters[VEHICLE_SPEED] = (args.deadband, signal_filters[VEHICLE_SPEED][1])
+    print(f"{len(messages)} messages, {args.updates / 36000:.1f} h drive, speed noise {args.speed_noise} km/h\n")
+    print(f"{'filters':<20}{'passed':>10}{'passed %':>10}{'ns/message':>12}")
+    for label, filters in (("none", {}), ("change only", signal_filters),
+                           (f"speed deadband {args.deadband}", deadband_filters)):
+        passed, ns = bench(messages, filters)
+        print(f"{label:<20}{passed:>10}{100 * passed / len(messages):>10.1f}{ns:>12.0f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,90 @@
+"""bench_fleet summary
+Load test of fleet mode. A number of fake Moco engines is started in a
+separate process, one per vehicle, and fleet mode subscribes to all of them
+from a single event loop. Reported are the CPU time used by the fleet
+process per vehicle and the end-to-end latency from sending the time signal
+in the fake engine to processing it in the app calculation of the vehicle.
+
+Usage: python bench_fleet.py [vehicles] [updates per second] [seconds]
+"""
+
+import asyncio
+import os
+import subprocess
+import sys
+import time
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(BENCHMARK_DIR, "..", "src"))
+
+from fake_moco_engine import SUPPORTED_SIGNALS, client_context, make_certificate
+from moco_fleet import FleetVehicle
+from range_calculation import UNIX_CLK_SEC, create_signal_store
+
+
+def percentile(values, fraction):
+    if not values:
+        return float("nan")
+    values = sorted(values)
+    return values[min(len(values) - 1, int(fraction * len(values)))]
+
+
+def start_engines(count, rate, certfile, keyfile):
+    """Start the fake engines in a child process, returns (process, ports)"""
+    process = subprocess.Popen(
+        [sys.executable, os.path.join(BENCHMARK_DIR, "fake_moco_engine.py"), "--count", str(count),
+         "--rate", str(rate), "--cert", certfile, "--key", keyfile],
+        stdout=subprocess.PIPE, text=True)
+    ports = [int(port) for port in process.stdout.readline().split()]
+    return process, ports
+
+
+async def run_fleet(ports, context, duration):
+    subscription = {"CMD": "vss", "D": ",".join(SUPPORTED_SIGNALS)}
+    latencies = []
+    vehicles = []
+    for i, port in enumerate(ports):
+        vehicle = FleetVehicle(f"vehicle{i}", "127.0.0.1", port, context, subscription,
+                               create_signal_store, report=lambda message: None)
+
+        def process(vehicle=vehicle):
+            sequence = vehicle.unix_clk_sequence
+            vehicle.process()
+            if vehicle.unix_clk_sequence != sequence:
+                latencies.append(time.time() - vehicle.signals[UNIX_CLK_SEC])
+
+        vehicle.client.on_batch = process
+        vehicles.append(vehicle)
+    tasks = [asyncio.ensure_future(vehicle.client.run()) for vehicle in vehicles]
+    # Wait until all vehicles are streaming before measuring
+    await asyncio.sleep(2.0)
+    latencies.clear()
+    start_cpu = time.process_time()
+    start = time.perf_counter()
+    await asyncio.sleep(duration)
+    cpu = time.process_time() - start_cpu
+    wall = time.perf_counter() - start
+    for vehicle in vehicles:
+        vehicle.client.stop()
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+    return cpu, wall, latencies
+
+
+if __name__ == '__main__':
+    vehicle_count = int(sys.argv[1]) if len(sys.argv) >= 2 else 100
+    rate = float(sys.argv[2]) if len(sys.argv) >= 3 else 10.0
+    duration = float(sys.argv[3]) if len(sys.argv) >= 4 else 10.0
+    certfile, keyfile = make_certificate()
+    engines, engine_ports = start_engines(vehicle_count, rate, certfile, keyfile)
+    try:
+        cpu_time, wall_time, latency = asyncio.run(run_fleet(engine_ports, client_context(certfile), duration))
+    finally:
+        engines.terminate()
+        engines.wait()
+    print(f"vehicles {vehicle_count}, {rate} updates/s per vehicle, {wall_time:.1f} s")
+    print(f"CPU fleet process {100 * cpu_time / wall_time:.1f} %, "
+          f"per vehicle {1000 * cpu_time / wall_time / vehicle_count:.3f} ms CPU/s")
+    print(f"latency p50 {1000 * percentile(latency, 0.5):.2f} ms, "
+          f"p99 {1000 * percentile(latency, 0.99):.2f} ms, samples {len(latency)}")
@@ -0,0 +1,79 @@
+"""bench_framer summary
+Microbenchmark comparing the original split/strip receive loop of
+get_signals with the FrameBuffer framer. Both are fed the same stream of
+signal messages in 2048 byte reads, as received from the socket.
+
+Usage: python bench_framer.py [number of messages]
+"""
+
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from moco_framer import FrameBuffer
+
+
+def make_stream(count):
+    """Create the received data as a list of 2048 byte reads"""
+    names = ["Vehicle.Speed", "Vehicle.Private.UnixTime.Seconds",
+             "Vehicle.Powertrain.Transmission.TravelledDistance",
+             "Vehicle.Powertrain.TractionBattery.StateOfCharge.Displayed",
+             "Vehicle.Powertrain.Range"]
+    lines = [json.dumps({"N": names[i % len(names)], "V": i * 0.25}) for i in range(count)]
+    stream = ("\n".join(lines) + "\n").encode("utf-8")
+    return [stream[i:i + 2048] for i in range(0, len(stream), 2048)]
+
+
+def legacy_loop(reads):
+    """Framing as done by get_signals before the FrameBuffer was added"""
+    frames = 0
+    message_segment = ""
+    for data in reads:
+        buffer = []
+        received = str(data, "utf-8")
+        split_message = received.split('\n')
+        if len(split_message) >= 2:
+            buffer.append(message_segment + split_message[0].strip())
+            for i in range(1, len(split_message) - 1):
+                buffer.append(split_message[i].strip())
+            if ('{' in split_message[-1] and '}' in split_message[-1]):
+                buffer.append(split_message[-1].strip())
+                message_segment = ""
+            else:
+                message_segment = split_message[-1]
+        else:
+            message_segment += split_message[0]
+        for signals in buffer:
+            if signals != '':
+                frames += 1
+    return frames
+
+
+def framer_loop(reads):
+    frames = 0
+    frame_buffer = FrameBuffer(4096)
+    for data in reads:
+        frame_buffer.feed(data)
+        for _frame in frame_buffer.frames():
+            frames += 1
+    return frames
+
+
+def run(name, function, reads, repeat=5):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        frames = function(reads)
+        duration = time.perf_counter() - start
+        best = duration if best is None else min(best, duration)
+    print(f"{name:<12} {frames} frames  {best * 1000:8.2f} ms  {frames / best:12.0f} frames/s")
+
+
+if __name__ == '__main__':
+    count = int(sys.argv[1]) if len(sys.argv) >= 2 else 200000
+    reads = make_stream(count)
+    run("legacy", legacy_loop, reads)
+    run("FrameBuffer", framer_loop, reads)
@@ -0,0 +1,80 @@
+"""bench_logging summary
+Time spent in the logging thread per logged message with the synchronous
+and the asynchronous logging mode (moco_logging.py), with a console output
+that stalls for a while on every write, as a slow stdout in Docker. In the
+synchronous mode every message waits for the output, in the asynchronous
+mode the messages are only put in the queue and messages that don't fit
+are dropped.
+
+Usage: python bench_logging.py [--messages N] [--stall SECONDS]
+"""
+
+import argparse
+import logging
+import os
+import sys
+import tempfile
+import time
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(BENCHMARK_DIR, "..", "src"))
+
+from moco_logging import ASYNC, SYNC, console, setup_logging
+
+
+class StallingStream:
+    """Output stream waiting stall seconds on every write"""
+
+    def __init__(self, stall):
+        self.stall = stall
+        self.writes = 0
+
+    def write(self, text):
+        time.sleep(self.stall)
+        self.writes += 1
+
+    def flush(self):
+        pass
+
+
+def bench_mode(mode, messages, stall, directory):
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    listener = setup_logging(os.path.join(directory, f"{mode}.txt"), mode, queue_size=1000,
+                             repeat_interval=1.0)
+    stream = StallingStream(stall)
+    handlers = listener.handlers if listener is not None else root.handlers
+    for handler in handlers:
+        if isinstance(handler, logging.StreamHandler) and not isinstance(handler, logging.FileHandler):
+            handler.setStream(stream)
+    durations = []
+    for message in range(messages):
+        start = time.perf_counter()
+        console.info(f"Average speed {message} (km/h)")
+        console.info("Sync message from Moco engine received")
+        durations.append(time.perf_counter() - start)
+    if listener is not None:
+        listener.stop()
+        dropped = next(handler.dropped for handler in root.handlers if hasattr(handler, "dropped"))
+    else:
+        dropped = 0
+    durations.sort()
+    return (durations[len(durations) // 2], durations[int(len(durations) * 0.99)], durations[-1],
+            stream.writes, dropped)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Synchronous versus asynchronous logging")
+    parser.add_argument("--messages", type=int, default=2000, help="messages logged per mode")
+    parser.add_argument("--stall", type=float, default=0.001, help="seconds per console write")
+    args = parser.parse_args()
+    print(f"{'mode':<8}{'p50 us':>10}{'p99 us':>10}{'max us':>10}{'written':>10}{'dropped':>10}")
+    with tempfile.TemporaryDirectory() as directory:
+        for mode in (SYNC, ASYNC):
+            p50, p99, longest, writes, dropped = bench_mode(mode, args.messages, args.stall, directory)
+            print(f"{mode:<8}{1e6 * p50:>10.1f}{1e6 * p99:>10.1f}{1e6 * longest:>10.1f}{writes:>10}{dropped:>10}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,168 @@
+"""bench_offload summary
+Receive latency of the subscriber while the windows of the app calculation
+are analysed, with the analysis running in the application thread (inline)
+or in worker processes (offload, moco_offload.py), for increasing cost of
+the analysis. The sample application runs the thread subscriber against the
+local fake Moco engine in a child process per measurement. The analysis is
+a busy loop holding the GIL for the given time per window.
+Reported is the time from sending the time signal in the fake engine to
+writing it into the signal store in the subscriber thread, which grows with
+the cost of inline analysis and stays flat with the offload.
+
+Usage: python bench_offload.py [--rate R] [--duration S] [--workers N]
+                               [--costs MS ...]
+"""
+
+import argparse
+import functools
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(BENCHMARK_DIR, "..", "src"))
+
+from bench_subscriber import import_sample_app, percentile
+from fake_moco_engine import make_certificate
+
+
+def busy_analysis(cost, columns):
+    """Analysis holding the GIL for cost seconds"""
+    end = time.perf_counter() + cost
+    while time.perf_counter() < end:
+        pass
+    return len(columns["time"])
+
+
+class InlineAnalysis:
+    """Runs the analysis in the application thread, with the interface of
+    WindowOffload
+    """
+
+    def __init__(self, analysis, columns):
+        self.analysis = analysis
+        self.columns = columns
+        self.results = []
+        self.submitted = 0
+
+    def __len__(self):
+        return len(self.results)
+
+    def submit(self, rows):
+        columns = {name: [row[index] for row in rows] for index, name in enumerate(self.columns)}
+        self.results.append((self.submitted, self.analysis(columns)))
+        self.submitted += 1
+
+    def completed(self):
+        results, self.results = self.results, []
+        return results
+
+    drain = completed
+
+    def close(self):
+        pass
+
+
+class LatencyRecorder:
+    """Replaces the latency histogram of the sample application"""
+
+    def __init__(self):
+        self.values = []
+
+    def observe(self, value):
+        self.values.append(value)
+
+
+def run_child(mode, cost, workers, port, certfile, duration, warmup=1.0):
+    """Run one measurement and print the results as a JSON line"""
+    app = import_sample_app("127.0.0.1", port, certfile)
+    from moco_offload import WindowOffload
+    from range_calculation import RangeCalculation, LOG_COLUMNS
+
+    latency = app.metrics.latency = LatencyRecorder()
+    analysis = functools.partial(busy_analysis, cost)
+    if mode == "offload":
+        offload = WindowOffload(analysis, LOG_COLUMNS, workers)
+    else:
+        offload = InlineAnalysis(analysis, LOG_COLUMNS)
+    calculation = RangeCalculation(report=lambda message: None, offload=offload)
+    threading.Thread(target=app.get_signals, args=("127.0.0.1", port, app.subscription_list),
+                     daemon=True).start()
+
+    signals = app.signal_store.snapshot()
+    start = time.perf_counter()
+    measuring = False
+    while True:
+        now = time.perf_counter()
+        if not measuring and now - start > warmup:
+            measuring = True
+            latency.values.clear()
+            start_windows = offload.submitted
+            start = now
+        elif measuring and now - start > duration:
+            break
+        if app.tcp_signal_update.wait(0.5) and app.signal_store.read(signals):
+            calculation.update(signals)
+    wall = time.perf_counter() - start
+    result = {
+        "mode": mode,
+        "cost_ms": 1000 * cost,
+        "windows_per_second": (offload.submitted - start_windows) / wall,
+        "p50_ms": 1000 * percentile(latency.values, 0.5),
+        "p99_ms": 1000 * percentile(latency.values, 0.99),
+        "max_ms": 1000 * max(latency.values, default=float("nan")),
+    }
+    print(json.dumps(result), flush=True)
+    offload.close()
+    # The subscriber thread doesn't stop by itself
+    os._exit(0)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Inline versus offloaded window analysis")
+    parser.add_argument("--rate", type=float, default=200.0, help="fake engine updates per second")
+    parser.add_argument("--duration", type=float, default=4.0, help="measurement time per run")
+    parser.add_argument("--workers", type=int, default=2, help="worker processes of the offload")
+    parser.add_argument("--costs", type=float, nargs="*", default=[0.0, 2.0, 10.0, 40.0],
+                        help="analysis cost per window in milliseconds")
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    parser.add_argument("--cost", type=float, help=argparse.SUPPRESS)
+    parser.add_argument("--port", type=int, help=argparse.SUPPRESS)
+    parser.add_argument("--cert", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        run_child(args.child, args.cost / 1000, args.workers, args.port, args.cert, args.duration)
+        return
+
+    certfile, keyfile = make_certificate()
+    engine = subprocess.Popen([sys.executable, os.path.join(BENCHMARK_DIR, "fake_moco_engine.py"),
+                               "--rate", str(args.rate), "--cert", certfile, "--key", keyfile],
+                              stdout=subprocess.PIPE, text=True)
+    try:
+        port = int(engine.stdout.readline())
+        print(f"{'mode':<10}{'cost ms':>9}{'windows/s':>11}{'p50 ms':>9}{'p99 ms':>9}{'max ms':>9}")
+        for cost in args.costs:
+            for mode in ("inline", "offload"):
+                child = subprocess.run(
+                    [sys.executable, os.path.abspath(__file__), "--child", mode, "--cost", str(cost),
+                     "--workers", str(args.workers), "--port", str(port), "--cert", certfile,
+                     "--duration", str(args.duration)],
+                    stdout=subprocess.PIPE, text=True)
+                lines = [line for line in child.stdout.splitlines() if line.startswith("{")]
+                if not lines:
+                    print(f"{mode:<10}{cost:>9.1f} failed")
+                    continue
+                result = json.loads(lines[-1])
+                print(f"{mode:<10}{cost:>9.1f}{result['windows_per_second']:>11.1f}{result['p50_ms']:>9.2f}"
+                      f"{result['p99_ms']:>9.2f}{result['max_ms']:>9.2f}")
+    finally:
+        engine.terminate()
+        engine.wait()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,85 @@
+"""bench_range_batch summary
+Compares the time per update of the batch calculation (range_batch.py) with
+the streaming calculation (RangeCalculation) of the sample application, on
+a generated trip with repeated time signals, odometer values of 0 and
+changes of the power state. That both give the same window results is
+checked by tests/test_range_batch.py.
+
+Usage: python bench_range_batch.py [--updates N]
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(BENCHMARK_DIR, "..", "src"))
+
+import numpy as np
+
+from range_batch import analyze_updates
+from range_calculation import (RangeCalculation, VEHICLE_SPEED, UNIX_CLK_SEC, ODO, SOC, RANGE,
+                               POWER_STATE, HVAC_STATE, POWER_STATE_DRIVE)
+
+
+def generate_trip(seed, updates):
+    """Arrays with the signal values of each update of a random trip"""
+    rnd = random.Random(seed)
+    clock = 0.0
+    odo = rnd.choice([0.0, 1000.0])
+    soc = 80.0
+    remaining = 300000.0
+    trip = {"unix_time": [], "speed": [], "soc": [], "range": [], "odo": [], "drive": []}
+    start = rnd.randint(0, 5)
+    for update in range(updates):
+        # The time signal is not updated with every update
+        if update > start and rnd.random() < 0.6:
+            clock += rnd.choice([0.1, 0.7, 1.0, 1.3])
+        odo += rnd.random() * 0.02
+        soc -= rnd.random() * 0.01
+        remaining -= rnd.random() * 20
+        trip["unix_time"].append(clock)
+        trip["speed"].append(rnd.uniform(0, 120))
+        trip["soc"].append(soc)
+        trip["range"].append(remaining)
+        trip["odo"].append(odo)
+        trip["drive"].append(rnd.random() < 0.7)
+    return trip
+
+
+def run_streaming(trip):
+    calculation = RangeCalculation(report=lambda message: None)
+    results = []
+    for values in zip(*(trip[column] for column in ("unix_time", "speed", "soc", "range", "odo", "drive"))):
+        unix_time, speed, soc, remaining, odo, drive = values
+        result = calculation.update({
+            UNIX_CLK_SEC: unix_time, VEHICLE_SPEED: speed, SOC: soc, RANGE: remaining, ODO: odo,
+            HVAC_STATE: "false", POWER_STATE: POWER_STATE_DRIVE if drive else "VEHICLE_POWER_STATE_PARKED"})
+        if result is not None:
+            results.append(result)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Batch versus streaming range calculation")
+    parser.add_argument("--updates", type=int, default=1000000, help="updates of the trip used for timing")
+    args = parser.parse_args()
+
+    trip = generate_trip(0, args.updates)
+    start = time.perf_counter()
+    streaming = run_streaming(trip)
+    streaming_time = time.perf_counter() - start
+    arrays = {column: np.array(values) for column, values in trip.items()}
+    start = time.perf_counter()
+    windows = len(analyze_updates(**arrays)["avg_spd"])
+    batch_time = time.perf_counter() - start
+    assert windows == len(streaming)
+    print(f"{args.updates} updates, {len(streaming)} windows")
+    print(f"streaming {1e9 * streaming_time / args.updates:8.0f} ns/update")
+    print(f"batch     {1e9 * batch_time / args.updates:8.0f} ns/update")
+
+
+if __name__ == '__main__':
+    main()
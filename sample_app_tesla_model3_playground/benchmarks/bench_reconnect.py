@@ -0,0 +1,142 @@
+"""bench_reconnect summary
+Reconnect latency with and without resumption of the TLS session
+(moco_tls.py), against the local fake Moco engine.
+
+connection: the time from connecting a socket to the first signal, measured
+in this process for a number of connections with a full TLS handshake and
+with a resumed session.
+
+subscriber: the sample application runs the subscriber in a child process
+against a fake engine that drops every connection after --disconnect-after
+seconds (engine restart). Reported is the time from detecting the connection
+loss to the first signal of the new connection (moco_reconnect_first_signal
+of the metrics), with resume_session disabled (before) and enabled (after).
+
+Usage: python bench_reconnect.py [--connections N] [--duration S]
+                                 [--disconnect-after S] [--mode MODE]
+"""
+
+import argparse
+import json
+import os
+import socket
+import subprocess
+import sys
+import threading
+import time
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(BENCHMARK_DIR, "..", "src"))
+
+from bench_offload import LatencyRecorder
+from bench_subscriber import import_sample_app, percentile
+from fake_moco_engine import client_context, make_certificate
+from moco_tls import ResumingContext
+
+SUBSCRIPTION = json.dumps({"CMD": "vss", "D": "Vehicle.Speed"}).encode("utf-8")
+
+
+def first_signal_times(port, certfile, resume, connections):
+    """Time from connecting to the first signal for a number of connections"""
+    tls = ResumingContext(client_context(certfile), resume)
+    times = []
+    for _ in range(connections):
+        start = time.perf_counter()
+        ssl_socket = tls.wrap_socket(socket.create_connection(("127.0.0.1", port)),
+                                     server_hostname="127.0.0.1")
+        ssl_socket.sendall(SUBSCRIPTION)
+        received = b""
+        while b'"N"' not in received:
+            received += ssl_socket.recv(65536)
+        times.append(time.perf_counter() - start)
+        tls.established(ssl_socket)
+        ssl_socket.close()
+    # The first connection is always a full handshake
+    return times[1:], tls.resumed
+
+
+def run_child(mode, resume, port, certfile, duration):
+    """Run the subscriber and print the results as a JSON line"""
+    app = import_sample_app("127.0.0.1", port, certfile)
+    app.TLS_RESUME_SESSION = resume
+    # Every connection loss of the fake engine is reconnected at once, as
+    # for connections that streamed signals for a while
+    app.RECONNECT_MIN_STREAMING = 0.0
+    first_signal = app.metrics.reconnect_first_signal = LatencyRecorder()
+    subscriber = app.get_signals_async if mode == "asyncio" else app.get_signals
+    threading.Thread(target=subscriber, args=("127.0.0.1", port, app.subscription_list),
+                     daemon=True).start()
+    time.sleep(duration)
+    result = {
+        "reconnects": len(first_signal.values),
+        "resumed": app.metrics.tls_resumed.value,
+        "p50_ms": 1000 * percentile(first_signal.values, 0.5),
+        "p90_ms": 1000 * percentile(first_signal.values, 0.9),
+        "max_ms": 1000 * max(first_signal.values, default=float("nan")),
+    }
+    print(json.dumps(result), flush=True)
+    # The subscriber thread doesn't stop by itself
+    os._exit(0)
+
+
+def start_engine(certfile, keyfile, rate, disconnect_after=None):
+    command = [sys.executable, os.path.join(BENCHMARK_DIR, "fake_moco_engine.py"),
+               "--rate", str(rate), "--cert", certfile, "--key", keyfile]
+    if disconnect_after is not None:
+        command += ["--disconnect-after", str(disconnect_after)]
+    engine = subprocess.Popen(command, stdout=subprocess.PIPE, text=True)
+    return engine, int(engine.stdout.readline())
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Reconnect latency with TLS session resumption")
+    parser.add_argument("--connections", type=int, default=200, help="connections per handshake type")
+    parser.add_argument("--duration", type=float, default=10.0, help="run time of each subscriber")
+    parser.add_argument("--disconnect-after", type=float, default=0.3,
+                        help="seconds after which the engine drops each connection")
+    parser.add_argument("--rate", type=float, default=100.0, help="fake engine updates per second")
+    parser.add_argument("--mode", choices=("thread", "asyncio"), default="thread",
+                        help="subscriber implementation")
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    parser.add_argument("--port", type=int, help=argparse.SUPPRESS)
+    parser.add_argument("--cert", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        run_child(args.mode, args.child == "resume", args.port, args.cert, args.duration)
+        return
+
+    certfile, keyfile = make_certificate()
+    engine, port = start_engine(certfile, keyfile, args.rate)
+    try:
+        print(f"{'connection':<12}{'resumed':>9}{'p50 ms':>9}{'p90 ms':>9}{'max ms':>9}")
+        for resume in (False, True):
+            times, resumed = first_signal_times(port, certfile, resume, args.connections)
+            print(f"{'resumed' if resume else 'full':<12}{resumed:>9}{1000 * percentile(times, 0.5):>9.2f}"
+                  f"{1000 * percentile(times, 0.9):>9.2f}{1000 * max(times):>9.2f}")
+    finally:
+        engine.terminate()
+        engine.wait()
+
+    engine, port = start_engine(certfile, keyfile, args.rate, args.disconnect_after)
+    try:
+        print(f"\n{'subscriber':<12}{'reconnects':>11}{'resumed':>9}{'p50 ms':>9}{'p90 ms':>9}{'max ms':>9}")
+        for child in ("full", "resume"):
+            run = subprocess.run(
+                [sys.executable, os.path.abspath(__file__), "--child", child, "--mode", args.mode,
+                 "--port", str(port), "--cert", certfile, "--duration", str(args.duration)],
+                stdout=subprocess.PIPE, text=True)
+            lines = [line for line in run.stdout.splitlines() if line.startswith("{")]
+            if not lines:
+                print(f"{child:<12} failed")
+                continue
+            result = json.loads(lines[-1])
+            print(f"{child:<12}{result['reconnects']:>11}{result['resumed']:>9}{result['p50_ms']:>9.2f}"
+                  f"{result['p90_ms']:>9.2f}{result['max_ms']:>9.2f}")
+    finally:
+        engine.terminate()
+        engine.wait()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,139 @@
+"""bench_resampler summary
+Effect of resampling (moco_resampler.py) on the results of the range
+calculation when the update times of Moco engine jitter. A drive with a
+varying speed is sent in updates about every 0.1 s of engine time, the
+interval between two updates varying by up to --jitter seconds. The same
+drive is sent with --runs different jitters, the samples passed to the
+calculation are the values at every time signal (no resampling) or the
+values resampled on a 0.1 s grid with hold or linear interpolation.
+Reported are the spread between the runs (the standard deviation) of the
+average speed of a window, averaged over the windows, and of the calculated
+distance at the end of the drive, and the time to dispatch one signal value
+into the samples.
+Without resampling the windows of the runs cover different intervals of the
+drive, with resampling every window covers the same grid times in every run.
+
+Usage: python bench_resampler.py [--duration S] [--jitter S] [--runs N]
+"""
+
+import argparse
+import math
+import os
+import random
+import statistics
+import sys
+import time
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(BENCHMARK_DIR, "..", "src"))
+
+from moco_resampler import HOLD, LINEAR, Resampler
+from range_calculation import (HVAC_STATE, ODO, POWER_STATE, POWER_STATE_DRIVE, RANGE, SOC,
+                               UNIX_CLK_SEC, VEHICLE_SPEED, RangeCalculation, create_signal_store)
+from sample_app_moco_playground import subscription_list
+
+START_TIME = 1700000000.0
+PERIOD = 0.1
+
+
+def speed_at(seconds):
+    """Speed in km/h of the simulated drive"""
+    return 50.0 + 30.0 * math.sin(2 * math.pi * seconds / 60.0)
+
+
+def distance_at(seconds):
+    """Distance in km of the simulated drive, the integral of speed_at()"""
+    return (50.0 * seconds - 30.0 * 60.0 / (2 * math.pi)
+            * (math.cos(2 * math.pi * seconds / 60.0) - 1)) / 3600.0
+
+
+def generate_updates(duration, jitter, seed):
+    """List of (engine time, values of the update) of the drive"""
+    random_jitter = random.Random(seed)
+    updates = []
+    seconds = 0.0
+    while seconds < duration:
+        distance = distance_at(seconds)
+        updates.append((START_TIME + seconds, {
+            POWER_STATE: POWER_STATE_DRIVE,
+            SOC: round(80.0 - distance * 0.15, 3),
+            RANGE: round(300000.0 - distance * 1100.0, 1),
+            VEHICLE_SPEED: round(speed_at(seconds), 1),
+            ODO: round(1000.0 + distance, 4),
+            HVAC_STATE: "false",
+        }))
+        seconds += PERIOD + random_jitter.uniform(-jitter, jitter)
+    return updates
+
+
+def samples(updates, interpolation):
+    """Rows passed to the calculation, None as interpolation for the values
+    at every time signal. Returns (rows, ns per dispatched value)
+    """
+    dispatcher, store = create_signal_store(subscription_list)
+    rows = []
+    if interpolation is None:
+        dispatcher.register(UNIX_CLK_SEC, lambda _: rows.append(store.values()), converter=None,
+                            notify=False)
+    else:
+        resampler = Resampler(store.signals(), UNIX_CLK_SEC, PERIOD, interpolation,
+                              defaults=store.values())
+        for name in store.signals():
+            if name != UNIX_CLK_SEC:
+                dispatcher.register(name, resampler.setter(name), converter=None, notify=False)
+        dispatcher.register(UNIX_CLK_SEC, lambda engine_time: rows.extend(resampler.advance(engine_time)),
+                            notify=False)
+    dispatch = dispatcher.dispatch
+    start = time.perf_counter()
+    values = 0
+    for engine_time, update in updates:
+        for name, value in update.items():
+            dispatch(name, value)
+        dispatch(UNIX_CLK_SEC, engine_time)
+        values += len(update) + 1
+    return rows, 1e9 * (time.perf_counter() - start) / values
+
+
+def calculate(rows):
+    """Window results of the calculation over the rows"""
+    _, store = create_signal_store(subscription_list)
+    sample = store.snapshot()
+    calculation = RangeCalculation(report=lambda message: None)
+    results = []
+    for row in rows:
+        sample.values[:] = row
+        result = calculation.update(sample)
+        if result is not None:
+            results.append(result)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Window results with and without resampling")
+    parser.add_argument("--duration", type=float, default=600.0, help="seconds of the drive")
+    parser.add_argument("--jitter", type=float, default=0.03, help="largest deviation of the update interval")
+    parser.add_argument("--runs", type=int, default=5, help="drives with different jitter")
+    args = parser.parse_args()
+
+    runs = [generate_updates(args.duration, args.jitter, seed) for seed in range(args.runs)]
+    print(f"{args.runs} runs of a {args.duration:.0f} s drive, update interval {PERIOD} +- {args.jitter} s\n")
+    print(f"{'samples':<14}{'windows':>9}{'avg speed spread km/h':>23}{'distance spread m':>19}"
+          f"{'ns/value':>10}")
+    for label, interpolation in (("time signal", None), ("hold", HOLD), ("linear", LINEAR)):
+        results = []
+        costs = []
+        for updates in runs:
+            rows, ns = samples(updates, interpolation)
+            costs.append(ns)
+            results.append(calculate(rows))
+        windows = min(len(run_results) for run_results in results)
+        speed_spread = statistics.mean(statistics.pstdev(run_results[index].avg_spd for run_results in results)
+                                       for index in range(windows))
+        distance_spread = 1000 * statistics.pstdev(run_results[windows - 1].traveled_dist_calc_total
+                                                   for run_results in results)
+        print(f"{label:<14}{windows:>9}{speed_spread:>23.3f}{distance_spread:>19.2f}"
+              f"{statistics.median(costs):>10.0f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,72 @@
+"""bench_startup summary
+Start up time of the sample application, measured with python -X importtime
+while importing the application module in a new interpreter. Importing the
+module must not have side effects: it is imported in an empty directory
+(without cfg.ini) and no files may be created. Reported are the import time
+of the module, the slowest imports and the wall time of the interpreter.
+The benchmark fails when the import time exceeds the budget, so that a
+restart of the container after a failed reconnect stays fast.
+
+Usage: python bench_startup.py [--budget MS] [--runs N] [--top N]
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+SOURCE_DIR = os.path.abspath(os.path.join(BENCHMARK_DIR, "..", "src"))
+
+MODULE = "sample_app_moco_playground"
+
+
+def import_times(workdir):
+    """Import the module in a new interpreter, return the wall time and a
+    dictionary from module name to (self, cumulative) import time in us
+    """
+    env = dict(os.environ, PYTHONPATH=SOURCE_DIR, PYTHONDONTWRITEBYTECODE="1")
+    start = time.perf_counter()
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {MODULE}"],
+                            cwd=workdir, env=env, stderr=subprocess.PIPE, text=True)
+    wall = time.perf_counter() - start
+    if result.returncode:
+        raise SystemExit(f"Import of {MODULE} failed:\n{result.stderr}")
+    times = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        own, cumulative, name = line[len("import time:"):].split("|")
+        if own.strip().isdigit():
+            times[name.strip()] = (int(own), int(cumulative))
+    return wall, times
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Start up time of the sample application")
+    parser.add_argument("--budget", type=float, default=100.0, help="maximum import time in ms")
+    parser.add_argument("--runs", type=int, default=5, help="imports, the fastest is reported")
+    parser.add_argument("--top", type=int, default=10, help="number of slowest imports shown")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        runs = [import_times(workdir) for _ in range(args.runs)]
+        created = os.listdir(workdir)
+    if created:
+        raise SystemExit(f"Importing {MODULE} created files: {', '.join(created)}")
+    wall, times = min(runs, key=lambda run: run[1][MODULE][1])
+    import_ms = times[MODULE][1] / 1000
+    print(f"{'module':<40}{'self ms':>10}{'cumulative ms':>15}")
+    slowest = sorted(times.items(), key=lambda item: item[1][1], reverse=True)
+    for name, (own, cumulative) in slowest[:args.top]:
+        print(f"{name:<40}{own / 1000:>10.1f}{cumulative / 1000:>15.1f}")
+    print(f"\nimport of {MODULE}: {import_ms:.1f} ms (budget {args.budget:.0f} ms), "
+          f"interpreter wall time {1000 * wall:.1f} ms")
+    if import_ms > args.budget:
+        raise SystemExit(f"Import time over budget by {import_ms - args.budget:.1f} ms")
+
+
+if __name__ == '__main__':
+    main()
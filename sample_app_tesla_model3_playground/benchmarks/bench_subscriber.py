@@ -0,0 +1,161 @@
+"""bench_subscriber summary
+Throughput and latency benchmark of the subscriber implementations of the
+sample application, run against the local fake Moco engine.
+Each implementation runs in its own child process, with the sample
+application configured (cfg.ini) to connect to the fake engine. A consumer
+thread plays the role of the application thread: it waits for the
+tcp_signal_update notifier and reads the signal store. Reported are:
+    - messages/s : signal messages written into the signal store
+    - wakeups/s : wake-ups of the application thread
+    - p50/p99 : time from sending the time signal in the fake engine to
+                reading it in the application thread
+    - CPU % : CPU time of the child process (subscriber and consumer)
+    - RSS : peak resident memory of the child process
+
+Usage: python bench_subscriber.py [--rate R] [--duration S] [--partial]
+                                  [--disconnect-after S] [implementation ...]
+A rate of 0 (default) makes the fake engine send as fast as possible.
+New subscriber implementations are added to IMPLEMENTATIONS.
+"""
+
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+SOURCE_DIR = os.path.join(BENCHMARK_DIR, "..", "src")
+sys.path.insert(0, SOURCE_DIR)
+
+from fake_moco_engine import make_certificate
+
+
+# Subscriber implementations, name: function returning the subscriber
+# thread target of the sample application module
+IMPLEMENTATIONS = {
+    "thread": lambda app: app.get_signals,
+    "asyncio": lambda app: app.get_signals_async,
+}
+
+UNIX_CLK_SEC = "Vehicle.Private.UnixTime.Seconds"
+
+
+def percentile(values, fraction):
+    if not values:
+        return float("nan")
+    values = sorted(values)
+    return values[min(len(values) - 1, int(fraction * len(values)))]
+
+
+def cpu_time():
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    return usage.ru_utime + usage.ru_stime
+
+
+def import_sample_app(host, port, certfile):
+    """Import the sample application configured for the fake engine"""
+    workdir = tempfile.mkdtemp(prefix="bench_subscriber_")
+    with open(os.path.join(workdir, "cfg.ini"), "w") as cfg:
+        cfg.write(f"[tcp]\nhost = {host}\nport = {port}\n\n[cert]\npath = {certfile}\n")
+    os.chdir(workdir)
+    import sample_app_moco_playground
+    sample_app_moco_playground.configure("cfg.ini", ["sample_app_moco_playground.py", host, str(port)])
+    return sample_app_moco_playground
+
+
+def run_child(name, host, port, certfile, duration, warmup=1.0):
+    """Run one implementation and print the results as a JSON line"""
+    app = import_sample_app(host, port, certfile)
+    subscriber = IMPLEMENTATIONS[name](app)
+    threading.Thread(target=subscriber, args=(host, port, app.subscription_list), daemon=True).start()
+
+    signals = app.signal_store.snapshot()
+    latencies = []
+    wakeups = 0
+    clk_sequence = 0
+    start = time.perf_counter()
+    measuring = False
+    while True:
+        now = time.perf_counter()
+        if not measuring and now - start > warmup:
+            measuring = True
+            latencies.clear()
+            wakeups = 0
+            start_version = app.signal_store.version
+            start_cpu = cpu_time()
+            start = now
+        elif measuring and now - start > duration:
+            break
+        if app.tcp_signal_update.wait(0.5) is not None:
+            wakeups += 1
+        if app.signal_store.read(signals) and signals.sequence_of(UNIX_CLK_SEC) != clk_sequence:
+            clk_sequence = signals.sequence_of(UNIX_CLK_SEC)
+            latencies.append(time.time() - signals[UNIX_CLK_SEC])
+    wall = time.perf_counter() - start
+    result = {
+        "implementation": name,
+        "messages_per_second": (app.signal_store.version - start_version) / 2 / wall,
+        "wakeups_per_second": wakeups / wall,
+        "p50_ms": 1000 * percentile(latencies, 0.5),
+        "p99_ms": 1000 * percentile(latencies, 0.99),
+        "cpu_percent": 100 * (cpu_time() - start_cpu) / wall,
+        "rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    }
+    print(json.dumps(result), flush=True)
+    # Subscriber threads don't stop by themselves
+    os._exit(0)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Subscriber benchmark")
+    parser.add_argument("implementations", nargs="*", default=list(IMPLEMENTATIONS))
+    parser.add_argument("--rate", type=float, default=0.0, help="fake engine updates per second, 0 for unlimited")
+    parser.add_argument("--duration", type=float, default=5.0, help="measurement time per implementation")
+    parser.add_argument("--partial", action="store_true", help="fake engine splits messages at random positions")
+    parser.add_argument("--disconnect-after", type=float, help="fake engine drops connections after this many seconds")
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    parser.add_argument("--port", type=int, help=argparse.SUPPRESS)
+    parser.add_argument("--cert", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        run_child(args.child, "127.0.0.1", args.port, args.cert, args.duration)
+        return
+
+    certfile, keyfile = make_certificate()
+    engine_args = [sys.executable, os.path.join(BENCHMARK_DIR, "fake_moco_engine.py"),
+                   "--rate", str(args.rate), "--cert", certfile, "--key", keyfile]
+    if args.partial:
+        engine_args.append("--partial")
+    if args.disconnect_after is not None:
+        engine_args += ["--disconnect-after", str(args.disconnect_after)]
+    engine = subprocess.Popen(engine_args, stdout=subprocess.PIPE, text=True)
+    try:
+        port = int(engine.stdout.readline())
+        print(f"{'implementation':<16}{'messages/s':>12}{'wakeups/s':>11}{'p50 ms':>10}{'p99 ms':>10}"
+              f"{'CPU %':>8}{'RSS MB':>8}")
+        for name in args.implementations:
+            child = subprocess.run(
+                [sys.executable, os.path.abspath(__file__), "--child", name, "--port", str(port),
+                 "--cert", certfile, "--duration", str(args.duration)],
+                stdout=subprocess.PIPE, text=True)
+            lines = [line for line in child.stdout.splitlines() if line.startswith("{")]
+            if not lines:
+                print(f"{name:<16} failed")
+                continue
+            result = json.loads(lines[-1])
+            print(f"{name:<16}{result['messages_per_second']:>12.0f}{result['wakeups_per_second']:>11.0f}"
+                  f"{result['p50_ms']:>10.2f}"
+                  f"{result['p99_ms']:>10.2f}{result['cpu_percent']:>8.1f}{result['rss_mb']:>8.1f}")
+    finally:
+        engine.terminate()
+        engine.wait()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,158 @@
+"""bench_subscription summary
+Subscription changes on the live connection (moco_subscription.py).
+
+catalogue: a catalogue of --catalogue-signals VSS signals in nested lists is
+indexed by SignalCatalogue. Reported are the time to index it and the time
+to select a branch (Vehicle.Powertrain.*) with the index, compared to
+checking the prefix of every signal name.
+
+live: the sample application runs the subscriber (--mode thread or asyncio)
+in a child process against the fake Moco engine, subscribed to all signals
+of the engine. After --phase seconds all signals but the speed and time
+signal are removed, after another --phase seconds the Vehicle.Powertrain
+branch is added again. Reported per phase are the received bytes and
+signals per second, the time from the change to the last value of a removed
+signal or the first value of an added signal, and the reconnects: all
+changes are made without reconnecting.
+
+Usage: python bench_subscription.py [--mode MODE] [--phase S] [--rate R]
+                                    [--catalogue-signals N]
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(BENCHMARK_DIR, "..", "src"))
+
+from bench_subscriber import import_sample_app
+from fake_moco_engine import make_certificate
+from moco_subscription import SignalCatalogue
+from range_calculation import UNIX_CLK_SEC, VEHICLE_SPEED
+
+BRANCHES = ["Body", "Cabin", "Chassis", "ADAS", "OBD", "Powertrain", "Private", "Exterior"]
+
+
+def synthetic_catalogue(signals):
+    """Catalogue reply with about signals names, in nested lists per branch"""
+    per_branch = max(signals // len(BRANCHES), 1)
+    return {"REP": "VSS_catalogue", "D": [
+        [f"Vehicle.{branch}.Group{i // 20}.Signal{i}" for i in range(per_branch)] for branch in BRANCHES]}
+
+
+def bench_catalogue(signals, repeat=200):
+    reply = synthetic_catalogue(signals)
+    start = time.perf_counter()
+    catalogue = SignalCatalogue.from_reply(reply)
+    index_time = time.perf_counter() - start
+    start = time.perf_counter()
+    for _ in range(repeat):
+        selected = catalogue.match("Vehicle.Powertrain.*")
+    branch_time = (time.perf_counter() - start) / repeat
+    names = list(catalogue)
+    start = time.perf_counter()
+    for _ in range(repeat):
+        scanned = [name for name in names if name.startswith("Vehicle.Powertrain.")]
+    scan_time = (time.perf_counter() - start) / repeat
+    assert selected == scanned
+    print(f"catalogue of {len(catalogue)} signals, {len(selected)} in Vehicle.Powertrain\n")
+    print(f"{'index ms':>10}{'branch us':>11}{'prefix scan us':>16}")
+    print(f"{1000 * index_time:>10.2f}{1e6 * branch_time:>11.1f}{1e6 * scan_time:>16.1f}\n")
+
+
+def run_child(mode, port, certfile, phase):
+    """Change the subscription while connected, print the results as JSON lines"""
+    app = import_sample_app("127.0.0.1", port, certfile)
+    subscriptions = app.subscriptions
+    metrics = app.metrics
+    # All signals can be removed in this benchmark
+    subscriptions.required = frozenset()
+    # Receive time of the last value of every signal
+    last_values = {}
+    first_values = {}
+    for name in subscriptions.signals():
+        def received(value, name=name):
+            now = time.perf_counter()
+            last_values[name] = now
+            first_values.setdefault(name, now)
+        app.signal_dispatcher.register(name, received, converter=None, notify=False)
+
+    subscriber = app.get_signals_async if mode == "asyncio" else app.get_signals
+    threading.Thread(target=subscriber, args=("127.0.0.1", port, app.subscription_list), daemon=True).start()
+
+    def measure(label, change=None):
+        before = (metrics.bytes_received.value, metrics.signals_received.value, metrics.reconnects.value)
+        changed_at = time.perf_counter()
+        if change is not None:
+            first_values.clear()
+            changed = change()
+        time.sleep(phase)
+        after = (metrics.bytes_received.value, metrics.signals_received.value, metrics.reconnects.value)
+        result = {"phase": label, "bytes_per_second": (after[0] - before[0]) / phase,
+                  "signals_per_second": (after[1] - before[1]) / phase,
+                  "reconnects": after[2] - before[2], "signals": len(subscriptions), "change_ms": None}
+        if label == "removed":
+            result["change_ms"] = 1000 * (max(last_values[name] for name in changed) - changed_at)
+        elif label == "added":
+            result["change_ms"] = 1000 * (min(first_values[name] for name in changed) - changed_at)
+        print(json.dumps(result), flush=True)
+
+    while subscriptions.catalogue is None:
+        time.sleep(0.01)
+    measure("all")
+    measure("removed", lambda: subscriptions.remove(
+        *[name for name in subscriptions.signals() if name not in (VEHICLE_SPEED, UNIX_CLK_SEC)]))
+    measure("added", lambda: subscriptions.add("Vehicle.Powertrain.*"))
+    # The subscriber thread doesn't stop by itself
+    os._exit(0)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Subscription changes on the live connection")
+    parser.add_argument("--mode", choices=("thread", "asyncio"), default="thread",
+                        help="subscriber implementation")
+    parser.add_argument("--phase", type=float, default=3.0, help="seconds per subscription")
+    parser.add_argument("--rate", type=float, default=100.0, help="fake engine updates per second")
+    parser.add_argument("--catalogue-signals", type=int, default=20000, help="signals of the catalogue")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--port", type=int, help=argparse.SUPPRESS)
+    parser.add_argument("--cert", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        run_child(args.mode, args.port, args.cert, args.phase)
+        return
+
+    bench_catalogue(args.catalogue_signals)
+
+    certfile, keyfile = make_certificate()
+    engine = subprocess.Popen([sys.executable, os.path.join(BENCHMARK_DIR, "fake_moco_engine.py"),
+                               "--rate", str(args.rate), "--cert", certfile, "--key", keyfile],
+                              stdout=subprocess.PIPE, text=True)
+    try:
+        port = int(engine.stdout.readline())
+        child = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), "--child", "--mode", args.mode, "--port", str(port),
+             "--cert", certfile, "--phase", str(args.phase)],
+            stdout=subprocess.PIPE, text=True)
+    finally:
+        engine.terminate()
+        engine.wait()
+    print(f"live changes, {args.mode} subscriber, fake engine {args.rate:.0f} updates/s\n")
+    print(f"{'subscription':<14}{'signals':>8}{'bytes/s':>10}{'signals/s':>11}{'change ms':>11}{'reconnects':>12}")
+    for line in child.stdout.splitlines():
+        if not line.startswith("{"):
+            continue
+        result = json.loads(line)
+        change = "" if result["change_ms"] is None else f"{result['change_ms']:.1f}"
+        print(f"{result['phase']:<14}{result['signals']:>8}{result['bytes_per_second']:>10.0f}"
+              f"{result['signals_per_second']:>11.0f}{change:>11}{result['reconnects']:>12}")
+
+
+if __name__ == '__main__':
+    main()
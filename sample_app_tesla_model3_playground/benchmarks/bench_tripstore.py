@@ -0,0 +1,148 @@
+"""bench_tripstore summary
+Query of drive cycles by time in the trip store (moco_tripstore.py),
+compared to a text file with the same samples. Months of simulated drive
+cycles (--cycles drive cycles of --samples samples, two per day) are written
+to a trip store and to a CSV file with one sample per line. Both are queried
+for the drive cycles of one week: the mean speed of every drive cycle
+starting in the week is calculated.
+Reported are the file sizes, the time to write and the time to open and
+query, for the CSV file by parsing all lines, for the trip store by reading
+the index and the records of the drive cycles from the memory map, with
+array('d') and with numpy.memmap.
+
+Usage: python bench_tripstore.py [--cycles N] [--samples N] [--directory DIR]
+"""
+
+import argparse
+import csv
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(BENCHMARK_DIR, "..", "src"))
+
+from moco_tripstore import DATA_FILE, INDEX_FILE, TripStore, TripStoreReader
+from range_calculation import TRIP_COLUMNS
+
+START_TIME = 1700000000.0
+DAY = 86400.0
+
+
+def drive_cycles(cycles, samples):
+    """Yield the samples of each simulated drive cycle, 10 per second"""
+    odometer = 1000.0
+    for cycle in range(cycles):
+        start = START_TIME + cycle * DAY / 2
+        rows = []
+        for sample in range(samples):
+            speed = 30.0 + (cycle % 7) * 10.0 + (sample % 100) * 0.1
+            odometer += speed / 36000.0
+            rows.append((start + sample * 0.1, speed, 80.0 - sample * 0.001, 0.0, 300.0 - sample * 0.01, odometer))
+        yield rows
+
+
+def write_files(directory, cycles, samples):
+    """Write the trip store and the CSV file, return the write times"""
+    csv_time = store_time = 0.0
+    with TripStore(os.path.join(directory, "trips"), TRIP_COLUMNS) as store, \
+            open(os.path.join(directory, "trips.csv"), "w", newline="") as output_file:
+        csv_writer = csv.writer(output_file)
+        csv_writer.writerow(TRIP_COLUMNS)
+        for rows in drive_cycles(cycles, samples):
+            start = time.perf_counter()
+            for row in rows:
+                store.append(row)
+            store.end_cycle()
+            store_time += time.perf_counter() - start
+            start = time.perf_counter()
+            csv_writer.writerows(rows)
+            csv_time += time.perf_counter() - start
+    return csv_time, store_time
+
+
+def query_csv(filename, start_time, end_time):
+    """Mean speed of the drive cycles starting between the times, by
+    parsing the CSV file. A drive cycle starts after a gap of an hour
+    """
+    means = {}
+    with open(filename, newline="") as input_file:
+        reader = csv.reader(input_file)
+        next(reader)
+        cycle_start = previous = None
+        for row in reader:
+            sample_time = float(row[0])
+            if previous is None or sample_time - previous > 3600:
+                cycle_start = sample_time
+            previous = sample_time
+            if start_time <= cycle_start <= end_time:
+                total, count = means.get(cycle_start, (0.0, 0))
+                means[cycle_start] = (total + float(row[1]), count + 1)
+    return [total / count for total, count in means.values()]
+
+
+def query_store(directory, start_time, end_time):
+    """Mean speed of the drive cycles starting between the times, array('d')"""
+    with TripStoreReader(directory) as reader:
+        means = []
+        for segment in reader.find(start_time, end_time):
+            if segment.start_time >= start_time:
+                speed = reader.column(segment, "vehicle_speed")
+                means.append(sum(speed) / len(speed))
+        return means
+
+
+def query_store_numpy(directory, start_time, end_time):
+    """Mean speed of the drive cycles starting between the times, numpy"""
+    reader = TripStoreReader(directory)
+    means = [float(reader.numpy_records(segment)["vehicle_speed"].mean())
+             for segment in reader.find(start_time, end_time) if segment.start_time >= start_time]
+    reader.close()
+    return means
+
+
+def timed(function, *args):
+    start = time.perf_counter()
+    result = function(*args)
+    return result, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Query of drive cycles by time, trip store and CSV")
+    parser.add_argument("--cycles", type=int, default=180, help="drive cycles, two per day")
+    parser.add_argument("--samples", type=int, default=3000, help="samples per drive cycle")
+    parser.add_argument("--directory", help="directory of the files, a temporary directory by default")
+    args = parser.parse_args()
+
+    directory = args.directory or tempfile.mkdtemp(prefix="bench_tripstore_")
+    try:
+        csv_write, store_write = write_files(directory, args.cycles, args.samples)
+        csv_size = os.path.getsize(os.path.join(directory, "trips.csv"))
+        store_directory = os.path.join(directory, "trips")
+        store_size = sum(os.path.getsize(os.path.join(store_directory, name)) for name in (DATA_FILE, INDEX_FILE))
+        # The week in the middle of the simulated months
+        start_time = START_TIME + (args.cycles // 4) * DAY
+        end_time = start_time + 7 * DAY
+
+        csv_means, csv_query = timed(query_csv, os.path.join(directory, "trips.csv"), start_time, end_time)
+        store_means, store_query = timed(query_store, store_directory, start_time, end_time)
+        # Import time of numpy not included
+        import numpy  # noqa: F401
+        numpy_means, numpy_query = timed(query_store_numpy, store_directory, start_time, end_time)
+        assert len(csv_means) == len(store_means) == len(numpy_means)
+        assert all(abs(a - b) < 1e-9 and abs(a - c) < 1e-9 for a, b, c in zip(csv_means, store_means, numpy_means))
+
+        print(f"{args.cycles} drive cycles of {args.samples} samples, {len(store_means)} drive cycles in the week\n")
+        print(f"{'file':<20}{'size MB':>9}{'write s':>9}{'query ms':>10}")
+        print(f"{'csv':<20}{csv_size / 1e6:>9.1f}{csv_write:>9.2f}{1000 * csv_query:>10.1f}")
+        print(f"{'trip store':<20}{store_size / 1e6:>9.1f}{store_write:>9.2f}{1000 * store_query:>10.1f}")
+        print(f"{'trip store numpy':<20}{'':>9}{'':>9}{1000 * numpy_query:>10.1f}")
+    finally:
+        if not args.directory:
+            shutil.rmtree(directory)
+
+
+if __name__ == '__main__':
+    main()
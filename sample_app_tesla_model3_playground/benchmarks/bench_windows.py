@@ -0,0 +1,60 @@
+"""bench_windows summary
+Cost per sample of the windowed aggregation (moco_windows.py) for
+increasing window sizes, compared with recalculating the aggregates over a
+list of the samples in the window after every sample. The cost of the
+SignalWindow does not depend on the size of the window.
+
+Usage: python bench_windows.py [--samples N]
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(BENCHMARK_DIR, "..", "src"))
+
+from moco_windows import SignalWindow, SLIDING
+
+
+def bench_window(size, samples):
+    window = SignalWindow(SLIDING, samples=size)
+    start = time.perf_counter()
+    for time_stamp, value in samples:
+        window.add(time_stamp, value)
+        window.summary()
+    return (time.perf_counter() - start) / len(samples)
+
+
+def bench_list(size, samples):
+    times = []
+    values = []
+    start = time.perf_counter()
+    for time_stamp, value in samples:
+        times.append(time_stamp)
+        values.append(value)
+        if len(values) > size:
+            del times[0]
+            del values[0]
+        sum(values) / len(values)
+        min(values)
+        max(values)
+        sum(values[i] * (times[i + 1] - times[i]) for i in range(len(values) - 1))
+    return (time.perf_counter() - start) / len(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Windowed aggregation benchmark")
+    parser.add_argument("--samples", type=int, default=20000, help="samples per window size")
+    args = parser.parse_args()
+    rnd = random.Random(1)
+    samples = [(0.1 * i, rnd.uniform(0, 120)) for i in range(args.samples)]
+    print(f"{'window size':<12}{'SignalWindow ns':>16}{'list ns':>12}")
+    for size in (10, 100, 1000, 10000):
+        print(f"{size:<12}{1e9 * bench_window(size, samples):>16.0f}{1e9 * bench_list(size, samples):>12.0f}")
+
+
+if __name__ == '__main__':
+    main()
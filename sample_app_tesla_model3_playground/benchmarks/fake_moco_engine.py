@@ -0,0 +1,262 @@
+"""fake_moco_engine summary
+Local stand-in for the Moco engine, used by the benchmarks. The fake engine
+is a TLS server that speaks the same protocol as the Moco engine: it replies
+to the subscription list with a catalogue, streams {"N": .., "V": ..} signal
+messages of a simulated drive and replies to synchronisation messages.
+A new subscription list sent on a live connection replaces the subscribed
+signals, the stream continues with the new signals.
+The UnixTime signal is sent as the local time of sending (with fractions of
+seconds), which allows a client to measure the latency of each message.
+To test the robustness of a client the engine can split the stream in small
+writes at random positions (partial frames) and can drop every connection
+after a number of seconds (engine restart).
+
+Usage: python fake_moco_engine.py [--count N] [--rate R] [--port P]
+                                  [--partial] [--disconnect-after S]
+Prints the listening port of each engine and runs until interrupted.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import ssl
+import subprocess
+import tempfile
+import time
+
+
+# Signals supported by the fake engine
+SUPPORTED_SIGNALS = [
+    "Vehicle.Private.PowerState",
+    "Vehicle.Powertrain.TractionBattery.StateOfCharge.Displayed",
+    "Vehicle.Powertrain.Range",
+    "Vehicle.Private.UnixTime.Seconds",
+    "Vehicle.Speed",
+    "Vehicle.Powertrain.Transmission.TravelledDistance",
+    "Vehicle.Cabin.HVAC.IsAirConditioningActive",
+]
+
+SUPPORTED_ATTRIBUTES = ["Vehicle.Body.BodyType", "Vehicle.Powertrain.Type"]
+ATTRIBUTE_VALUES = {"Vehicle.Body.BodyType": "Sedan", "Vehicle.Powertrain.Type": "EV Motor"}
+
+
+def make_certificate(directory=None):
+    """Create a self signed certificate with the openssl command line tool.
+    Returns the (certificate file, key file) paths
+    """
+    directory = directory or tempfile.mkdtemp(prefix="fake_moco_engine_")
+    certfile = os.path.join(directory, "fake-moco-engine.pem")
+    keyfile = os.path.join(directory, "fake-moco-engine.key")
+    if not os.path.exists(certfile):
+        subprocess.run(["openssl", "req", "-x509", "-newkey", "rsa:2048", "-nodes",
+                        "-keyout", keyfile, "-out", certfile, "-days", "2",
+                        "-subj", "/CN=localhost"],
+                       check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    return certfile, keyfile
+
+
+def client_context(certfile):
+    """SSL context for connecting to the fake engine, configured in the same
+    way as the context of the sample application
+    """
+    context = ssl.SSLContext(ssl.PROTOCOL_TLS_CLIENT)
+    context.verify_mode = ssl.CERT_OPTIONAL
+    context.check_hostname = False
+    context.load_verify_locations(cafile=certfile)
+    return context
+
+
+class DriveSimulation:
+    """Signal values of a simple simulated drive, advanced once per tick"""
+
+    def __init__(self, speed=50.0):
+        self.speed = speed
+        self.odo = 1000.0
+        self.soc = 80.0
+        self.range = 300000.0
+
+    def tick(self, interval):
+        distance = self.speed * interval / 3600.0
+        self.odo += distance
+        self.range -= distance * 1100.0
+        self.soc -= distance * 0.15
+        return {
+            "Vehicle.Private.PowerState": "VEHICLE_POWER_STATE_DRIVE",
+            "Vehicle.Powertrain.TractionBattery.StateOfCharge.Displayed": round(self.soc, 3),
+            "Vehicle.Powertrain.Range": round(self.range, 1),
+            "Vehicle.Speed": self.speed,
+            "Vehicle.Powertrain.Transmission.TravelledDistance": round(self.odo, 4),
+            "Vehicle.Cabin.HVAC.IsAirConditioningActive": "false",
+            "Vehicle.Private.UnixTime.Seconds": time.time(),
+        }
+
+
+class FakeMocoEngine:
+    """_summary_
+    TLS server simulating one Moco engine
+
+    Args:
+        certfile : Certificate file of the server
+        keyfile : Private key file of the server
+        rate : Number of updates per second, every update sends all
+               subscribed signals. 0 to send updates as fast as possible
+        host : Listening address
+        port : Listening port, 0 to select a free port
+        partial : Split the stream in writes of random size, so that
+                  messages are split across TLS records at any position
+        disconnect_after : Close every connection after this many seconds,
+                           None to keep connections open
+    """
+
+    def __init__(self, certfile, keyfile, rate=10.0, host="127.0.0.1", port=0,
+                 partial=False, disconnect_after=None):
+        self.context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+        self.context.load_cert_chain(certfile, keyfile)
+        self.rate = rate
+        self.host = host
+        self.port = port
+        self.partial = partial
+        self.disconnect_after = disconnect_after
+        self.server = None
+        self.connections = 0
+        self.messages_sent = 0
+
+    async def start(self):
+        self.server = await asyncio.start_server(self._handle, self.host, self.port, ssl=self.context)
+        self.port = self.server.sockets[0].getsockname()[1]
+        return self
+
+    async def stop(self):
+        self.server.close()
+        await self.server.wait_closed()
+
+    def _reply(self, request):
+        """Reply to the subscription list sent by the client"""
+        names = [name for name in request.get("D", "").split(",") if name]
+        if request.get("CMD") == "vsi":
+            if names == ["VSI_catalogue"]:
+                return [{"REP": "VSI_catalogue", "D": SUPPORTED_ATTRIBUTES}], []
+            return [{"N": name, "V": ATTRIBUTE_VALUES[name]} for name in names if name in ATTRIBUTE_VALUES], []
+        return [{"REP": "VSS_catalogue", "D": SUPPORTED_SIGNALS}], [name for name in names if name in SUPPORTED_SIGNALS]
+
+    async def _handle(self, reader, writer):
+        self.connections += 1
+        try:
+            request = json.loads(await reader.read(65536))
+            replies, subscribed = self._reply(request)
+            for reply in replies:
+                writer.write(json.dumps(reply).encode("utf-8") + b"\n")
+            await writer.drain()
+            commands = asyncio.ensure_future(self._commands(reader, writer, subscribed))
+            try:
+                if subscribed or request.get("CMD") == "vss":
+                    await self._stream(writer, subscribed)
+                else:
+                    await commands
+            finally:
+                commands.cancel()
+        except (OSError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+    async def _commands(self, reader, writer, subscribed):
+        """Reply to synchronisation messages and new subscription lists from
+        the client. A new subscription list replaces the signals in subscribed
+        """
+        decoder = json.JSONDecoder()
+        received = ""
+        while True:
+            data = await reader.read(4096)
+            if not data:
+                writer.close()
+                return
+            received += data.decode("utf-8")
+            while True:
+                received = received.lstrip()
+                try:
+                    command, end = decoder.raw_decode(received)
+                except ValueError:
+                    # Incomplete message, completed by the next read
+                    break
+                received = received[end:]
+                if command.get("CMD") == "sync":
+                    writer.write(b'{"REP":"sync"}\n')
+                elif command.get("CMD") == "vss":
+                    replies, subscribed[:] = self._reply(command)
+                    for reply in replies:
+                        writer.write(json.dumps(reply).encode("utf-8") + b"\n")
+
+    async def _write(self, writer, data):
+        if not self.partial:
+            writer.write(data)
+            return
+        position = 0
+        while position < len(data):
+            size = random.randint(1, 64)
+            writer.write(data[position:position + size])
+            await writer.drain()
+            position += size
+
+    async def _stream(self, writer, subscribed):
+        loop = asyncio.get_event_loop()
+        interval = 1.0 / self.rate if self.rate > 0 else 0.0
+        simulation = DriveSimulation()
+        start = next_tick = loop.time()
+        while not writer.is_closing():
+            # The subscribed signals can be changed by a new subscription list
+            other_signals = [name for name in subscribed if name != "Vehicle.Private.UnixTime.Seconds"]
+            send_time = "Vehicle.Private.UnixTime.Seconds" in subscribed
+            if self.disconnect_after is not None and loop.time() - start > self.disconnect_after:
+                # Simulate a restart of the engine
+                return
+            # Without a rate limit updates are sent in batches between drains
+            batch = []
+            for _ in range(1 if interval else 64):
+                values = simulation.tick(interval or 0.01)
+                for name in other_signals:
+                    batch.append(json.dumps({"N": name, "V": values[name]}))
+                # The time signal is sent last, after all other signals of the update
+                if send_time:
+                    batch.append(json.dumps({"N": "Vehicle.Private.UnixTime.Seconds", "V": time.time()}))
+            if batch:
+                await self._write(writer, ("\n".join(batch) + "\n").encode("utf-8"))
+                self.messages_sent += len(batch)
+                await writer.drain()
+            if interval:
+                next_tick += interval
+                await asyncio.sleep(max(0.0, next_tick - loop.time()))
+            else:
+                # Without subscribed signals, wait for a new subscription list
+                await asyncio.sleep(0 if batch else 0.01)
+
+
+async def serve(count, rate, port, certfile, keyfile, partial=False, disconnect_after=None):
+    engines = [await FakeMocoEngine(certfile, keyfile, rate, port=port + i if port else 0,
+                                    partial=partial, disconnect_after=disconnect_after).start()
+               for i in range(count)]
+    print(" ".join(str(engine.port) for engine in engines), flush=True)
+    await asyncio.Event().wait()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Fake Moco engine")
+    parser.add_argument("--count", type=int, default=1, help="number of engines (vehicles)")
+    parser.add_argument("--rate", type=float, default=10.0, help="updates per second per engine, 0 for unlimited")
+    parser.add_argument("--port", type=int, default=0, help="first listening port, 0 for free ports")
+    parser.add_argument("--partial", action="store_true", help="split messages across writes at random positions")
+    parser.add_argument("--disconnect-after", type=float, help="close each connection after this many seconds")
+    parser.add_argument("--cert", help="certificate file, created when not given")
+    parser.add_argument("--key", help="key file of the certificate")
+    args = parser.parse_args()
+    if args.cert:
+        cert, key = args.cert, args.key
+    else:
+        cert, key = make_certificate()
+        print(f"Certificate: {cert}", flush=True)
+    try:
+        asyncio.run(serve(args.count, args.rate, args.port, cert, key, args.partial, args.disconnect_after))
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,157 @@
+"""moco_buffer summary
+Bounded buffer between the subscriber and the application thread. The
+subscriber puts items (e.g. the values of all signals at every time signal
+of the Moco engine) and the application thread takes them in order. When the
+application falls behind, the buffer never grows beyond its capacity. What
+happens to further items is set by the policy of the buffer:
+
+keep_latest : Only the latest item is kept, waiting items are replaced
+drop_oldest : The oldest waiting item is dropped
+block : The subscriber waits until the application took items, so the
+        backpressure reaches Moco engine through the TCP connection
+spill : Further items are written to a temporary file in chunks and read
+        back in order, memory stays bounded and no item is lost
+
+Dropped and spilled items and the time the subscriber was blocked are
+counted in the metrics (moco_metrics.py).
+"""
+
+import os
+import pickle
+import tempfile
+import threading
+import time
+from collections import deque
+
+
+KEEP_LATEST = "keep_latest"
+DROP_OLDEST = "drop_oldest"
+BLOCK = "block"
+SPILL = "spill"
+POLICIES = (KEEP_LATEST, DROP_OLDEST, BLOCK, SPILL)
+
+
+class SignalBuffer:
+    """_summary_
+    Bounded first in, first out buffer with an overflow policy
+
+    Args:
+        policy : keep_latest, drop_oldest, block or spill
+        capacity : Maximum number of items held in memory, 1 for keep_latest
+        spill_directory : Directory of the spill file, None for the default
+                          temporary directory
+        spill_chunk : Number of items written to the spill file at once
+        metrics : SubscriberMetrics updated by the buffer, None for no
+                  metrics
+
+    put() is called by one thread (the subscriber), take() by another thread
+    (the application). With spill the items must be picklable.
+    """
+
+    def __init__(self, policy=KEEP_LATEST, capacity=1000, spill_directory=None, spill_chunk=256,
+                 metrics=None):
+        if policy not in POLICIES:
+            raise ValueError(f"Unknown buffer policy {policy}, expected one of {', '.join(POLICIES)}")
+        self.policy = policy
+        self.capacity = 1 if policy == KEEP_LATEST else max(capacity, 1)
+        self.spill_directory = spill_directory
+        self.spill_chunk = max(spill_chunk, 1)
+        self.metrics = metrics
+        self.closed = False
+        self._items = deque()
+        self._condition = threading.Condition(threading.Lock())
+        # Spilled items: chunks in the file between _read_position and the
+        # end of the file, followed by the chunk not yet written
+        self._file = None
+        self._read_position = 0
+        self._file_items = 0
+        self._chunk = []
+
+    def __len__(self):
+        return len(self._items) + self._file_items + len(self._chunk)
+
+    @property
+    def spill_bytes(self):
+        """Size of the spill file in bytes"""
+        return os.fstat(self._file.fileno()).st_size if self._file is not None else 0
+
+    def put(self, item):
+        """Add an item, handled according to the policy when the buffer is full"""
+        with self._condition:
+            if self.policy == SPILL and (self._file_items or self._chunk or len(self._items) >= self.capacity):
+                # Once spilling, newer items follow the spilled items
+                self._spill(item)
+                return
+            if len(self._items) >= self.capacity:
+                if self.policy == BLOCK and not self.closed:
+                    start = time.perf_counter()
+                    self._condition.wait_for(lambda: len(self._items) < self.capacity or self.closed)
+                    if self.metrics is not None:
+                        self.metrics.subscriber_blocked.inc(time.perf_counter() - start)
+                else:
+                    self._items.popleft()
+                    if self.metrics is not None:
+                        self.metrics.samples_dropped.inc()
+            self._items.append(item)
+
+    def _spill(self, item):
+        self._chunk.append(item)
+        if self.metrics is not None:
+            self.metrics.samples_spilled.inc()
+        if len(self._chunk) >= self.spill_chunk:
+            if self._file is None:
+                self._file = tempfile.TemporaryFile(prefix="moco_spill_", dir=self.spill_directory)
+            self._file.seek(0, 2)
+            pickle.dump(self._chunk, self._file, pickle.HIGHEST_PROTOCOL)
+            self._file_items += len(self._chunk)
+            self._chunk = []
+
+    def _unspill(self):
+        """Move the oldest spilled items into memory, returns False when
+        there are no spilled items
+        """
+        if self._file_items:
+            self._file.seek(self._read_position)
+            chunk = pickle.load(self._file)
+            self._read_position = self._file.tell()
+            self._file_items -= len(chunk)
+            if not self._file_items:
+                # All chunks read, the file is reused from the start
+                self._file.seek(0)
+                self._file.truncate()
+                self._read_position = 0
+        elif self._chunk:
+            chunk, self._chunk = self._chunk, []
+        else:
+            return False
+        self._items.extend(chunk)
+        return True
+
+    def take(self, limit=None):
+        """Remove and return up to limit (by default capacity) of the oldest
+        items, in the order they were put. Returns an empty list when the
+        buffer is empty
+        """
+        limit = limit or self.capacity
+        with self._condition:
+            items = []
+            while len(items) < limit:
+                if not self._items and not self._unspill():
+                    break
+                items.append(self._items.popleft())
+            if items and self.policy == BLOCK:
+                self._condition.notify()
+            return items
+
+    def close(self):
+        """Release a blocked put() and remove the spill file. Items put
+        after closing are not blocked
+        """
+        with self._condition:
+            self.closed = True
+            self._condition.notify_all()
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+                self._file_items = 0
+                self._chunk = []
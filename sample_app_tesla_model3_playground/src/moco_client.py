@@ -0,0 +1,318 @@
+"""moco_client summary
+asyncio based client for the Moco engine. The client is an alternative for
+the get_signals subscriber thread: it connects to the Moco engine, sends the
+subscription list, receives the catalogue reply and then streams the
+received signals to a SignalDispatcher.
+Instead of polling the socket with read timeouts, the client is completely
+event driven. A timer sends the synchronisation message when no data has
+been received for a while and closes the connection when the Moco engine
+does not reply. After losing a connection that streamed signals for a while
+the client reconnects at once, otherwise (connection failed, or lost before
+or shortly after the first signal) with an exponential back-off with random
+jitter. It subscribes again resuming the TLS session of the previous
+connection (moco_tls.py). Because
+no thread is blocked per connection, one process can hold many clients.
+The subscription list can be changed while connected with subscribe(), the
+new list is sent on the live connection and after every reconnect.
+"""
+
+import asyncio
+import json
+import random
+import time
+
+from moco_decoder import FrameDecoder
+from moco_framer import FrameBuffer
+from moco_logging import console
+from moco_tls import ResumingContext
+
+
+# Definition of synchronisation message
+SYNC_MESSAGE = json.dumps({"CMD": "sync"}).encode("utf-8")
+
+# States of the client connection
+STATE_DISCONNECTED = "disconnected"
+STATE_CONNECTING = "connecting"
+STATE_SUBSCRIBING = "subscribing"
+STATE_STREAMING = "streaming"
+STATE_BACKOFF = "backoff"
+STATE_STOPPED = "stopped"
+
+
+class MocoEngineClient:
+    """_summary_
+    Event driven connection to one Moco engine
+
+    Args:
+        host : Host name or IP address of the Moco engine
+        port : TCP port of the Moco engine
+        ssl_context : ssl.SSLContext used to set up the TLS connection
+        subscription : Subscription list, e.g. {"CMD": "vss", "D": "..."}
+        dispatcher : SignalDispatcher receiving the streamed signals
+        sync_interval : Seconds without received data before a
+                        synchronisation message is sent
+        sync_timeout : Seconds to wait for the reply to a synchronisation
+                       message before the connection is considered lost
+        reconnect_delay : Back-off delay in seconds after the first failed
+                          connection attempt, doubled for every next attempt
+        reconnect_max_delay : Upper limit of the back-off delay in seconds
+        max_reconnects : Number of failed connection attempts in a row after
+                         which the client stops, None to retry forever
+        min_streaming : Seconds a connection must stream signals for its loss
+                        to be reconnected at once. A connection lost earlier
+                        counts as failed attempt and is followed by the
+                        back-off
+        read_size : Maximum number of bytes read from the stream at once
+        decoder : FrameDecoder used to decode received messages, None for a
+                  decoder with the default settings
+        capture : StreamCapture to which all received data is written, None
+                  to not capture the stream
+        metrics : SubscriberMetrics updated by the client, None for no
+                  metrics
+        resume_session : Resume the TLS session of the previous connection
+                         when reconnecting, False for a full handshake
+
+    Optional callbacks, set as attributes after creating the client:
+        on_catalogue(reply) : Catalogue reply received from Moco engine
+        on_batch() : Received data contained a signal requesting notify
+        on_sync() : Reply to a synchronisation message received
+        on_state(state) : Connection state changed
+        on_stopped() : Client stopped, no more reconnect attempts
+    """
+
+    def __init__(self, host, port, ssl_context, subscription, dispatcher,
+                 sync_interval=5.0, sync_timeout=10.0, reconnect_delay=1.0,
+                 reconnect_max_delay=30.0, max_reconnects=10, min_streaming=10.0, read_size=65536,
+                 decoder=None, capture=None, metrics=None, resume_session=True):
+        self.host = host
+        self.port = int(port)
+        self.ssl_context = ResumingContext(ssl_context, resume_session) if ssl_context is not None else None
+        self.subscription = subscription
+        self.dispatcher = dispatcher
+        self.sync_interval = sync_interval
+        self.sync_timeout = sync_timeout
+        self.reconnect_delay = reconnect_delay
+        self.reconnect_max_delay = reconnect_max_delay
+        self.max_reconnects = max_reconnects
+        self.min_streaming = min_streaming
+        self.read_size = read_size
+        self.decoder = decoder if decoder is not None else FrameDecoder()
+        self.capture = capture
+        self.metrics = metrics
+
+        self.on_catalogue = None
+        self.on_batch = None
+        self.on_sync = None
+        self.on_state = None
+        self.on_stopped = None
+
+        self.state = STATE_DISCONNECTED
+        self.catalogue = None
+        self.data_received = False
+        self.reconnect_count = 0
+        self.sync_round_trip = None
+        # Seconds from the last connection loss to the first signal
+        self.reconnect_first_signal = None
+        self._disconnected = None
+        self._attempt = 0
+        # Time the first signal of the current connection was received
+        self._streaming_since = None
+        self._last_receive = 0.0
+        self._sync_sent = None
+        self._stopping = False
+        self._writer = None
+        self._loop = None
+
+    def _set_state(self, state):
+        self.state = state
+        if self.on_state is not None:
+            self.on_state(state)
+
+    def backoff_delay(self, attempt):
+        """Delay before connection attempt number attempt (1 for the first
+        retry). Half of the delay is random to spread the reconnects of many
+        clients after an engine restart.
+        """
+        delay = min(self.reconnect_max_delay, self.reconnect_delay * 2 ** (attempt - 1))
+        return random.uniform(delay / 2, delay)
+
+    def subscribe(self, subscription):
+        """Change the subscription list, can be called from any thread. When
+        connected the new list is sent to Moco engine at once
+        """
+        self.subscription = subscription
+        if self._loop is not None:
+            self._loop.call_soon_threadsafe(self._send_subscription)
+
+    def _send_subscription(self):
+        if self._writer is not None and not self._writer.is_closing():
+            self._writer.write(json.dumps(self.subscription).encode("utf-8"))
+
+    def stop(self):
+        """Stop the client, must be called from the event loop running it"""
+        self._stopping = True
+        if self._writer is not None:
+            self._writer.close()
+
+    async def run(self):
+        """Connect to the Moco engine and stream signals until stop() is
+        called or the maximum number of reconnect attempts is exceeded
+        """
+        self._loop = asyncio.get_event_loop()
+        while not self._stopping:
+            # Only a connection opened in this pass can have streamed
+            self._streaming_since = None
+            self._set_state(STATE_CONNECTING)
+            try:
+                reader, writer = await asyncio.open_connection(
+                    self.host, self.port, ssl=self.ssl_context,
+                    server_hostname=self.host if self.ssl_context is not None else None)
+            except OSError as _e:
+                if isinstance(_e, ConnectionRefusedError):
+                    console.info('Waiting for server to (re-)start')
+                else:
+                    console.info(_e)
+            else:
+                self._writer = writer
+                try:
+                    await self._session(reader, writer)
+                except (OSError, ValueError, KeyError) as _e:
+                    # Connection lost or malformed data, reconnect
+                    console.info(_e)
+                finally:
+                    self._writer = None
+                    writer.close()
+                    if self._disconnected is None:
+                        self._disconnected = time.perf_counter()
+            if self._stopping:
+                break
+            # Connection lost after streaming signals for min_streaming
+            # seconds, reconnect at once. Any other connection loss (e.g.
+            # Moco engine accepts the subscription and drops the connection)
+            # is a failed attempt followed by the back-off
+            streamed = (self._streaming_since is not None
+                        and time.monotonic() - self._streaming_since >= self.min_streaming)
+            self._set_state(STATE_DISCONNECTED)
+            if streamed:
+                self._attempt = 0
+            else:
+                self._attempt += 1
+            if self.max_reconnects is not None and self._attempt > self.max_reconnects:
+                console.info("Re-connection to Moco engine failed")
+                break
+            self.reconnect_count += 1
+            if self.metrics is not None:
+                self.metrics.reconnects.inc()
+            if streamed:
+                continue
+            self._set_state(STATE_BACKOFF)
+            await asyncio.sleep(self.backoff_delay(self._attempt))
+        self._loop = None
+        self._set_state(STATE_STOPPED)
+        if self.on_stopped is not None:
+            self.on_stopped()
+
+    async def _session(self, reader, writer):
+        """Subscribe and process the received data of one connection"""
+        loop = asyncio.get_event_loop()
+        frame_buffer = FrameBuffer(self.read_size)
+        if self.capture is not None:
+            self.capture.mark_reconnect()
+        metrics = self.metrics
+        if metrics is not None:
+            metrics.buffered_bytes.function = frame_buffer.__len__
+        dispatch = self.dispatcher.dispatch
+        decode = self.decoder.decode
+        self._sync_sent = None
+        self._last_receive = loop.time()
+        self._set_state(STATE_SUBSCRIBING)
+        writer.write(json.dumps(self.subscription).encode("utf-8"))
+        await writer.drain()
+        heartbeat = asyncio.ensure_future(self._heartbeat(writer))
+        ssl_object = writer.get_extra_info("ssl_object")
+        try:
+            while True:
+                data = await reader.read(self.read_size)
+                if not data:
+                    # Moco engine closed the connection
+                    return
+                if ssl_object is not None:
+                    # The session ticket is received after the handshake
+                    resumed = self.ssl_context.established(ssl_object)
+                    ssl_object = None
+                    if metrics is not None:
+                        metrics.tls_handshakes.inc()
+                        if resumed:
+                            metrics.tls_resumed.inc()
+                self._last_receive = loop.time()
+                if self.capture is not None:
+                    self.capture.write(data)
+                start = time.perf_counter()
+                frame_buffer.feed(data)
+                notify = False
+                frames = frame_buffer.frames()
+                signals = 0
+                for frame in frames:
+                    name, value = decode(frame)
+                    if name is None:
+                        self._handle_reply(value)
+                    else:
+                        signals += 1
+                        self.data_received = True
+                        if dispatch(name, value):
+                            notify = True
+                if signals and self.state == STATE_SUBSCRIBING:
+                    # First signal of the stream, subscription accepted
+                    self._streaming_since = time.monotonic()
+                    self._set_state(STATE_STREAMING)
+                if notify and self.on_batch is not None:
+                    self.on_batch()
+                if signals and self._disconnected is not None:
+                    self.reconnect_first_signal = time.perf_counter() - self._disconnected
+                    self._disconnected = None
+                    if metrics is not None:
+                        metrics.reconnect_first_signal.observe(self.reconnect_first_signal)
+                if metrics is not None:
+                    metrics.bytes_received.value += len(data)
+                    metrics.frames_received.value += len(frames)
+                    metrics.signals_received.value += signals
+                    metrics.decode_time.observe(time.perf_counter() - start)
+        finally:
+            heartbeat.cancel()
+
+    def _handle_reply(self, message):
+        if message["REP"] == "sync":
+            if self._sync_sent is not None:
+                self.sync_round_trip = asyncio.get_event_loop().time() - self._sync_sent
+                self._sync_sent = None
+                if self.metrics is not None:
+                    self.metrics.sync_round_trip.observe(self.sync_round_trip)
+            if self.on_sync is not None:
+                self.on_sync()
+        elif message["REP"] in ("VSS_catalogue", "VSI_catalogue"):
+            self.catalogue = message
+            if self.on_catalogue is not None:
+                self.on_catalogue(message)
+
+    async def _heartbeat(self, writer):
+        """Send the synchronisation message when no data was received for
+        sync_interval seconds and close the connection when the reply takes
+        longer than sync_timeout seconds
+        """
+        loop = asyncio.get_event_loop()
+        while True:
+            if self._sync_sent is not None:
+                wait = self._sync_sent + self.sync_timeout - loop.time()
+                if wait <= 0:
+                    console.info("No reply to sync message from Moco engine")
+                    writer.close()
+                    return
+            else:
+                wait = self._last_receive + self.sync_interval - loop.time()
+                if wait <= 0:
+                    self._sync_sent = loop.time()
+                    writer.write(SYNC_MESSAGE)
+                    wait = self.sync_timeout
+            # Wake up at least every sync_interval, the reply to a sync
+            # message restarts the interval
+            await asyncio.sleep(min(wait, self.sync_interval))
@@ -0,0 +1,220 @@
+"""moco_dashboard summary
+Live dashboard of the logged data, drawn while driving instead of once
+after logging ended. The application thread only puts every logged sample
+in a bounded queue (LiveDashboard.append), the graphs are drawn in a
+separate process with the non-interactive Agg backend of matplotlib, so
+drawing never holds the GIL of the subscriber and application threads and
+needs no display. The image file is replaced at most fps times per second
+and the final image is saved when the dashboard is closed.
+
+The samples of each panel are kept in a DecimatedSeries: a buffer of
+bounded size that is downsampled with the Largest-Triangle-Three-Buckets
+algorithm (lttb) when full, so the whole drive stays visible with bounded
+memory, and is downsampled again to a fixed number of points for drawing.
+"""
+
+import multiprocessing
+import os
+import queue
+import time
+
+
+# Panels of the dashboard: (title, column of the logged samples). The
+# columns are indexes into a row of LOG_COLUMNS of range_calculation.py
+TIME_COLUMN = 0
+PANELS = (
+    ("Vehicle speed", 1),
+    ("State of charge", 2),
+    ("Range vs Distance traveled", 4),
+    ("Distance traveled", 5),
+)
+
+
+def lttb(times, values, threshold):
+    """_summary_
+    Downsample a series with the Largest-Triangle-Three-Buckets algorithm
+
+    Args:
+        times : Times (x values) of the series, increasing
+        values : Values (y values) of the series
+        threshold : Number of points to keep, at least 3
+
+    The first and last point are kept, from every bucket in between the
+    point forming the largest triangle with the previously kept point and
+    the average of the next bucket is kept. Returns (times, values) lists.
+    """
+    count = len(values)
+    if threshold >= count or threshold < 3:
+        return list(times), list(values)
+    sampled_times = [times[0]]
+    sampled_values = [values[0]]
+    every = (count - 2) / (threshold - 2)
+    kept = 0
+    for bucket in range(threshold - 2):
+        average_start = int((bucket + 1) * every) + 1
+        average_end = min(int((bucket + 2) * every) + 1, count)
+        average_size = average_end - average_start
+        average_time = sum(times[average_start:average_end]) / average_size
+        average_value = sum(values[average_start:average_end]) / average_size
+
+        kept_time = times[kept]
+        kept_value = values[kept]
+        largest = -1.0
+        for index in range(int(bucket * every) + 1, average_start):
+            area = abs((kept_time - average_time) * (values[index] - kept_value)
+                       - (kept_time - times[index]) * (average_value - kept_value))
+            if area > largest:
+                largest = area
+                selected = index
+        sampled_times.append(times[selected])
+        sampled_values.append(values[selected])
+        kept = selected
+    sampled_times.append(times[-1])
+    sampled_values.append(values[-1])
+    return sampled_times, sampled_values
+
+
+class DecimatedSeries:
+    """_summary_
+    Series of bounded size, downsampled when full
+
+    Args:
+        capacity : Maximum number of points, when exceeded the series is
+                   downsampled to half the capacity with lttb
+    """
+
+    def __init__(self, capacity=20000):
+        self.capacity = max(capacity, 6)
+        self.times = []
+        self.values = []
+
+    def __len__(self):
+        return len(self.values)
+
+    def append(self, time_stamp, value):
+        self.times.append(time_stamp)
+        self.values.append(value)
+        if len(self.values) > self.capacity:
+            self.times, self.values = lttb(self.times, self.values, self.capacity // 2)
+
+    def points(self, threshold):
+        """Return the series downsampled to at most threshold points"""
+        return lttb(self.times, self.values, threshold)
+
+
+class LiveDashboard:
+    """_summary_
+    Dashboard of the logged samples drawn in a separate process
+
+    Args:
+        filename : Image file replaced with every drawn frame
+        fps : Maximum number of frames drawn per second
+        points : Number of points drawn per panel
+        capacity : Maximum number of samples kept per panel
+        queue_size : Maximum number of samples waiting for the drawing
+                     process, further samples are dropped
+        start_method : Start method of the drawing process, see
+                       multiprocessing
+
+    The rows passed to append() hold the values of LOG_COLUMNS. When
+    matplotlib is not installed the drawing process ends without drawing.
+    """
+
+    def __init__(self, filename="dashboard.png", fps=2.0, points=1000, capacity=20000,
+                 queue_size=10000, start_method="spawn"):
+        self.filename = filename
+        context = multiprocessing.get_context(start_method)
+        self.queue = context.Queue(queue_size)
+        self.dropped = 0
+        self.process = context.Process(target=_draw_dashboard, name="dashboard", daemon=True,
+                                       args=(self.queue, filename, fps, points, capacity))
+
+    def start(self):
+        self.process.start()
+        return self
+
+    def append(self, row):
+        """Add a logged sample, without waiting for the drawing process"""
+        try:
+            self.queue.put_nowait(row)
+        except queue.Full:
+            self.dropped += 1
+
+    def close(self, final_filename=None, timeout=30.0):
+        """_summary_
+        Draw the last frame and stop the drawing process
+
+        Args:
+            final_filename : File to which the final image is saved, None
+                             to only update the dashboard image
+            timeout : Seconds to wait for the drawing process
+        """
+        try:
+            self.queue.put((None, final_filename), timeout=timeout)
+        except queue.Full:
+            pass
+        self.process.join(timeout)
+
+
+def _draw_dashboard(samples, filename, fps, points, capacity):
+    """Drawing process of the LiveDashboard"""
+    try:
+        import matplotlib
+        matplotlib.use("Agg")
+        import matplotlib.pyplot as plt
+    except ImportError:
+        # Wait for the end of the drive, so the queue doesn't fill up
+        while samples.get()[0] is not None:
+            pass
+        return
+
+    series = [DecimatedSeries(capacity) for _ in PANELS]
+    figure, subplot = plt.subplots(2, 2)
+    axes = [subplot[1, 0], subplot[0, 0], subplot[0, 1], subplot[1, 1]]
+    lines = []
+    for ax, (title, _) in zip(axes, PANELS):
+        ax.set_title(title)
+        lines.append(ax.plot([], [])[0])
+    lines[2].set_color("b")
+    lines[2].set_label("Range")
+    # Distance traveled on the inverted second axis of the range panel
+    twin = subplot[0, 1].twinx()
+    twin.invert_yaxis()
+    twin_line = twin.plot([], [], "r-", label="Distance traveled")[0]
+    temporary = f"{filename}.tmp{os.path.splitext(filename)[1]}"
+
+    def draw(target):
+        for line, ax, values in zip(lines, axes, series):
+            line.set_data(*values.points(points))
+            ax.relim()
+            ax.autoscale_view()
+        twin_line.set_data(*series[3].points(points))
+        twin.relim()
+        twin.autoscale_view()
+        figure.savefig(target, dpi=100)
+
+    interval = 1.0 / fps if fps > 0 else 0.0
+    next_frame = time.monotonic()
+    changed = False
+    while True:
+        try:
+            row = samples.get(timeout=max(0.0, next_frame - time.monotonic()) if changed else None)
+        except queue.Empty:
+            row = ()
+        if row and row[0] is None:
+            break
+        if row:
+            for values, (_, column) in zip(series, PANELS):
+                values.append(row[TIME_COLUMN], row[column])
+            changed = True
+        if changed and time.monotonic() >= next_frame:
+            draw(temporary)
+            os.replace(temporary, filename)
+            changed = False
+            next_frame = time.monotonic() + interval
+    draw(temporary)
+    os.replace(temporary, filename)
+    final_filename = row[1]
+    if final_filename:
+        figure.savefig(final_filename, format="jpeg", dpi=100)
+    plt.close(figure)
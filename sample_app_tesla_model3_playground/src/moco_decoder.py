@@ -0,0 +1,115 @@
+"""moco_decoder summary
+Decoding of the messages (frames) received from the Moco engine. Nearly all
+frames are signal messages with the fixed shape {"N":"<name>","V":<value>}.
+For these frames the FrameDecoder has a fast path that takes the name and
+the value directly from the bytes, without building a dictionary. All other
+frames, e.g. the replies ({"REP": ...}) of Moco engine, are decoded by a
+JSON library. orjson or ujson are used when installed, otherwise the json
+module of the standard library. The fast path is written in Python and is
+faster than the json module, but slower than orjson or ujson, so by default
+it is only used together with the json module.
+"""
+
+import json
+import re
+
+
+# Available JSON decoding backends, in order of preference
+JSON_BACKENDS = {}
+
+try:
+    import orjson
+    JSON_BACKENDS["orjson"] = orjson.loads
+except ImportError:
+    pass
+
+try:
+    import ujson
+    JSON_BACKENDS["ujson"] = ujson.loads
+except ImportError:
+    pass
+
+JSON_BACKENDS["json"] = json.loads
+
+
+# Signal message {"N":"<name>","V":<value>}, the value being a number, a
+# string without escape sequences, true, false or null
+SIGNAL_FRAME = re.compile(
+    rb'\s*\{\s*"N"\s*:\s*"([^"\\]*)"\s*,\s*"V"\s*:\s*'
+    rb'(?:"([^"\\]*)"|(-?(?:0|[1-9]\d*)(?:\.\d+)?(?:[eE][-+]?\d+)?)|(true|false|null))\s*\}\s*')
+
+JSON_CONSTANTS = {b"true": True, b"false": False, b"null": None}
+
+# Maximum number of signal names kept by the decoder
+NAME_CACHE_SIZE = 4096
+
+
+def get_loads(backend="auto"):
+    """_summary_
+    Return the loads function of a JSON backend
+
+    Args:
+        backend : "orjson", "ujson", "json" or "auto" for the fastest
+                  installed backend. When the requested backend is not
+                  installed the json module of the standard library is used
+    """
+    if backend == "auto":
+        return next(iter(JSON_BACKENDS.values()))
+    if backend not in ("orjson", "ujson", "json"):
+        raise ValueError(f"Unknown JSON backend: {backend}")
+    return JSON_BACKENDS.get(backend, json.loads)
+
+
+class FrameDecoder:
+    """_summary_
+    Decoder for the frames received from Moco engine
+
+    Args:
+        backend : JSON backend used for frames not handled by the fast path,
+                  see get_loads()
+        fast_path : Decode signal messages directly from the bytes. None to
+                    use the fast path only with the json module
+
+    decode() returns (name, value) for a signal message and (None, message)
+    for any other message, message being the decoded dictionary.
+    """
+    __slots__ = ("loads", "fast_path", "_names")
+
+    def __init__(self, backend="auto", fast_path=None):
+        self.loads = get_loads(backend)
+        if fast_path is None:
+            fast_path = self.loads is json.loads
+        self.fast_path = fast_path
+        # Decoded signal names by their bytes, the same str object is
+        # returned for every frame of a signal
+        self._names = {}
+
+    def decode(self, frame):
+        if self.fast_path:
+            match = SIGNAL_FRAME.fullmatch(frame)
+            if match is not None:
+                raw_name, string, number, constant = match.groups()
+                name = self._names.get(raw_name)
+                if name is None:
+                    name = raw_name.decode("utf-8")
+                    if len(self._names) < NAME_CACHE_SIZE:
+                        self._names[raw_name] = name
+                if number is not None:
+                    if b"." in number or b"e" in number or b"E" in number:
+                        return name, float(number)
+                    return name, int(number)
+                if string is not None:
+                    return name, string.decode("utf-8")
+                return name, JSON_CONSTANTS[constant]
+        message = self.loads(frame)
+        if "REP" in message:
+            return None, message
+        return message["N"], message["V"]
+
+    def add_names(self, names):
+        """Let the decoder return the given str objects as signal names,
+        e.g. the interned names of a SignalDispatcher
+        """
+        for name in names:
+            if len(self._names) < NAME_CACHE_SIZE:
+                self._names[name.encode("utf-8")] = name
@@ -0,0 +1,141 @@
+"""moco_fleet summary
+Fleet mode of the sample application. Instead of one subscriber thread and
+one application thread for a single Moco engine, fleet mode subscribes to
+many Moco engine endpoints (one per vehicle) from a single asyncio event
+loop. Every vehicle has its own signal store and its own state of the app
+calculation, the calculation runs in the event loop each time a batch of
+signals is received for the vehicle.
+"""
+
+import asyncio
+import os
+import time
+
+from moco_client import MocoEngineClient, STATE_STOPPED
+from moco_recorder import ColumnRecorder
+from range_calculation import RangeCalculation, LOG_COLUMNS, POWER_STATE_DRIVE, UNIX_CLK_SEC
+
+
+def parse_endpoints(endpoints):
+    """_summary_
+    Parse a list of Moco engine endpoints
+
+    Args:
+        endpoints : String with comma or whitespace separated endpoints, or a
+                    list of endpoints. Each endpoint is written as host:port
+                    or name=host:port
+
+    Returns a list of (name, host, port) tuples. Without a name the vehicle
+    is named after the host and port.
+    """
+    if isinstance(endpoints, str):
+        endpoints = endpoints.replace(",", " ").split()
+    parsed = []
+    for endpoint in endpoints:
+        name, _, address = endpoint.rpartition("=")
+        host, _, port = address.rpartition(":")
+        if not host or not port.isdigit():
+            raise ValueError(f"Invalid Moco engine endpoint: {endpoint}")
+        parsed.append((name or f"{host}_{port}", host, int(port)))
+    return parsed
+
+
+class FleetVehicle:
+    """_summary_
+    Connection, signal store and app calculation of one vehicle
+
+    Args:
+        name : Name of the vehicle, used in reports and output file names
+        host : Host of the Moco engine for this vehicle
+        port : TCP port of the Moco engine for this vehicle
+        ssl_context : ssl.SSLContext used for the connection
+        subscription : Subscription list sent to Moco engine
+        create_signal_store : Function returning a (dispatcher, store) pair
+                              for a subscription list
+        report : Function called with the result messages of the vehicle
+        drive_cycle_timeout : Seconds without time signal after a drive
+                              cycle before logging of the vehicle ends
+        recorder : ColumnRecorder for the logged data of the vehicle, None
+                   to keep the logged data in memory
+        window : SignalWindow of the app calculation, None for the default
+        time_weighted : Use the time weighted average speed
+    """
+
+    def __init__(self, name, host, port, ssl_context, subscription, create_signal_store,
+                 report, drive_cycle_timeout=45, recorder=None, window=None, time_weighted=False):
+        self.name = name
+        self.dispatcher, self.store = create_signal_store(subscription)
+        self.signals = self.store.snapshot()
+        self.calculation = RangeCalculation(report=lambda message: report(f"[{name}] {message}"),
+                                            recorder=recorder, window=window,
+                                            time_weighted=time_weighted)
+        self.client = MocoEngineClient(host, port, ssl_context, subscription, self.dispatcher)
+        self.client.on_batch = self.process
+        self.drive_cycle_timeout = drive_cycle_timeout
+        self.finished = False
+        self.time_out_start = time.time()
+        self.unix_clk_sequence = 0
+
+    def process(self):
+        """Run the app calculation with the latest signals of the vehicle"""
+        if self.store.read(self.signals):
+            if self.signals.sequence_of(UNIX_CLK_SEC) != self.unix_clk_sequence:
+                self.unix_clk_sequence = self.signals.sequence_of(UNIX_CLK_SEC)
+                self.time_out_start = time.time()
+            self.calculation.update(self.signals)
+
+    def timed_out(self, now):
+        """Check if the drive cycle of the vehicle ended or the connection
+        to Moco engine was given up
+        """
+        return ((now - self.time_out_start > self.drive_cycle_timeout)
+                and self.calculation.last_power_state == POWER_STATE_DRIVE) \
+            or self.client.state == STATE_STOPPED
+
+
+async def run_fleet_async(vehicles, output_directory=".", check_interval=1.0):
+    """Run the clients of all vehicles in the current event loop until the
+    logging of every vehicle has ended. Logged data of each vehicle is
+    written to logged_signals_<name>.csv
+    """
+    tasks = {vehicle.name: asyncio.ensure_future(vehicle.client.run()) for vehicle in vehicles}
+    remaining = list(vehicles)
+    while remaining:
+        await asyncio.sleep(check_interval)
+        now = time.time()
+        for vehicle in list(remaining):
+            if vehicle.timed_out(now):
+                vehicle.finished = True
+                vehicle.client.stop()
+                # Don't wait for a pending reconnect back-off delay
+                tasks[vehicle.name].cancel()
+                try:
+                    await tasks[vehicle.name]
+                except asyncio.CancelledError:
+                    pass
+                vehicle.calculation.write_csv(os.path.join(output_directory, f"logged_signals_{vehicle.name}.csv"))
+                vehicle.calculation.close()
+                remaining.remove(vehicle)
+
+
+def run_fleet(endpoints, ssl_context, subscription, create_signal_store, report, output_directory=".",
+              record=False, create_window=None, time_weighted=False):
+    """_summary_
+    Start fleet mode for a list of endpoints, see parse_endpoints()
+
+    With record set the logged data of each vehicle is written to
+    logged_signals_<name>.rec while logging, see moco_recorder.py.
+    create_window is called to create the window of samples of each
+    vehicle, see RangeCalculation.
+    Blocks until all vehicles finished and returns the FleetVehicle objects
+    """
+    vehicles = []
+    for name, host, port in parse_endpoints(endpoints):
+        recorder = None
+        if record:
+            recorder = ColumnRecorder(os.path.join(output_directory, f"logged_signals_{name}.rec"), LOG_COLUMNS)
+        window = create_window() if create_window is not None else None
+        vehicles.append(FleetVehicle(name, host, port, ssl_context, subscription, create_signal_store,
+                                     report, recorder=recorder, window=window, time_weighted=time_weighted))
+    asyncio.run(run_fleet_async(vehicles, output_directory))
+    return vehicles
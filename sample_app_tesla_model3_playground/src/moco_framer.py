@@ -0,0 +1,113 @@
+"""moco_framer summary
+Framing layer for the data stream of the Moco engine. The Moco engine sends
+JSON messages separated by a '\\n' character. A single read from the socket
+can contain several messages and can end in the middle of a message, so the
+received bytes need to be split into complete messages (frames) before they
+can be decoded.
+The FrameBuffer keeps the received bytes in one reusable bytearray. Newlines
+are searched for only in bytes that were not scanned before and the
+unconsumed tail is never copied when new data is added. Complete frames are
+returned as bytes, ready to be passed to json.loads.
+"""
+
+
+class FrameBuffer:
+    """_summary_
+    Incremental newline delimited frame splitter
+
+    Args:
+        capacity : Initial size in bytes of the receive buffer. The buffer
+                   grows automatically when a single frame does not fit.
+
+    Data is added with feed() (copy of received bytes) or by receiving
+    directly into writable() and confirming the number of bytes with
+    commit(). Complete frames are taken out with frames().
+    """
+    __slots__ = ("_buffer", "_view", "_start", "_end", "_scan")
+
+    def __init__(self, capacity=4096):
+        self._buffer = bytearray(max(int(capacity), 1))
+        self._view = memoryview(self._buffer)
+        # Offset of the first byte not yet returned as (part of) a frame
+        self._start = 0
+        # Offset of the end of valid data in the buffer
+        self._end = 0
+        # Offset from where the next newline search starts
+        self._scan = 0
+
+    def __len__(self):
+        """Number of received bytes not yet returned as a frame"""
+        return self._end - self._start
+
+    @property
+    def capacity(self):
+        return len(self._buffer)
+
+    def clear(self):
+        """Discard all pending data, e.g. after a reconnect to Moco engine"""
+        self._start = self._end = self._scan = 0
+
+    def _reserve(self, size):
+        """Make sure at least size bytes are free at the end of the buffer.
+        The pending bytes are moved to the start of the buffer only when there
+        is not enough room left, and the buffer is only enlarged when the
+        pending bytes plus the new data don't fit in the current buffer.
+        """
+        if len(self._buffer) - self._end >= size:
+            return
+        pending = self._end - self._start
+        if pending + size > len(self._buffer):
+            capacity = len(self._buffer)
+            while capacity < pending + size:
+                capacity *= 2
+            new_buffer = bytearray(capacity)
+            new_buffer[:pending] = self._view[self._start:self._end]
+            self._view.release()
+            self._buffer = new_buffer
+            self._view = memoryview(new_buffer)
+        elif pending:
+            self._view[:pending] = self._view[self._start:self._end]
+        self._scan -= self._start
+        self._start = 0
+        self._end = pending
+
+    def writable(self, size=1):
+        """Return a memoryview of the free space at the end of the buffer,
+        at least size bytes long, to be used with socket.recv_into
+        """
+        self._reserve(size)
+        return self._view[self._end:]
+
+    def commit(self, size):
+        """Confirm size bytes were written into the view from writable()"""
+        self._end += size
+
+    def feed(self, data):
+        """Copy received bytes into the buffer"""
+        size = len(data)
+        if size:
+            self._reserve(size)
+            self._view[self._end:self._end + size] = data
+            self._end += size
+
+    def frames(self):
+        """Return a list with each complete frame in the buffer as bytes.
+        Empty lines are skipped. Bytes after the last newline are kept and
+        completed by the next call to feed() or commit().
+        """
+        end = self._end
+        last = self._buffer.rfind(b"\n", self._scan, end)
+        if last == -1:
+            self._scan = end
+            return []
+        # All complete frames are copied out in one go and split in C
+        chunk = bytes(self._view[self._start:last])
+        if last + 1 == end:
+            # Nothing pending, next data can be written at the start again
+            self._start = self._end = self._scan = 0
+        else:
+            self._start = self._scan = last + 1
+        frames = chunk.split(b"\n")
+        if not all(frames):
+            frames = [frame for frame in frames if frame]
+        return frames
@@ -0,0 +1,230 @@
+"""moco_logging summary
+Logging of the sample application. Messages are written to the log file
+and, for messages of the console logger, to stdout (replacing print()).
+In the asynchronous mode the subscriber and application thread only put
+the log records in a bounded queue, the records are written by a separate
+thread (QueueListener), so a slow disk or stdout (e.g. in Docker) never
+blocks the processing of signals. When the queue is full the record is
+handled according to the drop policy:
+    - drop_new : the new record is dropped
+    - drop_oldest : the oldest record in the queue is dropped
+    - block : the thread logging the record waits until there is room, no
+      record is lost but a slow output can again block the threads
+The number of dropped records is logged as soon as there is room again.
+Repeated messages, e.g. "Sync message from Moco engine received", are rate
+limited: an identical message is passed at most once per repeat interval,
+the number of suppressed messages is added to the next passed message.
+The log file is rotated when it reaches a maximum size.
+"""
+
+import atexit
+import logging
+import logging.handlers
+import queue
+import sys
+import time
+
+
+SYNC = "sync"
+ASYNC = "async"
+LOGGING_MODES = (SYNC, ASYNC)
+
+DROP_NEW = "drop_new"
+DROP_OLDEST = "drop_oldest"
+BLOCK = "block"
+DROP_POLICIES = (DROP_NEW, DROP_OLDEST, BLOCK)
+
+LOG_FORMAT = '%(asctime)s %(levelname)-8s: %(message)s'
+LOG_DATE_FORMAT = '%d-%m-%Y %H:%M:%S'
+
+# Messages of this logger are written to stdout instead of the log file
+CONSOLE_LOGGER = "moco.console"
+console = logging.getLogger(CONSOLE_LOGGER)
+
+# Number of rate limited messages at which messages seen for longer than
+# the repeat interval are forgotten
+RATE_LIMIT_MAX_MESSAGES = 1024
+
+
+class RateLimitFilter(logging.Filter):
+    """_summary_
+    Pass an identical message at most once per interval
+
+    Args:
+        interval : Seconds in which an identical message is passed once
+
+    Messages are identical when logger name, level and message are the
+    same. The decision is stored in the record, so the filter can be added
+    to more than one handler.
+    """
+
+    def __init__(self, interval):
+        super().__init__()
+        self.interval = interval
+        # Message key: [time the message was last passed, suppressed count]
+        self._messages = {}
+
+    def filter(self, record):
+        passed = getattr(record, "rate_limit_passed", None)
+        if passed is not None:
+            return passed
+        message = record.getMessage()
+        key = (record.name, record.levelno, message)
+        now = time.monotonic()
+        state = self._messages.get(key)
+        if state is not None and now - state[0] < self.interval:
+            state[1] += 1
+            record.rate_limit_passed = False
+            return False
+        if state is not None and state[1]:
+            record.msg = f"{message} ({state[1]} similar messages suppressed)"
+            record.args = None
+        if state is None and len(self._messages) >= RATE_LIMIT_MAX_MESSAGES:
+            self._forget(now)
+        self._messages[key] = [now, 0]
+        record.rate_limit_passed = True
+        return True
+
+    def _forget(self, now):
+        for key, state in list(self._messages.items()):
+            if now - state[0] >= self.interval and not state[1]:
+                del self._messages[key]
+
+
+class _ConsoleFilter(logging.Filter):
+    """Pass only (console is True) or all except (False) console messages"""
+
+    def __init__(self, console):
+        super().__init__()
+        self.console = console
+
+    def filter(self, record):
+        return (record.name == CONSOLE_LOGGER) == self.console
+
+
+class BoundedQueueHandler(logging.handlers.QueueHandler):
+    """_summary_
+    Queue handler with a bounded queue and a drop policy
+
+    Args:
+        maxsize : Maximum number of records in the queue
+        drop_policy : DROP_NEW, DROP_OLDEST or BLOCK, see module summary
+    """
+
+    def __init__(self, maxsize=10000, drop_policy=DROP_NEW):
+        if drop_policy not in DROP_POLICIES:
+            raise ValueError(f"Unknown drop policy: {drop_policy}")
+        super().__init__(queue.Queue(maxsize))
+        self.drop_policy = drop_policy
+        self.dropped = 0
+        self._reported = 0
+
+    def enqueue(self, record):
+        if self.drop_policy == BLOCK:
+            self.queue.put(record)
+            return
+        if self.dropped != self._reported and self._put(self._dropped_record()):
+            self._reported = self.dropped
+        if not self._put(record):
+            self.dropped += 1
+
+    def _put(self, record):
+        try:
+            self.queue.put_nowait(record)
+            return True
+        except queue.Full:
+            if self.drop_policy != DROP_OLDEST:
+                return False
+        # Drop the oldest record to make room, another thread may have
+        # taken the room in the meantime
+        try:
+            self.queue.get_nowait()
+            self.dropped += 1
+            self.queue.put_nowait(record)
+            return True
+        except (queue.Empty, queue.Full):
+            return False
+
+    def _dropped_record(self):
+        return logging.LogRecord(
+            __name__, logging.WARNING, __file__, 0,
+            f"{self.dropped - self._reported} log messages dropped, log queue full", None, None)
+
+
+class LogListener(logging.handlers.QueueListener):
+    """Queue listener for a bounded queue, stop() waits for room in the
+    queue, writes the remaining records and can be called more than once
+    """
+
+    def enqueue_sentinel(self):
+        self.queue.put(self._sentinel)
+
+    def stop(self):
+        if self._thread is not None:
+            super().stop()
+
+
+def create_handlers(filename, max_bytes=0, backup_count=3, stream=None):
+    """_summary_
+    Create the handlers writing the log file and the console messages
+
+    Args:
+        filename : Log file
+        max_bytes : Size in bytes at which the log file is rotated, 0 to not
+                    rotate the file
+        backup_count : Number of rotated log files kept
+        stream : Stream for the console messages, by default stdout
+    """
+    if max_bytes > 0:
+        file_handler = logging.handlers.RotatingFileHandler(filename, maxBytes=max_bytes,
+                                                            backupCount=backup_count)
+    else:
+        file_handler = logging.FileHandler(filename)
+    file_handler.setFormatter(logging.Formatter(LOG_FORMAT, LOG_DATE_FORMAT))
+    file_handler.addFilter(_ConsoleFilter(False))
+    console_handler = logging.StreamHandler(stream if stream is not None else sys.stdout)
+    console_handler.addFilter(_ConsoleFilter(True))
+    return [file_handler, console_handler]
+
+
+def setup_logging(filename, mode=SYNC, level=logging.DEBUG, max_bytes=0, backup_count=3,
+                  queue_size=10000, drop_policy=DROP_NEW, repeat_interval=0.0):
+    """_summary_
+    Configure the root logger of the application
+
+    Args:
+        filename : Log file
+        mode : SYNC to write records in the logging thread, ASYNC to write
+               them in a separate thread
+        level : Level of the root logger
+        max_bytes : Size in bytes at which the log file is rotated, 0 to not
+                    rotate the file
+        backup_count : Number of rotated log files kept
+        queue_size : Maximum number of records waiting to be written (ASYNC)
+        drop_policy : Handling of records when the queue is full (ASYNC)
+        repeat_interval : Seconds in which an identical message is logged
+                          once, 0 to log all messages
+
+    Returns the QueueListener in the ASYNC mode, it is stopped at exit to
+    write the remaining records, None in the SYNC mode
+    """
+    if mode not in LOGGING_MODES:
+        raise ValueError(f"Unknown logging mode: {mode}")
+    handlers = create_handlers(filename, max_bytes, backup_count)
+    listener = None
+    if mode == ASYNC:
+        queue_handler = BoundedQueueHandler(queue_size, drop_policy)
+        listener = LogListener(queue_handler.queue, *handlers, respect_handler_level=True)
+        handlers = [queue_handler]
+    if repeat_interval > 0:
+        rate_limit = RateLimitFilter(repeat_interval)
+        for handler in handlers:
+            handler.addFilter(rate_limit)
+    root = logging.getLogger()
+    root.setLevel(level)
+    for handler in handlers:
+        root.addHandler(handler)
+    if listener is not None:
+        listener.start()
+        atexit.register(listener.stop)
+    return listener
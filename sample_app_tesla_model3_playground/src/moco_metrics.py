@@ -0,0 +1,307 @@
+"""moco_metrics summary
+Metrics of the subscriber and application threads. Counters, gauges and
+histograms are updated in the receive loop, so they are kept cheap: a
+counter is an integer attribute, a histogram has a fixed array of bucket
+counters and recording a value does not allocate memory. Metrics are
+updated by one thread and read by others without locks, a reader may see a
+value that is one update old.
+The metrics are exposed in the Prometheus text format by a small HTTP
+server (MetricsServer) and summarised in a periodic log line
+(SummaryLogger).
+"""
+
+import threading
+import time
+from array import array
+from bisect import bisect_left
+
+
+# Bucket bounds in seconds for durations in the receive loop
+DURATION_BUCKETS = (0.00001, 0.00005, 0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0)
+# Bucket bounds in seconds for latencies and round trip times
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class Counter:
+    """Monotonic counter, increased with inc() or by adding to value"""
+    __slots__ = ("name", "help", "value")
+    kind = "counter"
+
+    def __init__(self, name, help_text):
+        self.name = name
+        self.help = help_text
+        self.value = 0
+
+    def inc(self, amount=1):
+        self.value += amount
+
+    def samples(self):
+        return [(self.name, self.value)]
+
+
+class Gauge:
+    """Value that can go up and down, or a function returning the value"""
+    __slots__ = ("name", "help", "value", "function")
+    kind = "gauge"
+
+    def __init__(self, name, help_text, function=None):
+        self.name = name
+        self.help = help_text
+        self.value = 0
+        self.function = function
+
+    def set(self, value):
+        self.value = value
+
+    def samples(self):
+        return [(self.name, self.function() if self.function is not None else self.value)]
+
+
+class Histogram:
+    """_summary_
+    Distribution of values in fixed buckets
+
+    Args:
+        name : Metric name
+        help_text : Description of the metric
+        buckets : Increasing upper bounds of the buckets, a bucket for
+                  larger values is added
+    """
+    __slots__ = ("name", "help", "bounds", "counts", "sum")
+    kind = "histogram"
+
+    def __init__(self, name, help_text, buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.bounds = tuple(buckets)
+        self.counts = array("Q", bytes(8 * (len(self.bounds) + 1)))
+        self.sum = 0.0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.sum += value
+
+    @property
+    def count(self):
+        return sum(self.counts)
+
+    def quantile(self, fraction, counts=None):
+        """Upper bound of the bucket holding the given fraction of values,
+        None without values. counts are bucket counts, e.g. the difference
+        of two snapshots of the counts, by default all values
+        """
+        counts = self.counts if counts is None else counts
+        total = sum(counts)
+        if not total:
+            return None
+        cumulative = 0
+        for bound, count in zip(self.bounds + (float("inf"),), counts):
+            cumulative += count
+            if cumulative >= fraction * total:
+                return bound
+        return float("inf")
+
+    def samples(self):
+        samples = []
+        cumulative = 0
+        for bound, count in zip(self.bounds, self.counts):
+            cumulative += count
+            samples.append((f'{self.name}_bucket{{le="{bound}"}}', cumulative))
+        count = cumulative + self.counts[-1]
+        samples.append((f'{self.name}_bucket{{le="+Inf"}}', count))
+        samples.append((f"{self.name}_sum", self.sum))
+        samples.append((f"{self.name}_count", count))
+        return samples
+
+
+class MetricsRegistry:
+    """Collection of metrics, rendered in the Prometheus text format"""
+
+    def __init__(self):
+        self.metrics = {}
+
+    def _add(self, metric):
+        if metric.name in self.metrics:
+            raise ValueError(f"Metric {metric.name} already exists")
+        self.metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name, help_text):
+        return self._add(Counter(name, help_text))
+
+    def gauge(self, name, help_text, function=None):
+        return self._add(Gauge(name, help_text, function))
+
+    def histogram(self, name, help_text, buckets=LATENCY_BUCKETS):
+        return self._add(Histogram(name, help_text, buckets))
+
+    def render(self):
+        """Return all metrics in the Prometheus text exposition format"""
+        lines = []
+        for metric in self.metrics.values():
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            for name, value in metric.samples():
+                lines.append(f"{name} {value}")
+        return "\n".join(lines) + "\n"
+
+
+class SubscriberMetrics:
+    """_summary_
+    Metrics of the subscriber and application threads
+
+    Args:
+        registry : MetricsRegistry the metrics are added to, a new registry
+                   when None
+    """
+
+    def __init__(self, registry=None):
+        self.registry = registry if registry is not None else MetricsRegistry()
+        add = self.registry
+        self.bytes_received = add.counter("moco_received_bytes_total", "Bytes received from Moco engine")
+        self.frames_received = add.counter("moco_received_frames_total", "Messages received from Moco engine")
+        self.signals_received = add.counter("moco_received_signals_total", "Signal messages received from Moco engine")
+        self.subscribed_signals = add.gauge("moco_subscribed_signals", "Signals subscribed to at Moco engine")
+        self.signals_suppressed = add.counter("moco_suppressed_signals_total",
+                                              "Signal messages dropped by the filters of unchanged values")
+        self.decode_time = add.histogram("moco_batch_decode_seconds",
+                                         "Time to decode and dispatch the messages of one receive",
+                                         DURATION_BUCKETS)
+        self.latency = add.histogram("moco_signal_latency_seconds",
+                                     "Local receive time minus the time signal of Moco engine")
+        self.reconnects = add.counter("moco_reconnects_total", "Reconnects to Moco engine")
+        self.reconnect_first_signal = add.histogram(
+            "moco_reconnect_first_signal_seconds",
+            "Time from detecting a connection loss to the first signal of the new connection")
+        self.tls_handshakes = add.counter("moco_tls_handshakes_total", "TLS handshakes with Moco engine")
+        self.tls_resumed = add.counter("moco_tls_resumed_total",
+                                       "TLS handshakes resuming the session of the previous connection")
+        self.sync_round_trip = add.histogram("moco_sync_round_trip_seconds",
+                                             "Time from sending a sync message to its reply")
+        self.wakeups = add.counter("moco_app_wakeups_total", "Wake-ups of the application thread")
+        self.buffered_bytes = add.gauge("moco_receive_buffer_bytes",
+                                        "Received bytes waiting in the receive buffer")
+        self.buffered_samples = add.gauge("moco_sample_buffer_items",
+                                          "Samples waiting in the buffer for the application thread")
+        self.sample_lag = add.gauge("moco_sample_lag_seconds",
+                                    "Time signal of the latest received sample minus that of the "
+                                    "latest sample processed by the application thread")
+        self.samples_dropped = add.counter("moco_sample_buffer_dropped_total",
+                                           "Samples dropped because the buffer was full")
+        self.samples_spilled = add.counter("moco_sample_buffer_spilled_total",
+                                           "Samples written to the spill file because the buffer was full")
+        self.subscriber_blocked = add.counter("moco_subscriber_blocked_seconds_total",
+                                              "Time the subscriber waited for room in the buffer")
+        self.resampler_late_updates = add.counter("moco_resampler_late_updates_total",
+                                                  "Updates with an earlier engine time than the previous update")
+        self.resampler_gaps = add.counter("moco_resampler_gaps_total",
+                                          "Gaps in the engine time without resampled samples")
+        self.resampler_overflows = add.counter("moco_resampler_overflows_total",
+                                               "Updates removing unresampled values from a full ring buffer")
+
+
+def _metrics_handler():
+    """Request handler class of the MetricsServer. http.server is imported
+    when the server is created, it is not needed without metrics endpoint
+    """
+    from http.server import BaseHTTPRequestHandler
+
+    class _MetricsHandler(BaseHTTPRequestHandler):
+
+        def do_GET(self):
+            if self.path.split("?")[0] not in ("/", "/metrics"):
+                self.send_error(404)
+                return
+            body = self.server.registry.render().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            # Scrapes are not written to the log of the application
+            pass
+
+    return _MetricsHandler
+
+
+class MetricsServer:
+    """_summary_
+    HTTP server exposing a registry on /metrics, in a daemon thread
+
+    Args:
+        registry : MetricsRegistry to expose
+        port : TCP port, 0 to select a free port
+        address : Listening address, by default only local connections
+    """
+
+    def __init__(self, registry, port, address="127.0.0.1"):
+        from http.server import ThreadingHTTPServer
+        self.server = ThreadingHTTPServer((address, port), _metrics_handler())
+        self.server.daemon_threads = True
+        self.server.registry = registry
+        self.port = self.server.server_address[1]
+        self.thread = threading.Thread(target=self.server.serve_forever, name="metrics", daemon=True)
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+class SummaryLogger:
+    """_summary_
+    Periodic summary line of the subscriber metrics, in a daemon thread
+
+    Args:
+        metrics : SubscriberMetrics to summarise
+        log : Function called with the summary line, e.g. logger.info
+        interval : Seconds between two summary lines
+    """
+
+    def __init__(self, metrics, log, interval=60.0):
+        self.metrics = metrics
+        self.log = log
+        self.interval = interval
+        self._stop = threading.Event()
+        self.thread = threading.Thread(target=self._run, name="metrics-summary", daemon=True)
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+
+    def _run(self):
+        previous_time = time.monotonic()
+        previous = self._counts()
+        while not self._stop.wait(self.interval):
+            now = time.monotonic()
+            current = self._counts()
+            self.log(self.summary(previous, current, now - previous_time))
+            previous, previous_time = current, now
+
+    def _counts(self):
+        metrics = self.metrics
+        return (metrics.bytes_received.value, metrics.frames_received.value, metrics.signals_received.value,
+                metrics.wakeups.value, array("Q", metrics.latency.counts),
+                array("Q", metrics.decode_time.counts))
+
+    def summary(self, previous, current, seconds):
+        """Summary line of the changes between two snapshots of the counts"""
+        rates = [(now - before) / seconds for now, before in zip(current[:4], previous[:4])]
+        latency = [now - before for now, before in zip(current[4], previous[4])]
+        decode = [now - before for now, before in zip(current[5], previous[5])]
+        histogram = self.metrics.latency
+        return (f"Metrics: {rates[0]:.0f} B/s, {rates[1]:.0f} messages/s, {rates[2]:.0f} signals/s, "
+                f"{rates[3]:.1f} wake-ups/s, latency p50 <= {histogram.quantile(0.5, latency)} s, "
+                f"p99 <= {histogram.quantile(0.99, latency)} s, "
+                f"decode p99 <= {self.metrics.decode_time.quantile(0.99, decode)} s per receive, "
+                f"samples dropped {self.metrics.samples_dropped.value}, "
+                f"reconnects {self.metrics.reconnects.value} "
+                f"({self.metrics.tls_resumed.value} TLS sessions resumed)")
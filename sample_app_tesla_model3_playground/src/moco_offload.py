@@ -0,0 +1,222 @@
+"""moco_offload summary
+Offload of CPU heavy analysis of sample windows to worker processes. The
+subscriber and application thread share the GIL of one process, so analysis
+running in the application thread delays the subscriber reading the socket.
+With a WindowOffload the application thread only copies the samples of a
+completed window into a slot of a ring buffer in shared memory
+(multiprocessing.shared_memory) and submits the slot number to a pool of
+worker processes. The worker reads the samples directly from shared memory,
+runs the analysis function and returns its result. Results are collected in
+the order the windows were submitted, a slot is reused after its result was
+collected.
+
+The analysis function is called in the worker with a dictionary from column
+name to a memoryview of the values (float) of the column, e.g.
+numpy.frombuffer(columns["vehicle_speed"]) gives a NumPy array without
+copy. The views are only valid during the call. The function and its result
+must be picklable, e.g. a function defined at module level.
+"""
+
+import importlib
+import multiprocessing
+from array import array
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+
+# Ring buffer of the worker process, attached once by _init_worker
+_worker_ring = None
+_worker_analysis = None
+
+
+class WindowRing:
+    """_summary_
+    Ring buffer of sample windows in shared memory
+
+    Args:
+        columns : Number of columns (values per sample)
+        slots : Number of windows in the ring buffer
+        slot_rows : Maximum number of samples per window
+        name : Name of an existing ring buffer to attach to, None to create
+               a new ring buffer
+
+    The values of a slot are stored column by column, so each column of a
+    window is one contiguous block of doubles.
+    """
+
+    def __init__(self, columns, slots, slot_rows, name=None):
+        self.columns = columns
+        self.slots = slots
+        self.slot_rows = slot_rows
+        if name is None:
+            self.memory = shared_memory.SharedMemory(create=True, size=8 * columns * slots * slot_rows)
+        else:
+            self.memory = shared_memory.SharedMemory(name=name)
+        self.name = self.memory.name
+        self._values = self.memory.buf.cast("d")
+
+    def write(self, slot, rows):
+        """_summary_
+        Write the samples of a window into a slot
+
+        Args:
+            slot : Slot number
+            rows : Sequence of samples, each a sequence of column values
+
+        When there are more samples than slot_rows only the last slot_rows
+        samples are written. Returns the number of written samples.
+        """
+        if len(rows) > self.slot_rows:
+            rows = rows[-self.slot_rows:]
+        count = len(rows)
+        for column in range(self.columns):
+            start = (slot * self.columns + column) * self.slot_rows
+            self._values[start:start + count] = array("d", [row[column] for row in rows])
+        return count
+
+    def column_views(self, slot, count, names):
+        """Return a dictionary from column name to a memoryview of the
+        first count values of the column in the slot
+        """
+        views = {}
+        for column, name in enumerate(names):
+            start = (slot * self.columns + column) * self.slot_rows
+            views[name] = self._values[start:start + count]
+        return views
+
+    def close(self, unlink=False):
+        """Detach from the shared memory, unlink removes the shared memory"""
+        self._values.release()
+        self.memory.close()
+        if unlink:
+            self.memory.unlink()
+
+
+def _init_worker(name, columns, slots, slot_rows, analysis):
+    global _worker_ring, _worker_analysis
+    _worker_ring = WindowRing(columns, slots, slot_rows, name)
+    _worker_analysis = analysis
+
+
+def _analyze_slot(slot, count, names):
+    views = _worker_ring.column_views(slot, count, names)
+    try:
+        return _worker_analysis(views)
+    finally:
+        for view in views.values():
+            view.release()
+
+
+def load_analysis(path):
+    """Return the function given as "module:function" """
+    module, _, function = path.partition(":")
+    return getattr(importlib.import_module(module), function)
+
+
+def window_statistics(columns):
+    """_summary_
+    Example analysis, statistics of every column of a window
+
+    Args:
+        columns : Dictionary from column name to the values of the column
+
+    Returns a dictionary from column name to (minimum, maximum, mean).
+    """
+    statistics = {}
+    for name, values in columns.items():
+        if len(values):
+            statistics[name] = (min(values), max(values), sum(values) / len(values))
+    return statistics
+
+
+class WindowOffload:
+    """_summary_
+    Analysis of sample windows in a pool of worker processes
+
+    Args:
+        analysis : Function called in a worker with the columns of a window
+        columns : Names of the columns of the samples
+        workers : Number of worker processes
+        slots : Number of windows in the shared memory ring buffer, at most
+                this many windows are analysed or waiting for collection
+        slot_rows : Maximum number of samples per window
+        start_method : Start method of the worker processes, see
+                       multiprocessing. spawn doesn't copy the threads and
+                       locks of the application into the workers
+
+    submit() blocks when all slots hold windows whose results weren't
+    collected, until the oldest result is available. Call it from the
+    application thread, not from the subscriber.
+    """
+
+    def __init__(self, analysis, columns, workers=2, slots=16, slot_rows=4096, start_method="spawn"):
+        self.columns = list(columns)
+        self.ring = WindowRing(len(self.columns), slots, slot_rows)
+        self.executor = ProcessPoolExecutor(
+            max_workers=workers, mp_context=multiprocessing.get_context(start_method),
+            initializer=_init_worker,
+            initargs=(self.ring.name, len(self.columns), slots, slot_rows, analysis))
+        self.submitted = 0
+        self._free = deque(range(slots))
+        # (sequence, slot, future) of the submitted windows, in order
+        self._pending = deque()
+
+    def __len__(self):
+        return len(self._pending)
+
+    def submit(self, rows):
+        """_summary_
+        Submit the samples of a window for analysis
+
+        Args:
+            rows : Sequence of samples, each with a value per column
+
+        Returns the sequence number of the window, counting from 0.
+        """
+        if not self._free:
+            # The results are kept until collected, only the slot is freed
+            self._wait_oldest()
+        slot = self._free.popleft()
+        count = self.ring.write(slot, rows)
+        future = self.executor.submit(_analyze_slot, slot, count, self.columns)
+        sequence = self.submitted
+        self.submitted += 1
+        self._pending.append([sequence, slot, future])
+        return sequence
+
+    def _wait_oldest(self):
+        for entry in self._pending:
+            if entry[1] is not None:
+                entry[2].exception()
+                self._free.append(entry[1])
+                entry[1] = None
+                return
+
+    def completed(self):
+        """Return the (sequence, result) of the analysed windows, in the
+        order of submission. Stops at the first window still in analysis.
+        An exception raised by the analysis is raised here.
+        """
+        results = []
+        while self._pending and self._pending[0][2].done():
+            results.append(self._collect())
+        return results
+
+    def drain(self):
+        """Wait for and return the (sequence, result) of all submitted
+        windows, in the order of submission
+        """
+        return [self._collect() for _ in range(len(self._pending))]
+
+    def _collect(self):
+        sequence, slot, future = self._pending.popleft()
+        if slot is not None:
+            future.exception()
+            self._free.append(slot)
+        return sequence, future.result()
+
+    def close(self):
+        """Stop the worker processes and remove the shared memory"""
+        self.executor.shutdown(wait=True)
+        self.ring.close(unlink=True)
@@ -0,0 +1,236 @@
+"""moco_recorder summary
+Streaming recorder for the logged data of the app calculation. Samples are
+collected in typed array('d') chunks, one array per column, and every chunk
+is appended to a binary file when it is full or when the flush interval has
+passed. Memory use is bounded by the chunk size, independent of the length
+of the drive, and after a crash the file holds all chunks written so far.
+
+File format (little endian):
+    header : b"MOCOREC1", header size (uint32), JSON header with the column
+             names, padded with spaces to a multiple of 8 bytes
+    chunk  : b"CHNK", number of rows (uint32), CRC32 of the data (uint32),
+             reserved (uint32), followed by the data of each column as
+             rows doubles, column after column
+A chunk that was not completely written (e.g. power loss during a write) is
+detected by its size or CRC and ignored by the reader. The RecordingReader
+memory-maps the file, columns are returned without parsing the data.
+"""
+
+import json
+import mmap
+import os
+import struct
+import sys
+import time
+import zlib
+from array import array
+
+
+FILE_MAGIC = b"MOCOREC1"
+CHUNK_MAGIC = b"CHNK"
+FILE_HEADER = struct.Struct("<8sI")
+CHUNK_HEADER = struct.Struct("<4sIII")
+ITEM_SIZE = array("d").itemsize
+
+
+def read_header(data):
+    """Return the column names and the offset of the first chunk of a
+    recording, data being the start of the file
+    """
+    if len(data) < FILE_HEADER.size:
+        raise ValueError("Not a Moco recording: file too short")
+    magic, header_size = FILE_HEADER.unpack_from(data, 0)
+    if magic != FILE_MAGIC:
+        raise ValueError("Not a Moco recording")
+    start = FILE_HEADER.size
+    header = json.loads(bytes(data[start:start + header_size]))
+    return header["columns"], start + header_size
+
+
+def scan_chunks(data, offset, column_count):
+    """_summary_
+    Find the complete chunks of a recording
+
+    Args:
+        data : Contents of the file, bytes or memory map
+        offset : Offset of the first chunk
+        column_count : Number of columns of the recording
+
+    Returns a list of (data offset, rows) tuples, one per complete chunk, and
+    the offset after the last complete chunk.
+    """
+    chunks = []
+    while offset + CHUNK_HEADER.size <= len(data):
+        magic, rows, crc, _ = CHUNK_HEADER.unpack_from(data, offset)
+        start = offset + CHUNK_HEADER.size
+        end = start + rows * column_count * ITEM_SIZE
+        if magic != CHUNK_MAGIC or end > len(data) or zlib.crc32(data[start:end]) != crc:
+            break
+        chunks.append((start, rows))
+        offset = end
+    return chunks, offset
+
+
+class ColumnRecorder:
+    """_summary_
+    Append samples of a fixed set of columns to a recording file
+
+    Args:
+        filename : Recording file
+        columns : Names of the columns, every sample has one value per column
+        chunk_rows : Number of samples kept in memory before they are written
+        flush_interval : Seconds after which samples are written, also when
+                         the chunk is not full. None to only write full chunks
+        append : Continue an existing recording with the same columns instead
+                 of overwriting it. An incomplete last chunk is removed
+        fsync : Force every chunk to disk, not only to the operating system
+    """
+
+    def __init__(self, filename, columns, chunk_rows=4096, flush_interval=10.0, append=False, fsync=False):
+        self.filename = filename
+        self.columns = list(columns)
+        self.chunk_rows = chunk_rows
+        self.flush_interval = flush_interval
+        self.fsync = fsync
+        self.rows = 0
+        self._chunk = [array("d") for _ in self.columns]
+        self._last_flush = time.monotonic()
+        if append and os.path.exists(filename) and os.path.getsize(filename) > 0:
+            self._file = open(filename, "r+b")
+            data = self._file.read()
+            columns, offset = read_header(data)
+            if columns != self.columns:
+                self._file.close()
+                raise ValueError(f"Recording {filename} has different columns: {columns}")
+            chunks, end = scan_chunks(data, offset, len(columns))
+            self.rows = sum(rows for _, rows in chunks)
+            self._file.truncate(end)
+            self._file.seek(end)
+        else:
+            self._file = open(filename, "wb")
+            header = json.dumps({"columns": self.columns}).encode("utf-8")
+            padding = -(FILE_HEADER.size + len(header)) % ITEM_SIZE
+            header += b" " * padding
+            self._file.write(FILE_HEADER.pack(FILE_MAGIC, len(header)) + header)
+            self._file.flush()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def __len__(self):
+        """Number of recorded samples, including samples not yet written"""
+        return self.rows + len(self._chunk[0])
+
+    def append(self, values):
+        """Add one sample, values being a sequence with one number per column"""
+        for column, value in zip(self._chunk, values):
+            column.append(value)
+        if len(self._chunk[0]) >= self.chunk_rows or (
+                self.flush_interval is not None and time.monotonic() - self._last_flush >= self.flush_interval):
+            self.flush()
+
+    def flush(self):
+        """Write the samples held in memory to the file"""
+        self._last_flush = time.monotonic()
+        rows = len(self._chunk[0])
+        if rows == 0 or self._file is None:
+            return
+        if sys.byteorder != "little":
+            for column in self._chunk:
+                column.byteswap()
+        data = b"".join(column.tobytes() for column in self._chunk)
+        # Header and data in one write, so that a partial chunk can only be
+        # the last one of the file
+        self._file.write(CHUNK_HEADER.pack(CHUNK_MAGIC, rows, zlib.crc32(data), 0) + data)
+        self._file.flush()
+        if self.fsync:
+            os.fsync(self._file.fileno())
+        self.rows += rows
+        for column in self._chunk:
+            del column[:]
+
+    def close(self):
+        if self._file is not None:
+            self.flush()
+            self._file.close()
+            self._file = None
+
+
+class RecordingReader:
+    """_summary_
+    Memory-mapped access to a recording written by ColumnRecorder
+
+    Args:
+        filename : Recording file
+
+    Chunks that were not completely written are ignored, so a recording can
+    be read while it is written or after the recorder crashed.
+    """
+
+    def __init__(self, filename):
+        self.filename = filename
+        with open(filename, "rb") as recording:
+            self._map = mmap.mmap(recording.fileno(), 0, access=mmap.ACCESS_READ)
+        self.columns, offset = read_header(self._map)
+        self._chunks, _ = scan_chunks(self._map, offset, len(self.columns))
+        self.rows = sum(rows for _, rows in self._chunks)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def __len__(self):
+        return self.rows
+
+    def chunks(self, name):
+        """Yield the data of one column chunk by chunk, as memoryviews of
+        doubles into the memory map (no copy)
+        """
+        index = self.columns.index(name)
+        view = memoryview(self._map)
+        try:
+            for start, rows in self._chunks:
+                start += index * rows * ITEM_SIZE
+                yield view[start:start + rows * ITEM_SIZE].cast("d")
+        finally:
+            view.release()
+
+    def column(self, name):
+        """Return all samples of a column as array('d')"""
+        index = self.columns.index(name)
+        values = array("d")
+        for start, rows in self._chunks:
+            start += index * rows * ITEM_SIZE
+            values.frombytes(self._map[start:start + rows * ITEM_SIZE])
+        if sys.byteorder != "little":
+            values.byteswap()
+        return values
+
+    def numpy_column(self, name):
+        """Return all samples of a column as numpy array. A recording with a
+        single chunk is returned as read only view of the memory map
+        """
+        # numpy is only imported when used, importing it takes time and memory
+        try:
+            import numpy
+        except ImportError:
+            raise ImportError("numpy is required for numpy_column()") from None
+        index = self.columns.index(name)
+        parts = [numpy.frombuffer(self._map, dtype="<f8", count=rows, offset=start + index * rows * ITEM_SIZE)
+                 for start, rows in self._chunks]
+        if len(parts) == 1:
+            return parts[0]
+        if not parts:
+            return numpy.empty(0, dtype="<f8")
+        return numpy.concatenate(parts)
+
+    def close(self):
+        """Close the memory map. Views returned by chunks() or numpy_column()
+        must be released first
+        """
+        self._map.close()
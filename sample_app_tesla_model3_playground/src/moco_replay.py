@@ -0,0 +1,184 @@
+"""moco_replay summary
+Capture and replay of the data stream received from the Moco engine. In
+capture mode the subscriber writes all data received from the Moco engine,
+exactly as received, together with the time of receiving to a capture file.
+A capture is replayed by feeding the same data into the subscriber pipeline,
+as fast as possible or at a multiple of the original speed.
+
+Time is taken from a clock object instead of time.time(), so that the
+timeouts of the application run on the time of the capture during a replay:
+SystemClock returns the time of the system, ReplayClock the receive time of
+the replayed data.
+
+Capture file format (little endian):
+    header : b"MOCOCAP1"
+    record : receive time (double, seconds since epoch), size (uint32),
+             followed by the received data. A record of size 0 marks a
+             reconnect to Moco engine
+The index file (capture file name + ".idx") holds (receive time, offset)
+pairs of double and uint64, written about once per index interval. It
+allows a replay to start at a given time without reading the capture from
+the start. A record that was not completely written (e.g. power loss during
+a write) ends the replay.
+"""
+
+import os
+import struct
+import time
+from bisect import bisect_right
+
+
+CAPTURE_MAGIC = b"MOCOCAP1"
+RECORD_HEADER = struct.Struct("<dI")
+INDEX_ENTRY = struct.Struct("<dQ")
+
+
+class SystemClock:
+    """Clock returning the time of the system, used in live operation"""
+
+    def time(self):
+        return time.time()
+
+
+class ReplayClock:
+    """_summary_
+    Clock returning the receive time of the replayed data
+
+    Args:
+        start : Time returned before the first data is replayed
+    """
+
+    def __init__(self, start=0.0):
+        self.now = start
+
+    def time(self):
+        return self.now
+
+
+class StreamCapture:
+    """_summary_
+    Write received data with its receive time to a capture file
+
+    Args:
+        filename : Capture file, the index is written to filename + ".idx"
+        clock : Clock providing the receive time
+        index_interval : Seconds between two entries in the index. The
+                         capture file is flushed at every index entry
+    """
+
+    def __init__(self, filename, clock=None, index_interval=1.0):
+        self.filename = filename
+        self.clock = clock or SystemClock()
+        self.index_interval = index_interval
+        self._file = open(filename, "wb")
+        self._index = open(filename + ".idx", "wb")
+        self._file.write(CAPTURE_MAGIC)
+        self._offset = len(CAPTURE_MAGIC)
+        self._next_index = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def write(self, data):
+        """Write data received from Moco engine, e.g. a memoryview of the
+        receive buffer
+        """
+        if not data:
+            return
+        now = self.clock.time()
+        if self._next_index is None or now >= self._next_index:
+            self._file.flush()
+            self._index.write(INDEX_ENTRY.pack(now, self._offset))
+            self._index.flush()
+            self._next_index = now + self.index_interval
+        self._file.write(RECORD_HEADER.pack(now, len(data)))
+        self._file.write(data)
+        self._offset += RECORD_HEADER.size + len(data)
+
+    def mark_reconnect(self):
+        """Record a reconnect, data received before the reconnect is not
+        combined with data received after it during the replay
+        """
+        self._file.write(RECORD_HEADER.pack(self.clock.time(), 0))
+        self._offset += RECORD_HEADER.size
+
+    def close(self):
+        if not self._file.closed:
+            self._file.close()
+            self._index.close()
+
+
+class StreamReplay:
+    """_summary_
+    Read the records of a capture file
+
+    Args:
+        filename : Capture file written by StreamCapture
+    """
+
+    def __init__(self, filename):
+        self.filename = filename
+        self._index_times = []
+        self._index_offsets = []
+        if os.path.exists(filename + ".idx"):
+            with open(filename + ".idx", "rb") as index:
+                entries = index.read()
+            # An incomplete last entry is ignored
+            entries = entries[:len(entries) - len(entries) % INDEX_ENTRY.size]
+            for entry_time, offset in INDEX_ENTRY.iter_unpack(entries):
+                self._index_times.append(entry_time)
+                self._index_offsets.append(offset)
+
+    def records(self, start_time=None):
+        """_summary_
+        Yield the (receive time, data) records of the capture
+
+        Args:
+            start_time : Skip the records received before this time, the
+                         index is used to find the first record
+        """
+        offset = len(CAPTURE_MAGIC)
+        if start_time is not None and self._index_times:
+            position = bisect_right(self._index_times, start_time) - 1
+            if position >= 0:
+                offset = self._index_offsets[position]
+        with open(self.filename, "rb") as capture:
+            if capture.read(len(CAPTURE_MAGIC)) != CAPTURE_MAGIC:
+                raise ValueError(f"Not a Moco capture: {self.filename}")
+            capture.seek(offset)
+            while True:
+                header = capture.read(RECORD_HEADER.size)
+                if len(header) < RECORD_HEADER.size:
+                    return
+                receive_time, size = RECORD_HEADER.unpack(header)
+                data = capture.read(size)
+                if len(data) < size:
+                    return
+                if start_time is None or receive_time >= start_time:
+                    yield receive_time, data
+
+    def replay(self, clock, speed=0.0, start_time=None):
+        """_summary_
+        Yield the data of the capture, timed by the receive times. Empty
+        data is returned for a reconnect
+
+        Args:
+            clock : ReplayClock set to the receive time of each record
+                    before its data is returned
+            speed : Replay speed as multiple of the original speed, e.g. 10
+                    for ten times faster. 0 to replay as fast as possible
+            start_time : See records()
+        """
+        replay_start = None
+        for receive_time, data in self.records(start_time):
+            if speed > 0:
+                if replay_start is None:
+                    replay_start = (time.monotonic(), receive_time)
+                delay = replay_start[0] + (receive_time - replay_start[1]) / speed - time.monotonic()
+                if delay > 0:
+                    time.sleep(delay)
+            clock.now = receive_time
+            yield data
@@ -0,0 +1,245 @@
+"""moco_resampler summary
+Time aligned samples of several signals on a fixed time grid. Moco engine
+sends the signals of an update one by one, followed by the time signal
+(Vehicle.Private.UnixTime.Seconds) holding the engine time of the update.
+The Resampler stamps the values received since the previous time signal
+with the time of the update and keeps the changes of each signal in a ring
+buffer. For every grid time (a multiple of the period) a row with the value
+of every signal at that time is emitted, once the engine time passed the
+grid time by the lateness bound:
+    - hold : the value of the last update at or before the grid time
+    - linear : linear interpolation between the updates before and after
+      the grid time, for numeric values. Other values are held
+The time of a row is the grid time, so the samples of the calculation don't
+depend on when the updates were sent or received.
+A signal without a value in an update (e.g. dropped by a SignalFilter as
+unchanged) keeps its previous value. Adding a value and emitting a row cost
+O(1) per signal, old values are removed from the ring buffers once no grid
+time needs them.
+"""
+
+import math
+from array import array
+from functools import partial
+
+
+HOLD = "hold"
+LINEAR = "linear"
+INTERPOLATIONS = (HOLD, LINEAR)
+
+# Size of the ring buffers, when no capacity is given
+DEFAULT_CAPACITY = 1024
+
+
+class _Ring:
+    """Ring buffer of (time, value), the times not decreasing"""
+    __slots__ = ("capacity", "times", "values", "head", "count")
+
+    def __init__(self, capacity, value=0.0):
+        self.capacity = capacity
+        self.times = array("d", [-math.inf]) * capacity
+        self.values = [value] * capacity
+        self.head = 0
+        self.count = 1
+
+    def clear(self):
+        # The newest value is kept with an unknown time, so a signal holds its
+        # value from before the clear
+        newest = (self.head + self.count - 1) % self.capacity
+        self.times[newest] = -math.inf
+        self.head = newest
+        self.count = 1
+
+    def append(self, time, value):
+        """Add a value, returns False when the oldest value was removed"""
+        capacity = self.capacity
+        newest = (self.head + self.count - 1) % capacity
+        if self.times[newest] == time:
+            # Several values in the same update, the last one counts
+            self.values[newest] = value
+            return True
+        removed = self.count == capacity
+        if removed:
+            self.head = (self.head + 1) % capacity
+            self.count -= 1
+        position = (self.head + self.count) % capacity
+        self.times[position] = time
+        self.values[position] = value
+        self.count += 1
+        return not removed
+
+    def value_at(self, time):
+        """Value of the last entry at or before time, entries before it are
+        removed. Times passed to value_at() must not decrease
+        """
+        capacity = self.capacity
+        times = self.times
+        head = self.head
+        while self.count > 1 and times[(head + 1) % capacity] <= time:
+            head = (head + 1) % capacity
+            self.count -= 1
+        self.head = head
+        return self.values[head]
+
+    def next_time(self, time):
+        """Time of the first entry after time, None when there is none"""
+        capacity = self.capacity
+        for offset in range(self.count):
+            entry_time = self.times[(self.head + offset) % capacity]
+            if entry_time > time:
+                return entry_time
+        return None
+
+
+class Resampler:
+    """_summary_
+    Resampling of signals on a fixed time grid, keyed on the engine time
+
+    Args:
+        signal_names : Names of the signals of a row, in the order of the
+                       values in the row
+        time_signal : Name of the signal holding the engine time, its
+                      column of a row holds the grid time
+        period : Seconds between two grid times
+        interpolation : HOLD or LINEAR
+        lateness : Seconds the engine time must be past a grid time before
+                   the row of the grid time is emitted
+        max_gap : Seconds between two updates above which no rows are
+                  emitted between the updates, e.g. after a reconnect
+        defaults : Values of the signals before their first value, in the
+                   order of signal_names
+        capacity : Size of the ring buffer of each signal. When full the
+                   oldest value is removed
+        metrics : SubscriberMetrics updated by the resampler, None for no
+                  metrics
+
+    add() (or a setter()) is called for every received value, advance() for
+    every received time signal. advance() returns the rows that became
+    complete. The engine time is expected not to decrease: an update with
+    an earlier time than the previous update is late, its values are
+    applied at the time of the previous update. An engine time going back
+    by more than max_gap starts a new time line.
+    """
+
+    def __init__(self, signal_names, time_signal, period, interpolation=HOLD, lateness=0.0,
+                 max_gap=5.0, defaults=None, capacity=DEFAULT_CAPACITY, metrics=None):
+        if interpolation not in INTERPOLATIONS:
+            raise ValueError(f"Unknown interpolation {interpolation}, expected one of {', '.join(INTERPOLATIONS)}")
+        if period <= 0:
+            raise ValueError("The period of the resampler must be positive")
+        self.signal_names = list(signal_names)
+        self.time_column = self.signal_names.index(time_signal)
+        self.period = period
+        self.linear = interpolation == LINEAR
+        self.lateness = lateness
+        self.max_gap = max_gap
+        self.metrics = metrics
+        defaults = defaults if defaults is not None else [0.0] * len(self.signal_names)
+        self._rings = [_Ring(capacity, value) for value in defaults]
+        self._updates = _Ring(capacity, None)
+        # Values received since the previous time signal, by column
+        self._pending = {}
+        # Engine time of the latest update, number of the next grid time
+        self._watermark = None
+        self._next_grid = None
+
+    def setter(self, name):
+        """Return a function adding a value of signal name, to be used as
+        sink when registering a handler in the SignalDispatcher
+        """
+        return partial(self.add_value, self.signal_names.index(name))
+
+    def add(self, name, value):
+        """Add a received value of signal name"""
+        self.add_value(self.signal_names.index(name), value)
+
+    def add_value(self, column, value):
+        self._pending[column] = value
+
+    def advance(self, time):
+        """_summary_
+        Add the received values with the engine time of their update
+
+        Args:
+            time : Engine time of the update (value of the time signal)
+
+        Returns the list of rows of the grid times that became complete,
+        each a tuple of the signal values in the order of signal_names.
+        """
+        rows = []
+        watermark = self._watermark
+        if watermark is not None and time < watermark:
+            if watermark - time > self.max_gap:
+                # New time line, e.g. the drive was restarted in the simulator
+                self._restart()
+                watermark = None
+            else:
+                self._count("resampler_late_updates")
+                time = watermark
+        if watermark is not None and time - watermark > self.max_gap:
+            # Rows up to the previous update, none across the gap
+            rows = self._emit(watermark)
+            self._count("resampler_gaps")
+            self._restart()
+            watermark = None
+        if watermark is None:
+            self._next_grid = math.ceil(time / self.period)
+
+        overflow = False
+        for column, value in self._pending.items():
+            if not self._rings[column].append(time, value):
+                overflow = True
+        self._pending.clear()
+        if not self._updates.append(time, time):
+            overflow = True
+        if overflow:
+            self._count("resampler_overflows")
+        self._watermark = time
+        rows += self._emit(time - self.lateness)
+        return rows
+
+    def _emit(self, until):
+        """Rows of all grid times up to until"""
+        rows = []
+        period = self.period
+        while self._next_grid * period <= until:
+            grid = self._next_grid * period
+            self._next_grid += 1
+            # The values of the update ring are the times of the updates
+            before = self._updates.value_at(grid)
+            row = [ring.value_at(before) for ring in self._rings]
+            if self.linear and before < grid:
+                after = self._updates.next_time(grid)
+                if after is not None:
+                    fraction = (grid - before) / (after - before)
+                    for column, ring in enumerate(self._rings):
+                        value = row[column]
+                        if type(value) is float or type(value) is int:
+                            next_value = _value_after(ring, after)
+                            if type(next_value) is float or type(next_value) is int:
+                                row[column] = value + (next_value - value) * fraction
+            row[self.time_column] = grid
+            rows.append(tuple(row))
+        return rows
+
+    def _restart(self):
+        for ring in self._rings:
+            ring.clear()
+        self._updates.clear()
+        self._watermark = None
+
+    def _count(self, name):
+        if self.metrics is not None:
+            getattr(self.metrics, name).inc()
+
+
+def _value_after(ring, time):
+    """Value of the last entry at or before time, without removing entries"""
+    capacity = ring.capacity
+    position = ring.head
+    for offset in range(1, ring.count):
+        following = (ring.head + offset) % capacity
+        if ring.times[following] > time:
+            break
+        position = following
+    return ring.values[position]
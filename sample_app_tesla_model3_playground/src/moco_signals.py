@@ -0,0 +1,346 @@
+"""moco_signals summary
+Building blocks used to pass signals received from the Moco engine to the
+application. The SignalDispatcher maps each subscribed signal name to the
+function(s) handling the signal value, so that the receive loop of the
+subscriber thread does not need to be changed when an application uses
+other signals. A SignalFilter set for a signal in the dispatcher drops
+values that didn't change (by more than a deadband), so the application
+only handles changes.
+The SignalStore holds the latest value of each signal. The subscriber thread
+writes into the store and the application thread reads all signals in one
+call, without queues growing while the application is busy.
+The SignalNotifier wakes the application thread once per batch of received
+signals and tells it which signals changed.
+"""
+
+import sys
+import threading
+import time
+from array import array
+from functools import partial
+
+
+class SignalDispatcher:
+    """_summary_
+    Registry of handlers for the signals in a subscription list
+
+    Args:
+        signal_names : Names of the signals subscribed to at Moco engine
+
+    Each handler consists of a converter, applied to the received value
+    (e.g. float, or None to pass the value unchanged), and a sink that is
+    called with the converted value (e.g. the put method of a queue).
+    Dispatching a signal is a single dictionary lookup (two when filters
+    are set), independent of the number of subscribed signals.
+    """
+    __slots__ = ("_handlers", "_filters", "suppressed")
+
+    def __init__(self, signal_names=()):
+        self._handlers = {}
+        self._filters = {}
+        # Number of values dropped by the filters
+        self.suppressed = 0
+        for name in signal_names:
+            self.add_signal(name)
+
+    @classmethod
+    def from_subscription(cls, subscription):
+        """Create a dispatcher for the signals in the "D" section of a
+        subscription list, e.g. {"CMD": "vss", "D": "<signal_1>,<signal_2>"}
+        """
+        return cls(name.strip() for name in subscription["D"].split(",") if name.strip())
+
+    def __contains__(self, name):
+        return name in self._handlers
+
+    def __len__(self):
+        return len(self._handlers)
+
+    def signals(self):
+        """Return the names of all signals known to the dispatcher"""
+        return list(self._handlers)
+
+    def add_signal(self, name):
+        """Add a signal without handlers to the dispatcher"""
+        self._handlers.setdefault(sys.intern(name), ())
+
+    def remove_signal(self, name):
+        """Remove a signal and its handlers from the dispatcher"""
+        self._handlers.pop(name, None)
+        self._filters.pop(name, None)
+
+    def set_filter(self, name, signal_filter):
+        """_summary_
+        Set the filter of a subscribed signal
+
+        Args:
+            name : VSS name of the signal, must be part of the subscription
+            signal_filter : Function called with each received value,
+                            returning False to drop the value before the
+                            handlers are called, e.g. a SignalFilter. None
+                            to remove the filter
+        """
+        if name not in self._handlers:
+            raise KeyError(f"Signal {name} is not part of the subscription")
+        if signal_filter is None:
+            self._filters.pop(name, None)
+        else:
+            self._filters[name] = signal_filter
+
+    def register(self, name, sink, converter=float, notify=True):
+        """_summary_
+        Register a handler for a subscribed signal
+
+        Args:
+            name : VSS name of the signal, must be part of the subscription
+            sink : Function called with the converted signal value
+            converter : Function converting the received value, None to
+                        pass the value unchanged
+            notify : If True, dispatching the signal returns True to
+                     indicate the application thread needs to be woken up
+        """
+        if name not in self._handlers:
+            raise KeyError(f"Signal {name} is not part of the subscription")
+        self._handlers[name] += ((converter, sink, notify),)
+
+    def unregister(self, name, sink=None):
+        """Remove the handlers of a signal, or only the handler(s) using sink"""
+        if name in self._handlers:
+            self._handlers[name] = tuple(handler for handler in self._handlers[name]
+                                         if sink is not None and handler[1] != sink)
+
+    def dispatch(self, name, value):
+        """Pass a received value to the handlers of signal name. Returns True
+        if one of the handlers requested the application to be notified.
+        Values of signals without handlers and values dropped by the filter
+        of the signal are ignored.
+        """
+        if self._filters:
+            signal_filter = self._filters.get(name)
+            if signal_filter is not None and not signal_filter(value):
+                self.suppressed += 1
+                return False
+        notify = False
+        for converter, sink, wake in self._handlers.get(name, ()):
+            sink(value if converter is None else converter(value))
+            notify = notify or wake
+        return notify
+
+
+class SignalFilter:
+    """_summary_
+    Change and deadband filter of the values of one signal
+
+    Args:
+        deadband : Minimum difference of a value to the last passed value,
+                   0 to pass every changed value. A deadband is only
+                   supported for numeric signals
+        heartbeat : Seconds after the last passed value after which an
+                    unchanged value is passed again, None to only pass
+                    changes
+        clock : Function returning the time in seconds, for the heartbeat
+
+    Calling the filter with a received value returns True when the value is
+    to be passed on. The first value is always passed.
+    """
+    __slots__ = ("deadband", "heartbeat", "clock", "last", "last_time")
+
+    def __init__(self, deadband=0, heartbeat=None, clock=time.monotonic):
+        self.deadband = deadband
+        self.heartbeat = heartbeat
+        self.clock = clock
+        self.last = None
+        self.last_time = 0.0
+
+    def __call__(self, value):
+        last = self.last
+        if last is not None:
+            if self.deadband:
+                changed = abs(float(value) - float(last)) > self.deadband
+            else:
+                changed = value != last
+            if not changed and (self.heartbeat is None or self.clock() - self.last_time < self.heartbeat):
+                return False
+        self.last = value
+        if self.heartbeat is not None:
+            self.last_time = self.clock()
+        return True
+
+
+class SignalSnapshot:
+    """_summary_
+    Copy of all values in a SignalStore, filled by SignalStore.read()
+
+    The values are accessed by signal name, e.g. snapshot["Vehicle.Speed"].
+    The sequence number of a signal is incremented by the store every time
+    a new value is received, which allows the application to check which
+    signals were updated between two reads.
+    """
+    __slots__ = ("_index", "values", "sequence", "version")
+
+    def __init__(self, index, values, sequence):
+        self._index = index
+        self.values = list(values)
+        self.sequence = array("Q", sequence)
+        self.version = 0
+
+    def __getitem__(self, name):
+        return self.values[self._index[name]]
+
+    def sequence_of(self, name):
+        """Return the number of values received for signal name"""
+        return self.sequence[self._index[name]]
+
+
+class SignalStore:
+    """_summary_
+    Latest value store for a fixed set of signals
+
+    Args:
+        signal_names : Names of the signals held in the store
+        default : Value of a signal before the first value is received
+        defaults : Optional dictionary with a default value per signal name
+
+    The store has one slot per signal, memory use does not depend on the
+    rate at which Moco engine publishes signals. The store is written by a
+    single thread (the subscriber) and can be read by any thread. A global
+    version number, odd while a write is in progress, allows read() to return
+    a consistent copy of all signals without taking a lock.
+    The writer also collects a bit mask of the signals written since the
+    last call of take_changed(), bit i being set for the i-th signal.
+    """
+    __slots__ = ("_index", "_defaults", "_values", "_sequence", "_version", "_bits", "_changed")
+
+    def __init__(self, signal_names, default=0, defaults=None):
+        names = [sys.intern(name) for name in signal_names]
+        self._index = {name: i for i, name in enumerate(names)}
+        defaults = defaults or {}
+        self._defaults = [defaults.get(name, default) for name in names]
+        self._values = list(self._defaults)
+        self._sequence = array("Q", bytes(8 * len(names)))
+        self._version = 0
+        self._bits = [1 << i for i in range(len(names))]
+        self._changed = 0
+
+    def __contains__(self, name):
+        return name in self._index
+
+    def __len__(self):
+        return len(self._index)
+
+    def signals(self):
+        """Return the names of all signals in the store"""
+        return list(self._index)
+
+    @property
+    def version(self):
+        """Number of writes to the store, multiplied by two"""
+        return self._version
+
+    def update(self, name, value):
+        """Store a new value for signal name"""
+        i = self._index[name]
+        self._version += 1
+        self._values[i] = value
+        self._sequence[i] += 1
+        self._version += 1
+        self._changed |= self._bits[i]
+
+    def bit(self, name):
+        """Return the bit of signal name in the masks of take_changed()"""
+        return self._bits[self._index[name]]
+
+    def take_changed(self):
+        """Return the bit mask of the signals written since the previous
+        call and reset it. Only to be called by the writing thread
+        """
+        changed = self._changed
+        self._changed = 0
+        return changed
+
+    def changed_signals(self, changed):
+        """Return the names of the signals in a bit mask of take_changed()"""
+        return [name for name, i in self._index.items() if changed >> i & 1]
+
+    def setter(self, name):
+        """Return a function storing a value for signal name, to be used as
+        sink when registering a handler in the SignalDispatcher
+        """
+        if name not in self._index:
+            raise KeyError(f"Signal {name} is not part of the signal store")
+        return partial(self.update, name)
+
+    def get(self, name):
+        """Return the latest value of a single signal"""
+        return self._values[self._index[name]]
+
+    def values(self):
+        """Return the latest values of all signals as a tuple, in the order
+        of signals(). Only to be called by the writing thread
+        """
+        return tuple(self._values)
+
+    def snapshot(self):
+        """Create a snapshot object holding the current values of the store"""
+        snapshot = SignalSnapshot(self._index, self._defaults, bytes(8 * len(self._index)))
+        self.read(snapshot)
+        return snapshot
+
+    def read(self, snapshot):
+        """Copy the values and sequence numbers of all signals into an
+        existing snapshot. Returns True if the store was written since the
+        previous read into this snapshot.
+        """
+        while True:
+            version = self._version
+            snapshot.values[:] = self._values
+            snapshot.sequence[:] = self._sequence
+            if not version & 1 and version == self._version:
+                break
+        updated = version != snapshot.version
+        snapshot.version = version
+        return updated
+
+
+class SignalNotifier:
+    """_summary_
+    Wake-up of the application thread by the subscriber thread
+
+    The subscriber calls set() once per received batch of signals, with the
+    bit mask of the changed signals (see SignalStore.take_changed()), or
+    without mask to only wake the application (e.g. to check timeouts).
+    wait() returns the masks of all set() calls since the previous wait()
+    combined, so a set() during the processing of the previous batch is
+    never lost, and several batches received while the application was busy
+    result in a single wake-up.
+    """
+    __slots__ = ("_condition", "_pending", "_changed")
+
+    def __init__(self):
+        self._condition = threading.Condition(threading.Lock())
+        self._pending = False
+        self._changed = 0
+
+    def set(self, changed=0):
+        """Wake the waiting thread, changed being a bit mask of signals"""
+        with self._condition:
+            self._changed |= changed
+            if not self._pending:
+                self._pending = True
+                self._condition.notify()
+
+    def is_set(self):
+        return self._pending
+
+    def wait(self, timeout=None):
+        """Wait for set() and return the combined bit mask of the changed
+        signals, 0 for a wake-up without changed signals. Returns None when
+        the timeout expired
+        """
+        with self._condition:
+            if not self._pending and not self._condition.wait_for(lambda: self._pending, timeout):
+                return None
+            changed = self._changed
+            self._pending = False
+            self._changed = 0
+            return changed
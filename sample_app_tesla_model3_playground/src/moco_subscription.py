@@ -0,0 +1,221 @@
+"""moco_subscription summary
+Signals subscribed to at Moco engine, changed while connected. Moco engine
+replies to the subscription list with the catalogue of supported VSS
+signals. The SignalCatalogue indexes the catalogue (also nested lists of
+signals) as a sorted list of names, so that a branch of the VSS tree is
+found with a binary search.
+The SubscriptionManager holds the current subscription list. Signals are
+added and removed by name or by pattern:
+    Vehicle.Speed : one signal
+    Vehicle.Powertrain.* : all signals of the branch Vehicle.Powertrain
+    Vehicle.*.Range : shell style wildcards, * matches any characters
+                      (also dots) and ? one character
+Added signals are validated against the catalogue and added to the
+SignalDispatcher, so handlers can be registered for them. Each change
+increments the version of the subscription and calls on_change, the
+subscriber then sends the new subscription list on the live connection. The
+values of removed signals are no longer sent by Moco engine, their handlers
+stay registered for when they are added again.
+"""
+
+import json
+import threading
+from bisect import bisect_left
+from fnmatch import fnmatchcase
+
+
+WILDCARDS = "*?["
+
+
+def catalogue_signals(signals):
+    """Yield the signal names of the "D" section of a catalogue reply, the
+    names can be nested in lists
+    """
+    for signal in signals:
+        if isinstance(signal, list):
+            yield from catalogue_signals(signal)
+        else:
+            yield signal
+
+
+class SignalCatalogue:
+    """_summary_
+    Index of the VSS signals supported by Moco engine
+
+    Args:
+        signals : Names of the supported signals, or the "D" section of a
+                  VSS_catalogue reply
+    """
+    __slots__ = ("_names", "_sorted")
+
+    def __init__(self, signals=()):
+        self._names = frozenset(catalogue_signals(signals))
+        self._sorted = sorted(self._names)
+
+    @classmethod
+    def from_reply(cls, reply):
+        """Create the catalogue from a VSS_catalogue reply of Moco engine"""
+        return cls(reply["D"])
+
+    def __contains__(self, name):
+        return name in self._names
+
+    def __len__(self):
+        return len(self._sorted)
+
+    def __iter__(self):
+        return iter(self._sorted)
+
+    def branch(self, prefix):
+        """Return the names of all signals of a branch of the VSS tree, e.g.
+        Vehicle.Powertrain, in alphabetical order
+        """
+        prefix = prefix.rstrip(".") + "."
+        start = bisect_left(self._sorted, prefix)
+        # "/" follows "." in the order of characters, the first name after
+        # the branch is at or after prefix[:-1] + "/"
+        end = bisect_left(self._sorted, prefix[:-1] + "/", start)
+        return self._sorted[start:end]
+
+    def match(self, pattern):
+        """Return the names of the signals matching a name or pattern, in
+        alphabetical order. A pattern ending in .* without other wildcards
+        selects a branch
+        """
+        if pattern.endswith(".*") and not any(wildcard in pattern[:-2] for wildcard in WILDCARDS):
+            return self.branch(pattern[:-2])
+        if any(wildcard in pattern for wildcard in WILDCARDS):
+            return [name for name in self._sorted if fnmatchcase(name, pattern)]
+        return [pattern] if pattern in self._names else []
+
+
+class SubscriptionManager:
+    """_summary_
+    Subscription list of the signals currently needed
+
+    Args:
+        subscription : Initial subscription list, e.g. {"CMD": "vss", "D": "..."}
+        dispatcher : SignalDispatcher of the subscriber, added signals are
+                     added to it. None to not update a dispatcher
+        required : Names of signals that can't be removed, e.g. the signals
+                   used by the application
+
+    Optional callback, set as attribute after creating the manager:
+        on_change(subscription) : Subscription list changed, called in the
+                                  thread changing it
+
+    The catalogue is set with set_catalogue() when Moco engine replied to
+    the subscription. Until then only complete names can be added and they
+    are not validated. Changes can be made from any thread.
+    """
+
+    def __init__(self, subscription, dispatcher=None, required=()):
+        self.command = subscription["CMD"]
+        self.dispatcher = dispatcher
+        self.required = frozenset(required)
+        self.catalogue = None
+        self.on_change = None
+        # Number of changes of the subscription list
+        self.version = 0
+        self._signals = [name.strip() for name in subscription["D"].split(",") if name.strip()]
+        self._lock = threading.Lock()
+
+    def __contains__(self, name):
+        return name in self._signals
+
+    def __len__(self):
+        return len(self._signals)
+
+    def signals(self):
+        """Return the names of the subscribed signals"""
+        return list(self._signals)
+
+    def subscription(self):
+        """Return the current subscription list"""
+        return {"CMD": self.command, "D": ",".join(self._signals)}
+
+    def message(self):
+        """Return the current subscription list as message for Moco engine"""
+        return json.dumps(self.subscription()).encode("utf-8")
+
+    def set_catalogue(self, reply):
+        """_summary_
+        Set the catalogue of supported signals
+
+        Args:
+            reply : VSS_catalogue reply of Moco engine, or a SignalCatalogue
+
+        Returns the names of subscribed signals that are not in the
+        catalogue.
+        """
+        catalogue = reply if isinstance(reply, SignalCatalogue) else SignalCatalogue.from_reply(reply)
+        self.catalogue = catalogue
+        return [name for name in self._signals if name not in catalogue]
+
+    def resolve(self, patterns):
+        """_summary_
+        Validate signal names and patterns against the catalogue
+
+        Args:
+            patterns : Signal names and patterns, see the module summary
+
+        Returns the matching signal names, each name once. Raises KeyError
+        when a name or pattern matches no signal of the catalogue and
+        ValueError for a pattern before the catalogue was received.
+        """
+        names = []
+        for pattern in patterns:
+            if self.catalogue is None:
+                if any(wildcard in pattern for wildcard in WILDCARDS):
+                    raise ValueError(f"Pattern {pattern} can't be used before the catalogue of Moco engine "
+                                     "was received")
+                matches = [pattern]
+            else:
+                matches = self.catalogue.match(pattern)
+                if not matches:
+                    raise KeyError(f"No signal in the catalogue of Moco engine matches {pattern}")
+            names.extend(name for name in matches if name not in names)
+        return names
+
+    def add(self, *patterns):
+        """Subscribe to the signals matching the patterns, returns the names
+        of the signals that were added
+        """
+        names = self.resolve(patterns)
+        with self._lock:
+            added = [name for name in names if name not in self._signals]
+            if not added:
+                return []
+            if self.dispatcher is not None:
+                for name in added:
+                    self.dispatcher.add_signal(name)
+            self._signals.extend(added)
+            self.version += 1
+        self._changed()
+        return added
+
+    def remove(self, *patterns):
+        """Stop the subscription of the signals matching the patterns,
+        returns the names of the signals that were removed. Raises ValueError
+        for a required signal
+        """
+        with self._lock:
+            removed = []
+            for pattern in patterns:
+                matches = (SignalCatalogue(self._signals).match(pattern)
+                           if any(wildcard in pattern for wildcard in WILDCARDS) else
+                           [pattern] if pattern in self._signals else [])
+                removed.extend(name for name in matches if name not in removed)
+            required = [name for name in removed if name in self.required]
+            if required:
+                raise ValueError(f"Signals required by the application can't be removed: {', '.join(required)}")
+            if not removed:
+                return []
+            self._signals = [name for name in self._signals if name not in removed]
+            self.version += 1
+        self._changed()
+        return removed
+
+    def _changed(self):
+        if self.on_change is not None:
+            self.on_change(self.subscription())
@@ -0,0 +1,68 @@
+"""moco_tls summary
+Resumption of TLS sessions when reconnecting to the Moco engine. A full TLS
+handshake verifies the certificate of the Moco engine and costs an extra
+round trip and the public key operations of both sides. After a restart of
+the Moco engine all vehicles reconnect at the same time, so the handshakes
+add to the time without data. A ResumingContext keeps the ssl.SSLSession of
+the last connection and offers it with the next connection, the Moco engine
+then resumes the session with an abbreviated handshake. When the Moco engine
+doesn't accept the session (e.g. after a restart with new ticket keys) a
+full handshake is done, so resumption never prevents a reconnect.
+"""
+
+
+class ResumingContext:
+    """_summary_
+    SSL context of the connections to one Moco engine, resuming the TLS
+    session of the previous connection
+
+    Args:
+        context : ssl.SSLContext used to set up the TLS connections
+        resume : Offer the session of the previous connection, False for a
+                 full handshake with every connection
+
+    Used in place of the ssl.SSLContext: wrap_socket() for the socket of
+    get_signals, wrap_bio() is called by asyncio for open_connection. Other
+    attributes are those of context. A session is only valid for the Moco
+    engine that issued it, use one ResumingContext per endpoint.
+    """
+
+    def __init__(self, context, resume=True):
+        self.context = context
+        self.resume = resume
+        self.session = None
+        self.handshakes = 0
+        self.resumed = 0
+
+    def __getattr__(self, name):
+        return getattr(self.context, name)
+
+    def wrap_socket(self, sock, server_hostname=None):
+        return self.context.wrap_socket(sock, server_hostname=server_hostname,
+                                        session=self.session if self.resume else None)
+
+    def wrap_bio(self, incoming, outgoing, server_side=False, server_hostname=None, session=None):
+        if session is None and self.resume:
+            session = self.session
+        return self.context.wrap_bio(incoming, outgoing, server_side, server_hostname, session=session)
+
+    def established(self, ssl_object):
+        """_summary_
+        Keep the session of a connection for the next connection
+
+        Args:
+            ssl_object : ssl.SSLSocket or ssl.SSLObject of the connection
+
+        Call it after the first data was received on the connection: with
+        TLS 1.3 the Moco engine sends the session ticket after the
+        handshake. Returns True when the connection resumed the session of
+        the previous connection.
+        """
+        self.handshakes += 1
+        reused = ssl_object.session_reused
+        if reused:
+            self.resumed += 1
+        session = ssl_object.session
+        if session is not None and self.resume:
+            self.session = session
+        return reused
@@ -0,0 +1,304 @@
+"""moco_tripstore summary
+Append-only store of the samples of all drive cycles, kept across runs of
+the application. Every sample is a fixed-width record of doubles, one per
+column, appended to the data file. The samples of one drive cycle form a
+segment of consecutive records, and a small index file holds the first
+record, number of records and time range of every segment. Finding the drive
+cycles between two times only reads the index, the records of a drive cycle
+are read from the memory-mapped data file without parsing or copying.
+
+File format (little endian):
+    trips.dat : b"MOCOTRP1", header size (uint32), JSON header with the
+                column names, padded with spaces to a multiple of 8 bytes,
+                followed by the records: one double per column
+    trips.idx : b"MOCOIDX1", followed by one entry per drive cycle: first
+                record (uint64), records (uint64), time of the first and of
+                the last record (double)
+Records are written in chunks, a segment is added to the index when its
+drive cycle ended and all its records were written. Records after the last
+segment of the index (e.g. the application stopped during a drive cycle)
+become a segment when the store is opened again, an incomplete record or
+index entry at the end of a file is removed.
+"""
+
+import json
+import mmap
+import os
+import struct
+import sys
+import time
+from array import array
+from bisect import bisect_right
+from collections import namedtuple
+
+from moco_recorder import FILE_HEADER, ITEM_SIZE
+
+
+DATA_MAGIC = b"MOCOTRP1"
+INDEX_MAGIC = b"MOCOIDX1"
+INDEX_ENTRY = struct.Struct("<QQdd")
+DATA_FILE = "trips.dat"
+INDEX_FILE = "trips.idx"
+
+# Segment of the records of one drive cycle, as held in the index
+TripSegment = namedtuple("TripSegment", ["cycle", "first_record", "records", "start_time", "end_time"])
+
+
+def read_data_header(data):
+    """Return the column names and the offset of the first record of a trip
+    store data file, data being the start of the file
+    """
+    if len(data) < FILE_HEADER.size:
+        raise ValueError("Not a Moco trip store: file too short")
+    magic, header_size = FILE_HEADER.unpack_from(data, 0)
+    if magic != DATA_MAGIC:
+        raise ValueError("Not a Moco trip store")
+    start = FILE_HEADER.size
+    header = json.loads(bytes(data[start:start + header_size]))
+    return header["columns"], start + header_size
+
+
+def read_index(data):
+    """Return the list of TripSegment of a trip store index file, data being
+    the contents of the file. An incomplete last entry is ignored
+    """
+    if data[:len(INDEX_MAGIC)] != INDEX_MAGIC:
+        raise ValueError("Not a Moco trip store index")
+    entries = (len(data) - len(INDEX_MAGIC)) // INDEX_ENTRY.size
+    return [TripSegment(cycle, *INDEX_ENTRY.unpack_from(data, len(INDEX_MAGIC) + cycle * INDEX_ENTRY.size))
+            for cycle in range(entries)]
+
+
+class TripStore:
+    """_summary_
+    Append the samples of drive cycles to a trip store
+
+    Args:
+        directory : Directory of the data and index file, created when it
+                    doesn't exist. An existing store is continued, it must
+                    have the same columns
+        columns : Names of the columns, every sample has one value per
+                  column. The first column is the time of the sample
+        chunk_rows : Number of samples kept in memory before they are written
+        flush_interval : Seconds after which samples are written, also when
+                         the chunk is not full. None to only write full chunks
+        fsync : Force every chunk and index entry to disk, not only to the
+                operating system
+    """
+
+    def __init__(self, directory, columns, chunk_rows=4096, flush_interval=10.0, fsync=False):
+        self.directory = directory
+        self.columns = list(columns)
+        self.chunk_rows = chunk_rows
+        self.flush_interval = flush_interval
+        self.fsync = fsync
+        self._record_size = len(self.columns) * ITEM_SIZE
+        self._chunk = array("d")
+        self._last_flush = time.monotonic()
+        os.makedirs(directory, exist_ok=True)
+        data_path = os.path.join(directory, DATA_FILE)
+        index_path = os.path.join(directory, INDEX_FILE)
+
+        if os.path.exists(data_path) and os.path.getsize(data_path) > 0:
+            self._data = open(data_path, "r+b")
+            columns, self._data_start = read_data_header(self._data.read(1 << 16))
+            if columns != self.columns:
+                self._data.close()
+                raise ValueError(f"Trip store {directory} has different columns: {columns}")
+            size = os.path.getsize(data_path)
+            self.records = (size - self._data_start) // self._record_size
+            # Remove an incomplete record
+            self._data.truncate(self._data_start + self.records * self._record_size)
+            self._data.seek(0, 2)
+        else:
+            self._data = open(data_path, "wb")
+            header = json.dumps({"columns": self.columns}).encode("utf-8")
+            header += b" " * (-(FILE_HEADER.size + len(header)) % ITEM_SIZE)
+            self._data.write(FILE_HEADER.pack(DATA_MAGIC, len(header)) + header)
+            self._data.flush()
+            self._data_start = self._data.tell()
+            self.records = 0
+
+        if os.path.exists(index_path) and os.path.getsize(index_path) >= len(INDEX_MAGIC):
+            self._index = open(index_path, "r+b")
+            segments = read_index(self._index.read())
+            self._index.truncate(len(INDEX_MAGIC) + len(segments) * INDEX_ENTRY.size)
+            self._index.seek(0, 2)
+        else:
+            self._index = open(index_path, "wb")
+            self._index.write(INDEX_MAGIC)
+            self._index.flush()
+            segments = []
+        self.cycles = len(segments)
+        # First record of the current segment, time of its first and last sample
+        self._segment_start = segments[-1].first_record + segments[-1].records if segments else 0
+        self._start_time = None
+        self._end_time = None
+        if self.records > self._segment_start:
+            # Records of a drive cycle that was not ended
+            self._recover_segment()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def __len__(self):
+        """Number of samples, including samples not yet written"""
+        return self.records + len(self._chunk) // len(self.columns)
+
+    def _recover_segment(self):
+        first = self._data_start + self._segment_start * self._record_size
+        last = self._data_start + (self.records - 1) * self._record_size
+        self._data.seek(first)
+        self._start_time = struct.unpack("<d", self._data.read(ITEM_SIZE))[0]
+        self._data.seek(last)
+        self._end_time = struct.unpack("<d", self._data.read(ITEM_SIZE))[0]
+        self._data.seek(0, 2)
+        self.end_cycle()
+
+    def append(self, values):
+        """Add one sample of the current drive cycle, values being a sequence
+        with one number per column
+        """
+        if self._start_time is None:
+            self._start_time = values[0]
+        self._end_time = values[0]
+        self._chunk.extend(values)
+        if len(self._chunk) >= self.chunk_rows * len(self.columns) or (
+                self.flush_interval is not None and time.monotonic() - self._last_flush >= self.flush_interval):
+            self.flush()
+
+    def flush(self):
+        """Write the samples held in memory to the data file"""
+        self._last_flush = time.monotonic()
+        if not self._chunk or self._data is None:
+            return
+        if sys.byteorder != "little":
+            self._chunk.byteswap()
+        self._data.write(self._chunk.tobytes())
+        self._data.flush()
+        if self.fsync:
+            os.fsync(self._data.fileno())
+        self.records += len(self._chunk) // len(self.columns)
+        del self._chunk[:]
+
+    def end_cycle(self):
+        """End the current drive cycle, its samples are written and its
+        segment is added to the index. Nothing is added when the drive cycle
+        has no samples
+        """
+        self.flush()
+        records = self.records - self._segment_start
+        if records <= 0 or self._index is None:
+            return
+        self._index.write(INDEX_ENTRY.pack(self._segment_start, records, self._start_time, self._end_time))
+        self._index.flush()
+        if self.fsync:
+            os.fsync(self._index.fileno())
+        self.cycles += 1
+        self._segment_start = self.records
+        self._start_time = None
+        self._end_time = None
+
+    def close(self):
+        """Write the remaining samples and close the files. A drive cycle
+        that was not ended becomes a segment of the index
+        """
+        if self._data is not None:
+            self.end_cycle()
+            self._data.close()
+            self._index.close()
+            self._data = None
+            self._index = None
+
+
+class TripStoreReader:
+    """_summary_
+    Memory-mapped access to the drive cycles of a trip store
+
+    Args:
+        directory : Directory of the trip store
+
+    Only drive cycles in the index at the time of opening are read, a store
+    can be read while the application appends to it.
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        with open(os.path.join(directory, INDEX_FILE), "rb") as index:
+            self.segments = read_index(index.read())
+        self._path = os.path.join(directory, DATA_FILE)
+        with open(self._path, "rb") as data:
+            self._map = mmap.mmap(data.fileno(), 0, access=mmap.ACCESS_READ)
+        self.columns, self._data_start = read_data_header(self._map)
+        self._record_size = len(self.columns) * ITEM_SIZE
+        # Segments by start time, for queries by time
+        self._by_start = sorted(self.segments, key=lambda segment: segment.start_time)
+        self._start_times = [segment.start_time for segment in self._by_start]
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def __len__(self):
+        return len(self.segments)
+
+    def find(self, start_time=None, end_time=None):
+        """Return the segments of the drive cycles with samples between
+        start_time and end_time (None for no limit), ordered by time
+        """
+        last = len(self._by_start) if end_time is None else bisect_right(self._start_times, end_time)
+        return [segment for segment in self._by_start[:last]
+                if start_time is None or segment.end_time >= start_time]
+
+    def _span(self, segment):
+        start = self._data_start + segment.first_record * self._record_size
+        return start, start + segment.records * self._record_size
+
+    def records(self, segment):
+        """Return the samples of a drive cycle as a memoryview of doubles
+        into the memory map (no copy), the values of a sample following
+        each other in the order of columns. The doubles are little endian
+        """
+        start, end = self._span(segment)
+        return memoryview(self._map)[start:end].cast("d")
+
+    def column(self, segment, name):
+        """Return the values of one column of a drive cycle as array('d')"""
+        index = self.columns.index(name)
+        with self.records(segment) as view:
+            values = array("d", view[index::len(self.columns)])
+        if sys.byteorder != "little":
+            values.byteswap()
+        return values
+
+    def numpy_records(self, segment=None):
+        """Return the samples of a drive cycle, or of all drive cycles, as
+        numpy record array with one field per column, a read only view of
+        the data file (numpy.memmap, no copy)
+        """
+        # numpy is only imported when used, importing it takes time and memory
+        try:
+            import numpy
+        except ImportError:
+            raise ImportError("numpy is required for numpy_records()") from None
+        dtype = numpy.dtype([(name, "<f8") for name in self.columns])
+        if segment is None:
+            records = (len(self._map) - self._data_start) // self._record_size
+            first = 0
+        else:
+            records, first = segment.records, segment.first_record
+        if records == 0:
+            return numpy.empty(0, dtype=dtype)
+        return numpy.memmap(self._path, dtype=dtype, mode="r", offset=self._data_start + first * self._record_size,
+                            shape=(records,))
+
+    def close(self):
+        """Close the memory map. Views returned by records() must be
+        released first
+        """
+        self._map.close()
@@ -0,0 +1,167 @@
+"""moco_windows summary
+Windowed aggregation of signal samples. A SignalWindow holds the samples
+(time, value) of one signal in a ring buffer and keeps the aggregates of the
+samples in the window up to date with every added sample, so the cost of a
+sample does not depend on the size of the window:
+    - sum and mean of the values
+    - time weighted mean, each value weighted by the time until the next
+      sample
+    - integral of the value over time, e.g. the distance from the speed
+    - minimum and maximum
+    - delta, difference between the last and the first value
+Windows are tumbling (the window is emptied when complete) or sliding (the
+oldest samples are removed when new samples are added), with a size in
+samples or in seconds (time based).
+"""
+
+from array import array
+from collections import deque, namedtuple
+
+
+TUMBLING = "tumbling"
+SLIDING = "sliding"
+WINDOW_TYPES = (TUMBLING, SLIDING)
+
+# Ring buffer size of time based windows, when no size is given
+DEFAULT_CAPACITY = 4096
+
+# Aggregates of the samples in a window. Times in seconds, the integral in
+# value times seconds
+WindowSummary = namedtuple("WindowSummary", [
+    "count", "first_time", "last_time", "duration", "sum", "mean", "time_weighted_mean",
+    "integral", "min", "max", "delta"])
+
+
+class SignalWindow:
+    """_summary_
+    Window of samples of one signal with incremental aggregates
+
+    Args:
+        window_type : TUMBLING or SLIDING
+        samples : Size of the window in samples
+        duration : Size of the window in seconds (time based window), used
+                   when samples is None
+        capacity : Size of the ring buffer of a time based window. When the
+                   buffer is full the oldest sample is removed
+
+    complete is True when the window holds samples for its full size: for a
+    window in samples when it holds that many samples, for a time based
+    window when its samples span the duration. A tumbling window is emptied
+    with reset() after its summary was taken, a sliding window removes its
+    oldest samples itself.
+    """
+    __slots__ = ("window_type", "samples", "duration", "capacity", "count", "_times", "_values",
+                 "_head", "_sum", "_integral", "_minimum", "_maximum", "_sequence", "_filled")
+
+    def __init__(self, window_type=TUMBLING, samples=None, duration=None, capacity=None):
+        if window_type not in WINDOW_TYPES:
+            raise ValueError(f"Unknown window type: {window_type}")
+        if samples is None and duration is None:
+            raise ValueError("Window size in samples or duration is required")
+        self.window_type = window_type
+        self.samples = samples
+        self.duration = duration
+        self.capacity = samples if samples is not None else (capacity or DEFAULT_CAPACITY)
+        self._times = array("d", [0.0]) * self.capacity
+        self._values = array("d", [0.0]) * self.capacity
+        # Monotonic queues of (sequence, value) for the minimum and maximum
+        self._minimum = deque()
+        self._maximum = deque()
+        self.reset()
+
+    def __len__(self):
+        return self.count
+
+    def reset(self):
+        """Remove all samples from the window"""
+        self.count = 0
+        self._head = 0
+        self._sum = 0.0
+        self._integral = 0.0
+        self._sequence = 0
+        self._filled = False
+        self._minimum.clear()
+        self._maximum.clear()
+
+    @property
+    def complete(self):
+        if self.samples is not None:
+            return self.count >= self.samples
+        return self._filled
+
+    @property
+    def last_time(self):
+        """Time of the last sample, None for an empty window"""
+        if not self.count:
+            return None
+        return self._times[(self._head + self.count - 1) % self.capacity]
+
+    def add(self, time, value):
+        """_summary_
+        Add a sample to the window
+
+        Args:
+            time : Time of the sample in seconds, not before the time of the
+                   previous sample
+            value : Value of the sample
+        """
+        capacity = self.capacity
+        if self.count:
+            newest = (self._head + self.count - 1) % capacity
+            # The previous value holds until this sample
+            self._integral += self._values[newest] * (time - self._times[newest])
+        if self.count == capacity:
+            self._remove_oldest()
+        position = (self._head + self.count) % capacity
+        self._times[position] = time
+        self._values[position] = value
+        self.count += 1
+        self._sum += value
+
+        sequence = self._sequence + self.count - 1
+        minimum = self._minimum
+        while minimum and minimum[-1][1] >= value:
+            minimum.pop()
+        minimum.append((sequence, value))
+        maximum = self._maximum
+        while maximum and maximum[-1][1] <= value:
+            maximum.pop()
+        maximum.append((sequence, value))
+
+        if self.duration is not None and self.samples is None:
+            if time - self._times[self._head] >= self.duration:
+                self._filled = True
+            if self.window_type == SLIDING:
+                while time - self._times[self._head] > self.duration:
+                    self._remove_oldest()
+
+    def _remove_oldest(self):
+        head = self._head
+        value = self._values[head]
+        self._sum -= value
+        if self.count > 1:
+            self._integral -= value * (self._times[(head + 1) % self.capacity] - self._times[head])
+        self._head = (head + 1) % self.capacity
+        self.count -= 1
+        # Sequence number of the oldest sample in the window
+        self._sequence += 1
+        if self._minimum[0][0] < self._sequence:
+            self._minimum.popleft()
+        if self._maximum[0][0] < self._sequence:
+            self._maximum.popleft()
+        self._filled = True
+
+    def summary(self):
+        """Return the WindowSummary of the samples in the window, None for an
+        empty window
+        """
+        if not self.count:
+            return None
+        first = self._head
+        last = (self._head + self.count - 1) % self.capacity
+        duration = self._times[last] - self._times[first]
+        mean = self._sum / self.count
+        return WindowSummary(
+            self.count, self._times[first], self._times[last], duration, self._sum, mean,
+            self._integral / duration if duration > 0 else mean, self._integral,
+            self._minimum[0][1], self._maximum[0][1], self._values[last] - self._values[first])
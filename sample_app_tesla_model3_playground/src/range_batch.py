@@ -0,0 +1,236 @@
+"""range_batch summary
+Batch version of the range versus traveled distance calculation, for the
+offline analysis of recorded trips. The calculation of RangeCalculation
+(range_calculation.py) is done with NumPy on arrays holding the signal
+values of every update of the calculation, instead of one update at a time.
+The results are the same as the results of the streaming calculation: the
+same sample windows are found and the values are calculated in the same
+order of floating point operations.
+
+Each row of the input arrays holds the signal values passed to one call of
+RangeCalculation.update(). For a capture of the Moco engine stream (see
+moco_replay.py) these rows are created by updates_from_capture() in the
+same way as the subscriber takes the samples of the application thread
+during a replay (register_samples() of range_calculation.py): one row per
+received time signal, or per grid time when resampling. The filters and
+resampling of the application are passed as configured in the application,
+with other settings the results differ from the results of the application.
+
+The batch calculation covers the default window of the calculation, a
+tumbling window of WINDOW_SAMPLES samples with the mean speed.
+NumPy is required for this module, it is not available in the Alpine image.
+"""
+
+from bisect import bisect_left, bisect_right
+
+from moco_decoder import FrameDecoder
+from moco_framer import FrameBuffer
+from moco_replay import ReplayClock, StreamReplay
+from moco_signals import SignalFilter
+from range_calculation import (create_signal_store, register_samples, WindowResult, WINDOW_SAMPLES,
+                               VEHICLE_SPEED, UNIX_CLK_SEC, ODO, SOC, RANGE, POWER_STATE, POWER_STATE_DRIVE)
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+
+# Signal of each input array of analyze_updates()
+UPDATE_SIGNALS = {
+    "unix_time": UNIX_CLK_SEC,
+    "speed": VEHICLE_SPEED,
+    "soc": SOC,
+    "range": RANGE,
+    "odo": ODO,
+}
+
+
+def _require_numpy():
+    if np is None:
+        raise ImportError("NumPy is required for the batch calculation")
+
+
+def updates_from_capture(filename, subscription, signal_filters=None, resampler=None):
+    """_summary_
+    Create the input arrays of analyze_updates() from a capture
+
+    Args:
+        filename : Capture file written by the subscriber, see moco_replay.py
+        subscription : Subscription list used for the capture
+        signal_filters : Filters of the subscriber as signal name:
+                         (deadband, heartbeat), see signal_filters of the
+                         sample application. The heartbeat runs on the
+                         receive time of the capture. None for no filters
+        resampler : Function creating the Resampler (moco_resampler.py) from
+                    the signal names and the default values of the signal
+                    store, None to not resample
+
+    The capture is decoded into a signal store in the same way as in
+    replay_signals() of the sample application, a row is added for every
+    sample taken by register_samples().
+    Returns a dictionary of arrays, see analyze_updates()
+    """
+    _require_numpy()
+    dispatcher, store = create_signal_store(subscription)
+    clock = ReplayClock()
+    for signal_name, (deadband, heartbeat) in (signal_filters or {}).items():
+        if signal_name in dispatcher:
+            dispatcher.set_filter(signal_name, SignalFilter(deadband, heartbeat, clock.time))
+    rows = []
+    register_samples(dispatcher, store, rows.append,
+                     resampler(store.signals(), store.values()) if resampler is not None else None)
+    decoder = FrameDecoder()
+    decoder.add_names(dispatcher.signals())
+    frame_buffer = FrameBuffer()
+    for receive_time, data in StreamReplay(filename).records():
+        if not data:
+            frame_buffer.clear()
+            continue
+        clock.now = receive_time
+        frame_buffer.feed(data)
+        for frame in frame_buffer.frames():
+            name, value = decoder.decode(frame)
+            if name is not None:
+                dispatcher.dispatch(name, value)
+    # Rows hold the values in the order of the signals of the store
+    signal_names = store.signals()
+    columns = {name: signal_names.index(signal_name) for name, signal_name in UPDATE_SIGNALS.items()}
+    updates = {name: np.array([row[column] for row in rows], dtype=np.float64) for name, column in columns.items()}
+    power_state = signal_names.index(POWER_STATE)
+    updates["drive"] = np.array([row[power_state] == POWER_STATE_DRIVE for row in rows], dtype=bool)
+    return updates
+
+
+def find_windows(unix_time, window_samples=WINDOW_SAMPLES):
+    """_summary_
+    Find the sample windows of the streaming calculation
+
+    Args:
+        unix_time : Time signal of each update
+
+    A new sample is taken when the time signal changed since the last
+    sample. The update after the last sample of a window ends the window,
+    the first update after that starts the next window (with a sample,
+    unless the time signal is 0).
+    Returns the rows of the samples as 2D array (window, sample) and the rows
+    ending each window. Only complete windows are returned.
+    """
+    _require_numpy()
+    rows = len(unix_time)
+    changed = np.empty(rows, dtype=bool)
+    changed[:1] = True
+    np.not_equal(unix_time[1:], unix_time[:-1], out=changed[1:])
+    changes = np.flatnonzero(changed)
+    nonzero = np.flatnonzero(unix_time != 0)
+    # The windows depend on the end of the previous window, they are found
+    # one after the other. Python lists and bisect are faster than NumPy for
+    # single values
+    change_list = changes.tolist()
+    nonzero_list = nonzero.tolist()
+    following = window_samples - 1
+    firsts = []
+    nexts = []
+    ends = []
+    position = 0
+    while True:
+        # First sample of the window, compared to the time 0
+        first = bisect_left(nonzero_list, position)
+        if first >= len(nonzero_list):
+            break
+        first = nonzero_list[first]
+        next_sample = bisect_right(change_list, first)
+        if next_sample + following > len(change_list):
+            break
+        end = (change_list[next_sample + following - 1] if following else first) + 1
+        if end >= rows:
+            break
+        firsts.append(first)
+        nexts.append(next_sample)
+        ends.append(end)
+        position = end + 1
+    if not ends:
+        return np.empty((0, window_samples), dtype=np.intp), np.empty(0, dtype=np.intp)
+    samples = np.empty((len(ends), window_samples), dtype=np.intp)
+    samples[:, 0] = firsts
+    samples[:, 1:] = changes[np.array(nexts)[:, None] + np.arange(following)]
+    return samples, np.array(ends, dtype=np.intp)
+
+
+def analyze_updates(unix_time, speed, soc, range, odo, drive, window_samples=WINDOW_SAMPLES):
+    """_summary_
+    Calculate the window results of the streaming calculation at once
+
+    Args:
+        unix_time : Time signal (Vehicle.Private.UnixTime.Seconds)
+        speed : Vehicle speed
+        soc : State of charge
+        range : Remaining range
+        odo : Odometer (traveled distance)
+        drive : True when the power state was VEHICLE_POWER_STATE_DRIVE
+        window_samples : Number of samples per window
+
+    All arguments are arrays with one value per update of the calculation.
+    Returns a dictionary with one array per field of WindowResult and one
+    value per complete window.
+    """
+    _require_numpy()
+    unix_time, speed, soc, range, odo = (np.asarray(values, dtype=np.float64)
+                                         for values in (unix_time, speed, soc, range, odo))
+    drive = np.asarray(drive, dtype=bool)
+    samples, ends = find_windows(unix_time, window_samples)
+    windows = len(ends)
+    sample_time = unix_time[samples]
+
+    # Time stamp, sum of the time between all samples since the first
+    sample_steps = np.diff(sample_time.ravel(), prepend=sample_time.ravel()[:1])
+    time_stamp = np.cumsum(sample_steps).reshape(samples.shape)[:, -1] if windows else np.empty(0)
+
+    # Average speed, summed in the order of the samples
+    avg_spd = np.cumsum(speed[samples], axis=1)[:, -1] / window_samples if windows else np.empty(0)
+    hours = (sample_time[:, -1] - sample_time[:, 0]) / 3600.00 if windows else np.empty(0)
+    traveled_dist_calc_total = np.cumsum(hours * avg_spd)
+
+    end_soc = soc[ends]
+    end_odo = odo[ends]
+    end_range = range[ends]
+    end_drive = drive[ends]
+
+    delta_soc = np.zeros(windows)
+    delta_soc[1:] = end_soc[:-1] - end_soc[1:]
+    traveled_dist_odo = np.zeros(windows)
+    traveled_dist_odo[1:] = np.where(end_odo[:-1] > 0, end_odo[1:] - end_odo[:-1], 0.0)
+    traveled_dist_odo_total = np.cumsum(traveled_dist_odo)
+    delta_range = np.zeros(windows)
+    delta_range[1:] = end_range[:-1] - end_range[1:]
+
+    # A drive cycle ends at a window without drive power state following a
+    # window with drive power state
+    cycle_end = np.zeros(windows, dtype=np.int64)
+    cycle_end[1:] = ~end_drive[1:] & end_drive[:-1]
+    drive_cycle_count = np.cumsum(cycle_end)
+
+    return {
+        "time_stamp": time_stamp,
+        "avg_spd": avg_spd,
+        "traveled_dist_calc_total": traveled_dist_calc_total,
+        "traveled_dist_odo": traveled_dist_odo,
+        "traveled_dist_odo_total": traveled_dist_odo_total,
+        "delta_range": delta_range,
+        "delta_soc": delta_soc,
+        "soc": end_soc,
+        "range": end_range,
+        "drive_cycle_count": drive_cycle_count,
+    }
+
+
+def window_results(results):
+    """Convert the result of analyze_updates() to a list of WindowResult"""
+    return [WindowResult(*values) for values in zip(*(results[field].tolist() for field in WindowResult._fields))]
+
+
+def analyze_capture(filename, subscription, signal_filters=None, resampler=None):
+    """Calculate the window results of a captured trip, see
+    updates_from_capture() and analyze_updates()
+    """
+    return analyze_updates(**updates_from_capture(filename, subscription, signal_filters, resampler))
@@ -0,0 +1,371 @@
+"""range_calculation summary
+The calculations of the sample application, comparing the difference in
+remaining range with the traveled distance. The state of the calculation is
+held in a RangeCalculation object, so that the same calculation can run for
+one vehicle in the application thread or for many vehicles in fleet mode.
+The calculation takes 10 samples, every time the signal containing the time
+is updated. After 10 samples the traveled distance from the odometer signal
+is compared to the difference in range between the start and end of the
+sample time. Over the same sample time the average vehicle speed and the
+distance traveled based on the average speed is calculated.
+The samples are collected in a SignalWindow (moco_windows.py), by default
+a tumbling window of 10 samples. Other windows, e.g. sliding or time based
+windows, can be passed to the calculation.
+The logged samples of each window can be analysed in worker processes by a
+WindowOffload (moco_offload.py), the results are reported in order.
+The samples of every drive cycle can be kept across runs in a TripStore
+(moco_tripstore.py), one segment per drive cycle.
+"""
+
+import csv
+from collections import namedtuple
+
+from moco_logging import console
+from moco_recorder import RecordingReader
+from moco_signals import SignalDispatcher, SignalStore
+from moco_windows import SignalWindow, TUMBLING
+
+
+# VSS names of the signals used by the calculation
+VEHICLE_SPEED = "Vehicle.Speed"
+UNIX_CLK_SEC = "Vehicle.Private.UnixTime.Seconds"
+ODO = "Vehicle.Powertrain.Transmission.TravelledDistance"
+SOC = "Vehicle.Powertrain.TractionBattery.StateOfCharge.Displayed"
+RANGE = "Vehicle.Powertrain.Range"
+POWER_STATE = "Vehicle.Private.PowerState"
+HVAC_STATE = "Vehicle.Cabin.HVAC.IsAirConditioningActive"
+
+POWER_STATE_DRIVE = "VEHICLE_POWER_STATE_DRIVE"
+
+# Number of samples per calculation window
+WINDOW_SAMPLES = 10
+
+# Columns of the logged data, in the order of RangeCalculation.axes()
+LOG_COLUMNS = ["time", "vehicle_speed", "soc", "hvac_state", "range", "distance_traveled"]
+
+# Columns of the samples in the trip store: the time signal of Moco engine,
+# vehicle speed, state of charge, air conditioning state, range (km) and
+# odometer
+TRIP_COLUMNS = ["time", "vehicle_speed", "soc", "hvac_state", "range", "odometer"]
+
+# Results calculated at the end of each window of samples
+WindowResult = namedtuple("WindowResult", [
+    "time_stamp", "avg_spd", "traveled_dist_calc_total", "traveled_dist_odo",
+    "traveled_dist_odo_total", "delta_range", "delta_soc", "soc", "range",
+    "drive_cycle_count"])
+
+
+def print_report(message):
+    """Default report function of the calculation, prints the message
+    through the console logger
+    """
+    console.info(message)
+
+
+def hvac_state_value(hvac_state):
+    """Air conditioning state as number for recording, 1.0 when active"""
+    return 1.0 if hvac_state is True or str(hvac_state).lower() == "true" else 0.0
+
+
+def create_signal_store(subscription):
+    """ Create the signal dispatcher and the store holding the latest value
+        of each subscribed signal. The subscriber writes into the store
+        through the dispatcher, the application reads all signals in one call
+    """
+    dispatcher = SignalDispatcher.from_subscription(subscription)
+    store = SignalStore(dispatcher.signals(), defaults={POWER_STATE: ""})
+    # Map each subscribed signal to the signal store. Signals without a
+    # registered handler are ignored by the subscriber
+    for signal_name in dispatcher.signals():
+        if signal_name in (POWER_STATE, HVAC_STATE):
+            dispatcher.register(signal_name, store.setter(signal_name), converter=None, notify=False)
+        else:
+            dispatcher.register(signal_name, store.setter(signal_name))
+    return dispatcher, store
+
+
+def register_samples(dispatcher, store, put, resampler=None):
+    """_summary_
+    Take the samples passed to RangeCalculation.update() from the signals
+
+    Args:
+        dispatcher : SignalDispatcher of create_signal_store()
+        store : SignalStore of create_signal_store()
+        put : Function called with every sample, a list with the values of
+              the signals of the store
+        resampler : Resampler (moco_resampler.py) for the signals of the
+                    store, None to not resample
+
+    A sample is taken every time the time signal of Moco engine is received,
+    which is sent after all other signals of an update. With a resampler the
+    samples of the grid times passed by the time signal are taken instead.
+    """
+    if resampler is None:
+        dispatcher.register(UNIX_CLK_SEC, lambda _: put(store.values()), converter=None, notify=False)
+        return
+    # The values are converted as for the signal store
+    for signal_name in dispatcher.signals():
+        if signal_name != UNIX_CLK_SEC:
+            converter = None if signal_name in (POWER_STATE, HVAC_STATE) else float
+            dispatcher.register(signal_name, resampler.setter(signal_name), converter=converter, notify=False)
+
+    def put_rows(engine_time):
+        for row in resampler.advance(engine_time):
+            put(row)
+
+    dispatcher.register(UNIX_CLK_SEC, put_rows, notify=False)
+
+
+class RangeCalculation:
+    """_summary_
+    Range versus traveled distance calculation for one vehicle
+
+    Args:
+        report : Function called with each message describing the result
+                 of a sample window, e.g. to print and log the message
+        recorder : ColumnRecorder with the columns LOG_COLUMNS, the logged
+                   samples are written to this recorder instead of lists
+        window : SignalWindow collecting the vehicle speed samples, None for
+                 a tumbling window of WINDOW_SAMPLES samples. A result is
+                 calculated at the update after the window became complete
+                 and, for a sliding window, after every further sample
+        time_weighted : Use the time weighted mean of the vehicle speed
+                        instead of the mean of the samples
+        offload : WindowOffload with the columns LOG_COLUMNS, the logged
+                  samples since the previous result are submitted to it at
+                  the end of every window and the analysis results are
+                  reported when available
+        dashboard : LiveDashboard receiving every logged sample (LOG_COLUMNS)
+        trip_store : TripStore with the columns TRIP_COLUMNS, the samples
+                     in drive are appended to it, a drive cycle is ended
+                     when the power state leaves drive
+
+    Call update() every time new signal values were received. Without a
+    recorder the logged samples are available in the lists t, veh_spd_array,
+    soc_array, hvac_state_array, range_array and distance_traveled_array.
+    axes() returns the logged samples in both cases.
+    """
+
+    def __init__(self, report=print_report, recorder=None, window=None, time_weighted=False,
+                 offload=None, dashboard=None, trip_store=None):
+        self.report = report
+        self.recorder = recorder
+        self.offload = offload
+        self.dashboard = dashboard
+        self.trip_store = trip_store
+        # Logged samples since the previous result, for the offload
+        self.window_rows = []
+        self.window = window if window is not None else SignalWindow(TUMBLING, samples=WINDOW_SAMPLES)
+        self.time_weighted = time_weighted
+
+        # Time stamp of the last sample, 0 at the start of a tumbling window
+        self.last_sample_time = 0
+        # Set when the window is complete, the next update ends the window
+        self.window_ready = False
+        # Time of the last sample of the previous result
+        self.last_window_time = None
+        self.last_power_state = ""
+        self.drive_cycle_count = 0
+        self.delta_soc = 0
+        self.delta_soc_since_start = 0
+        self.time_stamp = 0
+        self.t_previous = None
+        self.previous_odo = None
+        self.traveled_distance = 0
+        self.traveled_dist_odo_total = 0
+        self.traveled_dist_calc_total = 0
+        self.start_soc = None
+        self.last_soc = None
+        self.last_odo = None
+        self.prev_range = None
+        self.avg_spd = 0
+
+        # Logging data
+        self.t = []
+        self.veh_spd_array = []
+        self.soc_array = []
+        self.hvac_state_array = []
+        self.range_array = []
+        self.distance_traveled_array = []
+
+    def axes(self):
+        """Return the logged data as (time, speed, soc, hvac state, range,
+        distance traveled) lists, or arrays read from the recording
+        """
+        if self.recorder is not None:
+            self.recorder.flush()
+            with RecordingReader(self.recorder.filename) as reader:
+                return tuple(reader.column(name) for name in LOG_COLUMNS)
+        return (self.t, self.veh_spd_array, self.soc_array, self.hvac_state_array,
+                self.range_array, self.distance_traveled_array)
+
+    def close(self):
+        """Write the remaining samples and close the recorder, report the
+        results of all windows submitted to the offload
+        """
+        if self.recorder is not None:
+            self.recorder.close()
+        if self.trip_store is not None:
+            self.trip_store.close()
+        if self.offload is not None:
+            self.report_analysis(self.offload.drain())
+
+    def report_analysis(self, results):
+        """Report (sequence, result) of windows analysed by the offload"""
+        for sequence, result in results:
+            self.report(f"Analysis of window {sequence}: {result}")
+
+    def write_csv(self, filename):
+        """Write the logged data to a CSV file, one row per signal"""
+        with open(filename, 'w') as output_file:
+            csv_writer = csv.writer(output_file)
+            for row in self.axes():
+                csv_writer.writerow(row)
+
+    def update(self, signals):
+        """_summary_
+        Process the latest signal values
+
+        Args:
+            signals : Mapping from VSS signal name to the latest value, e.g.
+                      a SignalSnapshot
+
+        Returns a WindowResult when a window of samples was completed,
+        otherwise None.
+        """
+        lcl_unix_clk_sec = signals[UNIX_CLK_SEC]
+        if self.offload is not None and len(self.offload):
+            self.report_analysis(self.offload.completed())
+        # Data collection done
+        if self.window_ready:
+            return self.end_window(signals[SOC], signals[ODO], signals[RANGE], signals[POWER_STATE])
+        # Data collection
+        if self.last_sample_time != lcl_unix_clk_sec:
+            self.add_sample(lcl_unix_clk_sec, signals[VEHICLE_SPEED], signals[SOC],
+                            signals[HVAC_STATE], signals[RANGE], signals[ODO])
+            if self.trip_store is not None and signals[POWER_STATE] == POWER_STATE_DRIVE:
+                self.trip_store.append((lcl_unix_clk_sec, signals[VEHICLE_SPEED], signals[SOC],
+                                        hvac_state_value(signals[HVAC_STATE]),
+                                        round(signals[RANGE]/1000, 3), signals[ODO]))
+            self.window_ready = self.window.complete
+        return None
+
+    def add_sample(self, lcl_unix_clk_sec, lcl_vehicle_speed, lcl_soc, lcl_hvac_state, lcl_range, lcl_odo):
+        """Add one sample to the current window and to the logged data"""
+        self.last_sample_time = lcl_unix_clk_sec
+        self.window.add(lcl_unix_clk_sec, lcl_vehicle_speed)
+        # Create an array of time stamps that can be used to plot results over time
+        if self.t_previous is not None:
+            self.time_stamp += lcl_unix_clk_sec - self.t_previous
+            sample_time = self.time_stamp
+        else:
+            sample_time = 0
+        self.t_previous = lcl_unix_clk_sec
+        if self.previous_odo is None:
+            self.traveled_distance = 0
+        elif self.previous_odo > 0:
+            self.traveled_distance += lcl_odo - self.previous_odo
+        else:
+            self.traveled_distance = 0
+        self.previous_odo = lcl_odo
+
+        if self.recorder is not None or self.offload is not None or self.dashboard is not None:
+            row = (sample_time, lcl_vehicle_speed, lcl_soc, hvac_state_value(lcl_hvac_state),
+                   round(lcl_range/1000, 3), self.traveled_distance)
+            if self.offload is not None:
+                self.window_rows.append(row)
+            if self.dashboard is not None:
+                self.dashboard.append(row)
+        if self.recorder is not None:
+            self.recorder.append(row)
+        else:
+            self.t.append(sample_time)
+            self.veh_spd_array.append(lcl_vehicle_speed)
+            self.soc_array.append(lcl_soc)
+            self.hvac_state_array.append(lcl_hvac_state)
+            self.range_array.append(round(lcl_range/1000, 3))
+            self.distance_traveled_array.append(self.traveled_distance)
+
+    def end_window(self, lcl_soc, lcl_odo, lcl_range, lcl_power_state):
+        """Calculate and report the results of the current window"""
+        # Calculate time between last and first sample in this period
+        window = self.window.summary()
+        actual_time = window.duration
+        # Sliding windows overlap, the distance is calculated over the time
+        # since the previous result
+        if self.window.window_type != TUMBLING and self.last_window_time is not None:
+            actual_time = window.last_time - self.last_window_time
+        self.last_window_time = window.last_time
+        hours = actual_time/3600.00
+
+        # State of charge change
+        if self.start_soc is None:
+            self.start_soc = lcl_soc
+        if self.last_soc is not None:
+            self.delta_soc = self.last_soc - lcl_soc
+            # Calculate the change of state of charge from start to end of log/simulation
+            if self.start_soc > 0:
+                self.delta_soc_since_start = self.start_soc - self.delta_soc
+            else:
+                self.delta_soc_since_start = 0
+        self.last_soc = lcl_soc
+
+        # Calculate average speed over sample period
+        if self.time_weighted:
+            self.avg_spd = window.time_weighted_mean
+        else:
+            self.avg_spd = window.mean
+
+        # Calculate distance traveled, since start of simulation, based on average speed
+        self.traveled_dist_calc_total += hours * self.avg_spd
+        # Calculate distance traveled since start of simulation, based on odometer signal
+        if self.last_odo is not None and self.last_odo > 0:
+            traveled_dist_odo = lcl_odo - self.last_odo
+        else:
+            traveled_dist_odo = 0
+        self.last_odo = lcl_odo
+        self.traveled_dist_odo_total += traveled_dist_odo
+
+        # Calculate difference in estimated range during this period
+        if self.prev_range is not None:
+            delta_range = self.prev_range - lcl_range
+        else:
+            delta_range = 0
+        self.prev_range = lcl_range
+
+        # Compare to distance traveled
+        if delta_range > traveled_dist_odo:
+            self.report(f"Simulator Time: {self.time_stamp} : Range drop higher than prediction. Current range: {round(lcl_range/1000,3)} km")
+        elif traveled_dist_odo > delta_range:
+            self.report(f"Simulator Time: {self.time_stamp} seconds - Range drop lower than prediction. Current range: {round(lcl_range/1000,3)} km")
+        else:
+            self.report(f"Simulator Time: {self.time_stamp} seconds - Range drop matched prediction. Current range: {round(lcl_range/1000,3)} km")
+
+        # Calculate number of drive cycles during simulation
+        if lcl_power_state == POWER_STATE_DRIVE:
+            self.last_power_state = lcl_power_state
+        if (lcl_power_state != POWER_STATE_DRIVE) & (self.last_power_state == POWER_STATE_DRIVE):
+            self.last_power_state = lcl_power_state
+            self.drive_cycle_count += 1
+            if self.trip_store is not None:
+                self.trip_store.end_cycle()
+
+        self.report(f"Average speed {round(self.avg_spd,5)} (km/h), \
+calculated distance traveled {round(self.traveled_dist_calc_total,3)} (km), \
+distance traveled odometer {round(self.traveled_dist_odo_total,3)} (km), State of charge \
+change in sample: {self.delta_soc} (%), Current state of charge {lcl_soc}")
+
+        result = WindowResult(self.time_stamp, self.avg_spd, self.traveled_dist_calc_total,
+                              traveled_dist_odo, self.traveled_dist_odo_total, delta_range,
+                              self.delta_soc, lcl_soc, lcl_range, self.drive_cycle_count)
+
+        if self.offload is not None:
+            self.offload.submit(self.window_rows)
+            self.window_rows = []
+
+        self.avg_spd = 0
+        self.window_ready = False
+        if self.window.window_type == TUMBLING:
+            self.window.reset()
+            self.last_sample_time = 0
+        return result
@@ -32,6 +32,7 @@ import threading
 import time
 from threading import Thread, local
 import queue
+import select
 import socket
 import ssl
 import json
@@ -39,76 +40,419 @@ import csv
 import sys
 from configparser import ConfigParser
 
-ALPINE_BUILD = False
-
-try:
-    import matplotlib.pyplot as plt
-    import matplotlib.gridspec as gridspec
-except ImportError:    
-    ALPINE_BUILD = True
-
-
-# Read configuration from config file
-config = ConfigParser()
-config.read('cfg.ini')
-CERTIFICATE_PATH = config['cert']['path']
-PLATFORM_HOST = config['tcp']['host']
-SIMULATOR_PORT = config['tcp']['port']
-
-
-# Check if command line arguments were passed to set host and port
-# If no host is specified default host demo-amp.mocopla.link will be used
-# If no port is specified default port 55003 will be used
-if len(sys.argv) >= 2:
-    TCP_HOST= sys.argv[1]
-else:    
-    TCP_HOST = PLATFORM_HOST
-if len(sys.argv) >= 3:
-    tcp_port_str = sys.argv[2]
-    TCP_PORT = int(tcp_port_str)
-else:
-    TCP_PORT = int(SIMULATOR_PORT)
-
-
-context = ssl.SSLContext(ssl.PROTOCOL_TLS_CLIENT)
-context.verify_mode = ssl.CERT_OPTIONAL 
-context.check_hostname = False
-context.load_verify_locations(cafile = CERTIFICATE_PATH)
-
-
-logging.basicConfig(
-    format='%(asctime)s %(levelname)-8s: %(message)s',
-    datefmt='%d-%m-%Y %H:%M:%S',
-    level=logging.DEBUG,
-    filename='sample_app.txt'
-)
+from moco_decoder import FrameDecoder
+from moco_logging import console, setup_logging
+from moco_metrics import MetricsServer, SubscriberMetrics, SummaryLogger
+from moco_framer import FrameBuffer
+from moco_recorder import ColumnRecorder
+from moco_replay import ReplayClock, StreamCapture, StreamReplay, SystemClock
+from moco_signals import SignalFilter, SignalNotifier
+from moco_subscription import SubscriptionManager
+from moco_tls import ResumingContext
+from moco_windows import SignalWindow
+from range_calculation import RangeCalculation, create_signal_store, register_samples, LOG_COLUMNS, \
+    POWER_STATE_DRIVE, TRIP_COLUMNS, UNIX_CLK_SEC
+
+# Largest amount of data in one TLS record, read from the socket at once
+TLS_RECORD_SIZE = 16384
+
+
+def configure(config_file='cfg.ini', argv=None):
+    """_summary_
+    Read the configuration and set up the connection context and logging
+
+    Args:
+        config_file : Configuration file, see cfg.ini
+        argv : Command line arguments, by default sys.argv
+
+    Nothing is configured when the module is imported, so it can be
+    imported by other applications and tools without side effects. main()
+    calls configure() before starting the threads.
+    """
+    global BUFFER_SAMPLES_CAPACITY, BUFFER_SAMPLES_POLICY, BUFFER_SPILL_DIRECTORY, CAPTURE_FILE, CERTIFICATE_PATH, FLEET_ENDPOINTS, JSON_BACKEND, JSON_FAST_PATH, \
+        LOG_BACKUP_COUNT, LOG_DROP_POLICY, LOG_FILE, LOG_MAX_BYTES, LOG_MODE, LOG_QUEUE_SIZE, \
+        LOG_REPEAT_INTERVAL, METRICS_ADDRESS, METRICS_PORT, METRICS_SUMMARY_INTERVAL, \
+        OFFLOAD_ANALYSIS, OFFLOAD_SLOTS, OFFLOAD_SLOT_ROWS, OFFLOAD_START_METHOD, OFFLOAD_WORKERS, \
+        PLATFORM_HOST, PLOT_DASHBOARD, PLOT_FPS, PLOT_GRAPHS, PLOT_LIVE, PLOT_POINTS, PLOT_SHOW, \
+        RECEIVE_BUFFER_SIZE, RECORDER_CHUNK_ROWS, SIGNAL_FILTERS, RECORDER_FILE, \
+        RECORDER_FLUSH_INTERVAL, REPLAY_FILE, RESAMPLE_INTERPOLATION, RESAMPLE_LATENESS, \
+        RESAMPLE_MAX_GAP, RESAMPLE_PERIOD, SUBSCRIBER_SIGNALS, TRIP_STORE_DIRECTORY, TRIP_STORE_FLUSH_INTERVAL, REPLAY_SPEED, SIMULATOR_PORT, SUBSCRIBER_MODE, \
+        RECONNECT_MIN_STREAMING, TCP_HOST, TCP_PORT, TLS_RESUME_SESSION, WINDOW_DURATION, WINDOW_SAMPLES, WINDOW_TIME_WEIGHTED, WINDOW_TYPE, \
+        clock, context
+    if argv is None:
+        argv = sys.argv
+
+    # Read configuration from config file
+    config = ConfigParser()
+    config.read(config_file)
+    CERTIFICATE_PATH = config['cert']['path']
+    PLATFORM_HOST = config['tcp']['host']
+    SIMULATOR_PORT = config['tcp']['port']
+    # Resume the TLS session of the previous connection when reconnecting to
+    # Moco engine, instead of a full handshake
+    TLS_RESUME_SESSION = config.getboolean('tcp', 'resume_session', fallback=True)
+    # Seconds a connection must stream signals for the asyncio client to
+    # reconnect at once when it is lost, earlier losses use the back-off
+    RECONNECT_MIN_STREAMING = config.getfloat('tcp', 'min_streaming', fallback=10.0)
+    # Subscriber implementation: "thread" (get_signals) or "asyncio" (get_signals_async)
+    SUBSCRIBER_MODE = config.get('subscriber', 'mode', fallback='thread')
+    # Size in bytes of the receive buffer of the subscriber
+    RECEIVE_BUFFER_SIZE = config.getint('subscriber', 'receive_buffer', fallback=65536)
+    # JSON library used to decode messages: auto, orjson, ujson or json. With
+    # fast_path enabled signal messages are decoded without JSON library, auto
+    # enables the fast path when the json module of Python is used
+    JSON_BACKEND = config.get('subscriber', 'json_backend', fallback='auto')
+    JSON_FAST_PATH = config.get('subscriber', 'fast_path', fallback='auto')
+    JSON_FAST_PATH = None if JSON_FAST_PATH == 'auto' else config.getboolean('subscriber', 'fast_path')
+    # Drop unchanged signal values in the subscriber, see signal_filters
+    SIGNAL_FILTERS = config.getboolean('subscriber', 'filters', fallback=True)
+    # Further signals subscribed to when the catalogue of Moco engine is
+    # received, as names or patterns (e.g. Vehicle.Powertrain.*) separated by
+    # commas, see moco_subscription.py
+    SUBSCRIBER_SIGNALS = config.get('subscriber', 'signals', fallback='')
+
+    # File to which the logged data is written while logging, in chunks of
+    # samples. Without file name the logged data is kept in memory
+    RECORDER_FILE = config.get('recorder', 'file', fallback='')
+    RECORDER_CHUNK_ROWS = config.getint('recorder', 'chunk_rows', fallback=4096)
+    RECORDER_FLUSH_INTERVAL = config.getfloat('recorder', 'flush_interval', fallback=10.0)
+    # Directory of the trip store keeping the samples of every drive cycle
+    # across runs, not used when empty. Samples are written at least every
+    # flush_interval seconds
+    TRIP_STORE_DIRECTORY = config.get('tripstore', 'directory', fallback='')
+    TRIP_STORE_FLUSH_INTERVAL = config.getfloat('tripstore', 'flush_interval', fallback=10.0)
+    # Window of samples of the app calculation: tumbling or sliding, with a
+    # size in samples or, when a duration in seconds is set, time based. With
+    # average = time_weighted the average speed is weighted by the sample time
+    WINDOW_TYPE = config.get('window', 'type', fallback='tumbling')
+    WINDOW_SAMPLES = config.getint('window', 'samples', fallback=10)
+    WINDOW_DURATION = config.get('window', 'duration', fallback='')
+    WINDOW_TIME_WEIGHTED = config.get('window', 'average', fallback='mean') == 'time_weighted'
+
+    # Analysis of the logged samples of each window in worker processes: the
+    # function analysis (module:function) runs in a pool of workers processes,
+    # 0 to not offload. Windows are passed in slots of shared memory holding up
+    # to slot_rows samples
+    OFFLOAD_WORKERS = config.getint('offload', 'workers', fallback=0)
+    OFFLOAD_ANALYSIS = config.get('offload', 'analysis', fallback='moco_offload:window_statistics')
+    OFFLOAD_SLOTS = config.getint('offload', 'slots', fallback=16)
+    OFFLOAD_SLOT_ROWS = config.getint('offload', 'slot_rows', fallback=4096)
+    OFFLOAD_START_METHOD = config.get('offload', 'start_method', fallback='spawn')
+
+    # Buffer of the samples (values of all signals at every time signal of
+    # Moco engine) between the subscriber and application thread, holding up
+    # to capacity samples. When the application falls behind: keep_latest
+    # only keeps the latest sample, drop_oldest drops the oldest sample, block
+    # makes the subscriber wait and spill writes samples to a temporary file
+    # in spill_directory
+    BUFFER_SAMPLES_POLICY = config.get('buffering', 'samples', fallback='keep_latest')
+    BUFFER_SAMPLES_CAPACITY = config.getint('buffering', 'samples_capacity', fallback=1000)
+    BUFFER_SPILL_DIRECTORY = config.get('buffering', 'spill_directory', fallback='')
+    # Samples on a fixed grid of period seconds of the engine time instead of
+    # one sample per time signal, 0 to not resample. Signals are held at their
+    # last value (hold) or interpolated between two updates (linear). A sample
+    # is passed once the engine time is lateness seconds past its grid time,
+    # no samples are passed across gaps of more than max_gap seconds
+    RESAMPLE_PERIOD = config.getfloat('resample', 'period', fallback=0.0)
+    RESAMPLE_INTERPOLATION = config.get('resample', 'interpolation', fallback='hold')
+    RESAMPLE_LATENESS = config.getfloat('resample', 'lateness', fallback=0.0)
+    RESAMPLE_MAX_GAP = config.getfloat('resample', 'max_gap', fallback=5.0)
+
+    # Metrics of the subscriber and application thread, exposed in Prometheus
+    # format on http://<address>:<port>/metrics when port is not 0, and logged
+    # every summary_interval seconds when not 0
+    METRICS_PORT = config.getint('metrics', 'port', fallback=0)
+    METRICS_ADDRESS = config.get('metrics', 'address', fallback='127.0.0.1')
+    METRICS_SUMMARY_INTERVAL = config.getfloat('metrics', 'summary_interval', fallback=60.0)
+
+    # Logging: with mode = async the log records are written in a separate
+    # thread from a queue of queue_size records, when the queue is full records
+    # are dropped according to drop_policy (drop_new, drop_oldest or block).
+    # Identical messages are logged once per repeat_interval seconds and the
+    # log file is rotated at max_bytes (0 to not rotate)
+    LOG_FILE = config.get('logging', 'file', fallback='sample_app.txt')
+    LOG_MODE = config.get('logging', 'mode', fallback='sync')
+    LOG_QUEUE_SIZE = config.getint('logging', 'queue_size', fallback=10000)
+    LOG_DROP_POLICY = config.get('logging', 'drop_policy', fallback='drop_new')
+    LOG_REPEAT_INTERVAL = config.getfloat('logging', 'repeat_interval', fallback=0.0)
+    LOG_MAX_BYTES = config.getint('logging', 'max_bytes', fallback=0)
+    LOG_BACKUP_COUNT = config.getint('logging', 'backup_count', fallback=3)
+
+    # Graphs of the logged data when logging ends, when matplotlib is installed.
+    # The graphs are only shown in a window with show = true, they are always
+    # saved as graph_<time>.jpg. With live = true the graphs are drawn while
+    # driving in a separate process into the file dashboard, at most fps
+    # times per second with up to points samples per graph
+    PLOT_GRAPHS = config.getboolean('plot', 'enabled', fallback=True)
+    PLOT_SHOW = config.getboolean('plot', 'show', fallback=False)
+    PLOT_LIVE = config.getboolean('plot', 'live', fallback=False)
+    PLOT_DASHBOARD = config.get('plot', 'dashboard', fallback='dashboard.png')
+    PLOT_FPS = config.getfloat('plot', 'fps', fallback=2.0)
+    PLOT_POINTS = config.getint('plot', 'points', fallback=1000)
+
+    # Capture of the data received from Moco engine, written to the capture
+    # file when set. A capture is replayed instead of connecting to Moco engine
+    # when a replay file is set, at the given speed (0 for as fast as possible)
+    CAPTURE_FILE = config.get('replay', 'capture', fallback='')
+    REPLAY_FILE = config.get('replay', 'file', fallback='')
+    REPLAY_SPEED = config.getfloat('replay', 'speed', fallback=0.0)
+
+    # Endpoints of the Moco engines to subscribe to in fleet mode, as
+    # name=host:port separated by commas. Fleet mode is not used when empty
+    FLEET_ENDPOINTS = config.get('fleet', 'endpoints', fallback='')
+
+    # Check if command line arguments were passed to set host and port
+    # If no host is specified default host demo-amp.mocopla.link will be used
+    # If no port is specified default port 55003 will be used
+    # Fleet mode endpoints can be passed as: --fleet <name=host:port> ...
+    # A capture can be replayed with: --replay <capture file> [speed]
+    if len(argv) >= 2 and argv[1] == '--fleet':
+        FLEET_ENDPOINTS = ' '.join(argv[2:])
+        TCP_HOST = PLATFORM_HOST
+    elif len(argv) >= 3 and argv[1] == '--replay':
+        REPLAY_FILE = argv[2]
+        if len(argv) >= 4:
+            REPLAY_SPEED = float(argv[3])
+        TCP_HOST = PLATFORM_HOST
+    elif len(argv) >= 2:
+        TCP_HOST= argv[1]
+    else:    
+        TCP_HOST = PLATFORM_HOST
+    if len(argv) >= 3 and not FLEET_ENDPOINTS and argv[1] != '--replay':
+        tcp_port_str = argv[2]
+        TCP_PORT = int(tcp_port_str)
+    else:
+        TCP_PORT = int(SIMULATOR_PORT)
+
+    context = ssl.SSLContext(ssl.PROTOCOL_TLS_CLIENT)
+    context.verify_mode = ssl.CERT_OPTIONAL
+    context.check_hostname = False
+    context.load_verify_locations(cafile = CERTIFICATE_PATH)
+
+    # Time used for the timeouts of the application. During a replay the time
+    # is the receive time of the replayed data
+    clock = ReplayClock() if REPLAY_FILE else SystemClock()
+
+    for signal_name, (deadband, heartbeat) in signal_filters.items():
+        signal_dispatcher.set_filter(signal_name, SignalFilter(deadband, heartbeat, clock.time)
+                                     if SIGNAL_FILTERS else None)
+
+    # Messages are logged to the log file with logger and printed with console
+    setup_logging(LOG_FILE, LOG_MODE, logging.DEBUG, LOG_MAX_BYTES, LOG_BACKUP_COUNT,
+                  LOG_QUEUE_SIZE, LOG_DROP_POLICY, LOG_REPEAT_INTERVAL)
+
+
 logger = logging.getLogger(__name__)
 
-# To allert the application data is available a threading event is used
-tcp_signal_update = threading.Event()
+# To allert the application data is available a signal notifier is used. The
+# subscriber sets it once per received batch with the changed signals, the
+# application thread receives all changes since its previous wait
+tcp_signal_update = SignalNotifier()
 moco_engine_stopped = threading.Event()
+# Counters and histograms of the subscriber and application thread
+metrics = SubscriberMetrics()
+# Set by the application thread after processing signals, used to replay
+# a capture in the same steps as the data was received
+signals_consumed = threading.Event()
+
+# Time used for the timeouts of the application, set by configure(). During
+# a replay the time is the receive time of the replayed data
+clock = SystemClock()
 
 # List of signals to request from Moco engine to be used in the application
 subscription_list = {"CMD": "vss","D":"Vehicle.Private.PowerState,Vehicle.Powertrain.TractionBattery.StateOfCharge.Displayed,Vehicle.Powertrain.Range,Vehicle.Private.UnixTime.Seconds,Vehicle.Speed,Vehicle.Powertrain.Transmission.TravelledDistance,Vehicle.Cabin.HVAC.IsAirConditioningActive"}
 
+# Filters applied by the subscriber before the signals reach the application,
+# as signal name: (deadband, heartbeat). A value is only passed when it differs
+# from the last passed value by more than deadband (0 for any change), or
+# when heartbeat seconds passed since the last passed value (None for no
+# heartbeat). The time signal is not filtered, every time signal starts a
+# new sample
+signal_filters = {
+    "Vehicle.Private.PowerState": (0, 10),
+    "Vehicle.Powertrain.TractionBattery.StateOfCharge.Displayed": (0, 10),
+    "Vehicle.Powertrain.Range": (0, 10),
+    "Vehicle.Speed": (0, 10),
+    "Vehicle.Powertrain.Transmission.TravelledDistance": (0, 10),
+    "Vehicle.Cabin.HVAC.IsAirConditioningActive": (0, 10),
+}
+
+
+# Define queues to pass logged data to main thread, once at the end of the
+# drive cycle
+q_t_axis = queue.Queue(maxsize=1)
+q_veh_spd_axis = queue.Queue(maxsize=1)
+q_soc_axis = queue.Queue(maxsize=1)
+q_hvac_state_axis = queue.Queue(maxsize=1)
+q_range_axis = queue.Queue(maxsize=1)
+q_traveled_distance_axis = queue.Queue(maxsize=1)
+
+# Latest value of each subscribed signal. The subscriber thread writes into
+# the store through the dispatcher, the application thread reads all signals
+# in one call
+signal_dispatcher, signal_store = create_signal_store(subscription_list)
+UNIX_CLK_BIT = signal_store.bit(UNIX_CLK_SEC)
+
+# Signals subscribed to at Moco engine. Signals can be added and removed while
+# connected, e.g. subscriptions.add("Vehicle.Powertrain.*"), the subscriber
+# sends the new subscription list on the live connection. The signals of the
+# app calculation can't be removed
+subscriptions = SubscriptionManager(subscription_list, signal_dispatcher, required=signal_dispatcher.signals())
+metrics.subscribed_signals.function = subscriptions.__len__
+
+def report(message):
+    """ Log and print a message with results of the app calculation """
+    logger.info(message)
+    console.info(message)
+
+
+def notify_application():
+    """ Alert the application thread that a batch of signals was received,
+        with the signals changed since the previous batch. Called by the
+        subscriber after processing each batch
+    """
+    changed = signal_store.take_changed()
+    metrics.signals_suppressed.value = signal_dispatcher.suppressed
+    if changed & UNIX_CLK_BIT:
+        # Time from sending the time signal in Moco engine to receiving it
+        metrics.latency.observe(clock.time() - signal_store.get(UNIX_CLK_SEC))
+    tcp_signal_update.set(changed)
+
+
+def create_sample_buffer():
+    """ Create the buffer passing the samples from the subscriber to the
+        application thread, as configured in cfg.ini. A sample (the values
+        of all signals) is put into the buffer every time the time signal
+        of Moco engine is received, which is sent after all other signals
+        of an update. When resampling is configured, the samples of the
+        grid times passed by the time signal are put instead
+    """
+    from moco_buffer import SignalBuffer
+    samples = SignalBuffer(BUFFER_SAMPLES_POLICY, BUFFER_SAMPLES_CAPACITY,
+                           BUFFER_SPILL_DIRECTORY or None, metrics=metrics)
+    metrics.buffered_samples.function = samples.__len__
+    resampler = None
+    if RESAMPLE_PERIOD > 0:
+        from moco_resampler import Resampler
+        resampler = Resampler(signal_store.signals(), UNIX_CLK_SEC, RESAMPLE_PERIOD, RESAMPLE_INTERPOLATION,
+                              RESAMPLE_LATENESS, RESAMPLE_MAX_GAP, defaults=signal_store.values(),
+                              metrics=metrics)
+    register_samples(signal_dispatcher, signal_store, samples.put, resampler)
+    return samples
+
+
+def create_window():
+    """ Create the window of samples of the app calculation, as configured
+        in cfg.ini
+    """
+    if WINDOW_DURATION:
+        return SignalWindow(WINDOW_TYPE, duration=float(WINDOW_DURATION))
+    return SignalWindow(WINDOW_TYPE, samples=WINDOW_SAMPLES)
+
+
+def create_trip_store():
+    """ Open the trip store keeping the samples of every drive cycle, None
+        when not configured in cfg.ini
+    """
+    if not TRIP_STORE_DIRECTORY:
+        return None
+    from moco_tripstore import TripStore
+    return TripStore(TRIP_STORE_DIRECTORY, TRIP_COLUMNS, flush_interval=TRIP_STORE_FLUSH_INTERVAL)
+
+
+def create_offload():
+    """ Create the pool of worker processes analysing the windows of the app
+        calculation, None when not configured in cfg.ini
+    """
+    if OFFLOAD_WORKERS <= 0:
+        return None
+    # Only imported when used, multiprocessing and concurrent.futures add to
+    # the start up time
+    from moco_offload import WindowOffload, load_analysis
+    return WindowOffload(load_analysis(OFFLOAD_ANALYSIS), LOG_COLUMNS, OFFLOAD_WORKERS,
+                         OFFLOAD_SLOTS, OFFLOAD_SLOT_ROWS, OFFLOAD_START_METHOD)
+
+
+def create_dashboard():
+    """ Start the live dashboard of the logged data, None when not
+        configured in cfg.ini
+    """
+    if not (PLOT_GRAPHS and PLOT_LIVE):
+        return None
+    from moco_dashboard import LiveDashboard
+    return LiveDashboard(PLOT_DASHBOARD, PLOT_FPS, PLOT_POINTS).start()
+
 
-# Define queues to communicate between threads
-q_vehicle_speed = queue.Queue()
-q_unix_clk_sec = queue.Queue()
-q_odo = queue.Queue()
-q_soc = queue.Queue()
-q_range = queue.Queue()
-q_power_state = queue.Queue()
-q_hvac_state = queue.Queue()
+def graph_filename():
+    """ File name of the graphs of the logged data """
+    return "graph_"+str(time.time())+".jpg"
+
+
+def create_frame_decoder():
+    """ Create the decoder for messages received from Moco engine, using the
+        JSON backend configured in cfg.ini
+    """
+    decoder = FrameDecoder(JSON_BACKEND, fast_path=JSON_FAST_PATH)
+    decoder.add_names(signal_dispatcher.signals())
+    return decoder
 
-# Define queues to pass logged data to main thread
-q_seconds_list = queue.Queue()
-q_t_axis = queue.Queue()
-q_veh_spd_axis = queue.Queue()
-q_soc_axis = queue.Queue()
-q_hvac_state_axis = queue.Queue()
-q_range_axis = queue.Queue()
-q_traveled_distance_axis = queue.Queue()
+
+# Last catalogue replies received from Moco engine, by reply type
+catalogues = {}
+# Set when the signals configured in cfg.ini were added to the subscription
+configured_signals_added = threading.Event()
+
+
+def catalogue_received(json_parsed_response):
+    """ Handle a catalogue reply of Moco engine: print the catalogue and
+        validate the subscription against the supported VSS signals. The
+        signals configured in cfg.ini are added to the subscription with
+        the first catalogue only. Moco engine replies with the catalogue to
+        every subscription list, configured signals removed at runtime are
+        not added again
+    """
+    print_catalogue(json_parsed_response)
+    if json_parsed_response["REP"] != "VSS_catalogue":
+        return
+    for signal_name in subscriptions.set_catalogue(json_parsed_response):
+        logger.warning(f"Subscribed signal {signal_name} is not supported by Moco engine")
+    if configured_signals_added.is_set():
+        return
+    configured_signals_added.set()
+    for pattern in SUBSCRIBER_SIGNALS.split(","):
+        if not pattern.strip():
+            continue
+        try:
+            added = subscriptions.add(pattern.strip())
+        except KeyError as _e:
+            logger.warning(_e.args[0])
+        else:
+            if added:
+                logger.info(f"Subscribed to {', '.join(added)}")
+
+
+def print_catalogue(json_parsed_response):
+    """ Print the catalogue of supported VSS signals or static vehicle
+        information, as received from Moco engine after subscribing.
+        After a reconnect the catalogue is only printed again when it
+        differs from the last received catalogue
+    """
+    if catalogues.get(json_parsed_response["REP"]) == json_parsed_response:
+        logger.info(f'{json_parsed_response["REP"]} unchanged')
+        return
+    catalogues[json_parsed_response["REP"]] = json_parsed_response
+    if json_parsed_response["REP"]== "VSS_catalogue":
+        console.info("Supported VSS signals:")                
+        for signals in json_parsed_response["D"]:
+            if isinstance(signals, list):
+                for subsignal in signals:
+                    console.info(subsignal)
+            else:
+                console.info(signals)
+    if json_parsed_response["REP"]== "VSI_catalogue":
+        console.info("Supported static vehicle information:")                
+        for signals in json_parsed_response["D"]:
+            console.info(signals)
 
 
 def get_signals(tcp_host, tcp_port, signal_list):
@@ -117,13 +461,15 @@ def get_signals(tcp_host, tcp_port, signal_list):
     Args:
         TCP_HOST : _description_ IP Address of the TCP client
         TCP_PORT : _description_ Port number of the TCP client
-        signal_list :List of signals to be requested from Moco engine
+        signal_list :List of signals to be requested from Moco engine when
+                     connecting the first time. Changes of subscriptions are
+                     sent on the live connection and used for reconnects
 
     Function will set up the connection with the Moco engine. If connection 
     loss is detected the funtion will attempt to reconnect up to five times.
     When connection is established the function will receive data from Moco 
     engine. The data will be processed into signal names and values and passed 
-    to the application thread using a queue. If no data is being received from 
+    to the application thread through signal_dispatcher. If no data is being received from 
     Moco engine a synchronisation message is periodicaly send to the Moco 
     engine to test the connection.
     """
@@ -133,6 +479,110 @@ def get_signals(tcp_host, tcp_port, signal_list):
     # Flag indicating data was received from Moco Engine
     data_received = False    
 
+    # Time of the first sync reply after data was received from Moco engine
+    log_end_timer = None
+
+    # Received data is written directly into the buffer of the framer, which
+    # splits it into complete signal messages. The framer keeps the bytes of
+    # a message that ends "mid-signal" and completes it with the next
+    # received data
+    frame_buffer = FrameBuffer(RECEIVE_BUFFER_SIZE)
+    # Signal messages are decoded to name and value, other messages
+    # (replies of Moco engine) to a dictionary
+    decode = create_frame_decoder().decode
+    # Received data is also written to the capture file, if configured
+    capture = StreamCapture(CAPTURE_FILE, clock) if CAPTURE_FILE else None
+    # Time the last sync message was sent, for the round trip time
+    sync_sent = None
+    metrics.buffered_bytes.function = frame_buffer.__len__
+    # Reconnects resume the TLS session of the previous connection
+    tls = ResumingContext(context, TLS_RESUME_SESSION)
+    # Flag indicating no data was received yet on the current connection
+    new_connection = False
+    # Time the connection loss was detected, for the time to the first
+    # signal of the new connection
+    disconnected = None
+    # Version of the subscription list sent to Moco engine, a changed
+    # subscription is sent on the live connection
+    subscribed_version = 0
+
+    def receive_once():
+        """ Read from the socket into the frame buffer once """
+        buffer = frame_buffer.writable(TLS_RECORD_SIZE)
+        size = ssl_socket.recv_into(buffer)
+        if capture is not None:
+            capture.write(buffer[:size])
+        frame_buffer.commit(size)
+        return size
+
+    def receive():
+        """ Receive all data available from Moco engine into the frame buffer.
+            The first read waits for data (or times out), further reads are
+            only done while data is readable without waiting and the buffer
+            has room left. Returns the number of received bytes, 0 when Moco
+            engine closed the connection
+        """
+        size = receive_once()
+        received = size
+        while (size and len(frame_buffer) + TLS_RECORD_SIZE <= frame_buffer.capacity
+               and (ssl_socket.pending() or select.select([ssl_socket], [], [], 0)[0])):
+            size = receive_once()
+            received += size
+        metrics.bytes_received.value += received
+        return received
+
+    def process_frames():
+        """ Process all complete messages in the frame buffer. Signals are
+            passed to the application thread through the handlers registered
+            in signal_dispatcher and the application thread is alerted
+            signals are available using the signal notifier (tcp_signal_update),
+            once for all processed messages.
+            Returns the number of processed messages
+        """
+        nonlocal data_received, log_end_timer, sync_sent, new_connection, disconnected
+        start = time.perf_counter()
+        frames = frame_buffer.frames()
+        if new_connection and frames:
+            new_connection = False
+            metrics.tls_handshakes.inc()
+            if tls.established(ssl_socket):
+                metrics.tls_resumed.inc()
+        notify = False
+        signals = 0
+        for frame in frames:
+            signal_name, json_parsed = decode(frame)
+            if signal_name is not None:
+                signals += 1
+                if not data_received:
+                    data_received = True
+                if signal_dispatcher.dispatch(signal_name, json_parsed):
+                    notify = True
+            elif json_parsed["REP"] == "sync":
+                console.info('Sync message from Moco engine received')
+                if sync_sent is not None:
+                    metrics.sync_round_trip.observe(time.perf_counter() - sync_sent)
+                    sync_sent = None
+                if data_received:
+                    if log_end_timer is None:
+                        log_end_timer = clock.time()
+                    elif clock.time() - log_end_timer > 30:
+                        tcp_signal_update.set()
+            else:
+                catalogue_received(json_parsed)
+        if notify:
+            notify_application()
+        if signals and disconnected is not None:
+            elapsed = time.perf_counter() - disconnected
+            disconnected = None
+            metrics.reconnect_first_signal.observe(elapsed)
+            logger.info(f"First signal {1000 * elapsed:.0f} ms after connection loss, "
+                        f"TLS session resumed: {ssl_socket.session_reused}")
+        if frames:
+            metrics.frames_received.value += len(frames)
+            metrics.signals_received.value += signals
+            metrics.decode_time.observe(time.perf_counter() - start)
+        return len(frames)
+
     def moco_engine_connect(tcp_host, tcp_port, message_data):
         """ Funcion to connect to the TCP server in the Moco engine. The function
             can be used in case for first time connect and reconnect.
@@ -140,18 +590,20 @@ def get_signals(tcp_host, tcp_port, signal_list):
             If server is not available function will wait one second before
             continuing. Once connection is established function returns True
         """
+        nonlocal new_connection
         try:
             ssl_socket.connect((tcp_host, tcp_port))
         except ConnectionError as _e:
             if _e.args[1] == 'Connection refused' or _e.args[1] == 'No connection could be made because the target machine actively refused it':
-                print('Waiting for server to (re-)start')
+                console.info('Waiting for server to (re-)start')
                 time.sleep(1)
             else:
-                print(_e)
+                console.info(_e)
         else:
             ssl_socket.send(bytes(message_data, encoding="utf-8"))
             ssl_socket.setblocking(0)
             ssl_socket.settimeout(0.1)
+            new_connection = True
 
             return True
 
@@ -160,39 +612,26 @@ def get_signals(tcp_host, tcp_port, signal_list):
     # Required signals are provided in json_object
     moco_engine_connected = False
     json_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-    ssl_socket = context.wrap_socket(json_socket,server_hostname = tcp_host)
+    ssl_socket = tls.wrap_socket(json_socket, server_hostname=tcp_host)
     json_object = signal_list
     data = json.dumps(json_object)
     while not moco_engine_connected:
         if moco_engine_connect(tcp_host, tcp_port, data):
             moco_engine_connected = True
-    ssl_socket.setblocking(1)        
-    moco_engine_response = ssl_socket.recv(4096)
+    ssl_socket.setblocking(1)
+    # Wait for the reply to the subscription list (catalogue)
+    while receive() and not process_frames():
+        pass
     ssl_socket.setblocking(0)
     ssl_socket.settimeout(1)
-    available_signals = moco_engine_response.decode("utf-8")
-    json_parsed_response = json.loads(available_signals)
-    if json_parsed_response["REP"]== "VSS_catalogue":
-        print("Supported VSS signals:")                
-        for signals in json_parsed_response["D"]:
-            if isinstance(signals, list):
-                for subsignal in signals:
-                    print(subsignal)
-            else:
-                print(signals)
-    if json_parsed_response["REP"]== "VSI_catalogue":
-        print("Supported static vehicle information:")                
-        for signals in json_parsed_response["D"]:
-            print(signals)
-    buffer = []
-    buffer_update = False
-    message_segment = ""
 
     # With connection established, receive signals and check connection
-    t_start = time.time()
     while moco_engine_connected:
         try:
-            received = str(ssl_socket.recv(2048), "utf-8")
+            if subscriptions.version != subscribed_version:
+                subscribed_version = subscriptions.version
+                ssl_socket.send(subscriptions.message())
+            received = receive()
         except socket.error as _e:
             if (_e.args[0] == errno.EWOULDBLOCK or _e.args[0] == "timed out" or _e.args[0] == "The read operation timed out"):
                 # No message received, send sync message to Moco engine
@@ -200,37 +639,37 @@ def get_signals(tcp_host, tcp_port, signal_list):
                 data = json.dumps(json_object)
                 try:
                     ssl_socket.send(bytes(data, encoding="utf-8"))
-                    msg = ssl_socket.recv(2048).decode('utf-8')
-                    if msg == '{"REP":"sync"}\n':
-                        print('Sync message from Moco engine received')
-                        if data_received:
-                            if (not 'log_end_timer' in locals()):                                                            
-                                log_end_timer = time.time()
-                            else:                                
-                                if time.time() - log_end_timer > 30:
-                                    tcp_signal_update.set()
+                    sync_sent = time.perf_counter()
+                    # Reply is handled together with any other received data
+                    receive()
+                    process_frames()
                 except socket.error as _f:
                     if (_f.args[0] == 'Broken pipe' or _f.args[0] == 'Connection reset by peer'):
+                        metrics.reconnects.inc()
+                        disconnected = time.perf_counter()
                         reconnect_counter = 0
                         while reconnect_counter <=4:
                             if not moco_engine_connect(tcp_host, tcp_port, data):
                                 reconnect_counter += 1
                                 time.sleep(1)
                     else:
-                        print(_f)
+                        console.info(_f)
                         reconnecting = False
                         os._exit(1)
                 else:
                     time.sleep(5)
             else:  # General communication error other than timeout
                 if _e.args[0] == 'Transport endpoint is not connected':
+                    metrics.reconnects.inc()
+                    disconnected = time.perf_counter()
                     ssl_socket.close()
                     json_socket = socket.socket(socket.AF_INET,
                                             socket.SOCK_STREAM)
-                    ssl_socket = context.wrap_socket(json_socket,server_hostname = tcp_host)
+                    ssl_socket = tls.wrap_socket(json_socket, server_hostname=tcp_host)
                     reconnect_counter = 0
                     reconnecting = True
-                    json_object = signal_list
+                    subscribed_version = subscriptions.version
+                    json_object = subscriptions.subscription()
                     data = json.dumps(json_object)
                     while (reconnecting and (reconnect_counter<=10)):
                         if not moco_engine_connect(tcp_host,tcp_port, data):
@@ -240,23 +679,26 @@ def get_signals(tcp_host, tcp_port, signal_list):
                             data = json.dumps(json_object)
                             reconnecting = False
                     if reconnect_counter >= 5:
-                        print("Re-connection to Moco engine failed")
+                        console.info("Re-connection to Moco engine failed")
                         moco_engine_connected = False
                         moco_engine_stopped.set()
                         tcp_signal_update.set()
                         break
         else:
-            if received=='':
+            if not received:
                 # When Moco engine disconnects, socket returns empty data when
                 # connection is configured as NOBLOCK. Close socket and
                 # reconnect
+                metrics.reconnects.inc()
+                disconnected = time.perf_counter()
                 ssl_socket.close()
                 json_socket = socket.socket(socket.AF_INET,
                                             socket.SOCK_STREAM)
-                ssl_socket = context.wrap_socket(json_socket,server_hostname = tcp_host)
+                ssl_socket = tls.wrap_socket(json_socket, server_hostname=tcp_host)
                 reconnect_counter = 0
                 reconnecting = True
-                json_object = signal_list
+                subscribed_version = subscriptions.version
+                json_object = subscriptions.subscription()
                 data = json.dumps(json_object)
                 while (reconnecting and (reconnect_counter<=4)):
                     if not moco_engine_connect(tcp_host,tcp_port, data):
@@ -266,7 +708,7 @@ def get_signals(tcp_host, tcp_port, signal_list):
                         data = json.dumps(json_object)
                         reconnecting = False
                 if reconnect_counter == 5:
-                    print("Re-connection to Moco engine failed")
+                    console.info("Re-connection to Moco engine failed")
                     # after engine stops and doesn't restart the app exits here
                     moco_engine_connected = False
                     moco_engine_stopped.set()
@@ -274,293 +716,259 @@ def get_signals(tcp_host, tcp_port, signal_list):
                     break
                     # os._exit(1)
 
-            # Message received by TCP client. Signals inside message
-            # are seperated by '\n' character. Message will be split
-            # Signals (name and values) will be added to a buffer. In
-            # case message ends "mid-signal" the last element of the
-            # message is always used as the start of the next element
-            # in the buffer (message_segment)
-            split_message = received.split('\n')
-            if len(split_message) >= 2:
-                buffer.append(message_segment + split_message[0].strip())
-                buffer_update = True
-                for i in range(1, len(split_message) - 1):
-                    buffer.append(split_message[i].strip())
-                    buffer_update = True
-                if ('{' in split_message[-1] and '}' in split_message[-1]):
-                    buffer.append(split_message[-1].strip())
-                    message_segment=""
-                else:
-                    message_segment = split_message[-1]
-            else:
-                message_segment += split_message[0]
+                frame_buffer.clear()
+                if capture is not None:
+                    capture.mark_reconnect()
 
             # Process received signals
-            if buffer_update:
-                for signals in buffer:
-                    if signals != '':
-                        json_parsed = json.loads(signals)
-                    # Pass signals to application thread through queues allert
-                    # application thread signals are available using thread
-                    # event (tcp_signal_update)                    
-                    if(buffer_update and not "REP" in json_parsed):
-                        if not data_received:
-                            data_received = True
-                        if json_parsed["N"] == "Vehicle.Speed":
-                            q_vehicle_speed.put(float(json_parsed["V"]))
-                            tcp_signal_update.set()
-                        if json_parsed["N"] == "Vehicle.Private.UnixTime.Seconds":
-                            q_unix_clk_sec.put(float(json_parsed["V"]))
-                            tcp_signal_update.set()
-                        if json_parsed["N"] == "Vehicle.Powertrain.Transmission.TravelledDistance":
-                            q_odo.put(float(json_parsed["V"]))
-                            tcp_signal_update.set()
-                        if json_parsed["N"] == "Vehicle.Powertrain.TractionBattery.StateOfCharge.Displayed":
-                            q_soc.put(float(json_parsed["V"]))
-                            tcp_signal_update.set()
-                        if json_parsed["N"] == "Vehicle.Powertrain.Range":
-                            q_range.put(float(json_parsed["V"]))
-                            tcp_signal_update.set()
-                        if json_parsed["N"] == "Vehicle.Private.PowerState":
-                            q_power_state.put(json_parsed["V"])
-                            # tcp_signal_update.set()
-                        if json_parsed["N"] == "Vehicle.Cabin.HVAC.IsAirConditioningActive":
-                            q_hvac_state.put(json_parsed["V"])
-                            # tcp_signal_update.set()
-
-
-                buffer_update = False
-                buffer = []
-
-
-def app_calculations():
+            process_frames()
+
+
+def get_signals_async(tcp_host, tcp_port, signal_list):
+    """_summary_
+
+    Args:
+        TCP_HOST : _description_ IP Address of the TCP client
+        TCP_PORT : _description_ Port number of the TCP client
+        signal_list :List of signals to be requested from Moco engine when
+                     connecting the first time. Changes of subscriptions are
+                     sent on the live connection and used for reconnects
+
+    Alternative for get_signals using the asyncio based MocoEngineClient.
+    Received signals are passed to the application thread through
+    signal_dispatcher in the same way. Synchronisation messages are sent
+    from a timer instead of after a read timeout and reconnecting uses an
+    exponential back-off.
+    """
+    import asyncio
+    from moco_client import MocoEngineClient
+
+    capture = StreamCapture(CAPTURE_FILE, clock) if CAPTURE_FILE else None
+    client = MocoEngineClient(tcp_host, tcp_port, context, signal_list, signal_dispatcher,
+                              decoder=create_frame_decoder(), read_size=RECEIVE_BUFFER_SIZE,
+                              capture=capture, metrics=metrics, resume_session=TLS_RESUME_SESSION,
+                              min_streaming=RECONNECT_MIN_STREAMING)
+    log_end_timer = None
+
+    def sync_received():
+        nonlocal log_end_timer
+        console.info('Sync message from Moco engine received')
+        if client.data_received:
+            if log_end_timer is None:
+                log_end_timer = clock.time()
+            elif clock.time() - log_end_timer > 30:
+                tcp_signal_update.set()
+
+    def client_stopped():
+        moco_engine_stopped.set()
+        tcp_signal_update.set()
+
+    client.on_catalogue = catalogue_received
+    client.on_batch = notify_application
+    client.on_sync = sync_received
+    client.on_stopped = client_stopped
+    # Changes of the subscription are sent on the live connection
+    subscriptions.on_change = client.subscribe
+    if subscriptions.version:
+        client.subscribe(subscriptions.subscription())
+    asyncio.run(client.run())
+
+
+def replay_signals(replay_file, speed):
+    """_summary_
+
+    Args:
+        replay_file : Capture file written by get_signals or get_signals_async
+        speed : Replay speed as multiple of the original speed, 0 to replay
+                as fast as possible
+
+    Replacement for get_signals feeding the data of a capture into the
+    application thread. The data of each receive is processed in the same
+    way as by get_signals, after which the replay waits until the
+    application thread processed the signals. The clock is set to the
+    receive time of the data, so the timeouts of the application thread run
+    on the time of the capture. When the capture ends Moco engine is
+    reported as stopped.
+    """
+    frame_buffer = FrameBuffer(RECEIVE_BUFFER_SIZE)
+    decode = create_frame_decoder().decode
+    for data in StreamReplay(replay_file).replay(clock, speed):
+        if not data:
+            # Reconnect to Moco engine during the capture
+            frame_buffer.clear()
+            continue
+        frame_buffer.feed(data)
+        for frame in frame_buffer.frames():
+            signal_name, json_parsed = decode(frame)
+            if signal_name is not None:
+                signal_dispatcher.dispatch(signal_name, json_parsed)
+            elif json_parsed["REP"] != "sync":
+                catalogue_received(json_parsed)
+        # The application thread is woken after every receive, also for
+        # sync replies, so it checks its timeouts at the time of the capture
+        signals_consumed.clear()
+        notify_application()
+        signals_consumed.wait()
+    moco_engine_stopped.set()
+    tcp_signal_update.set()
+
+
+def app_calculations(samples):
     """_summary_
     Example application performing calculations described in summary
     his section is to be implemented by a developer and calculations
-    below are intended as a sample of a possible application
+    in range_calculation.py are intended as a sample of a possible application
     This application will receive signals from the subscriber thread. When
-    new data is available the subscriber thread will raise an event
+    new data is available the subscriber thread will set the signal notifier
     (tcp_signal_update) to alert the app to receive new signals and perform
-    calculations. Signals will be provided through a queue. By checking if
-    the queue is not empty the application will know which signal is updated
+    calculations. Signals will be provided through the signal store. The
+    sequence number of each signal in the snapshot tells the application
+    which signal is updated. The calculation runs for every sample taken
+    from the sample buffer, in the order the samples were received
+
+    Args:
+        samples : SignalBuffer holding the samples put by the subscriber,
+                  see create_sample_buffer()
     """
     
-    # Local copies of queued signals coming from the subsriber thread
-    lcl_vehicle_speed = 0
-    lcl_unix_clk_sec = 0
-    lcl_odo = 0
-    lcl_soc = 0
-    lcl_power_state = ""
-    lcl_hvac_state = 0
-    lcl_range = 0  
+    # Local copy of the signals coming from the subsriber thread
+    signals = signal_store.snapshot()
+    # Sample taken from the sample buffer, passed to the calculation
+    sample = signal_store.snapshot()
 
     # Variables used for flow control between subscribed and app thread
     time_out_start = 0
-    signal_update = False
-
-    # Local variables used in app calculation
-    seconds_list = [0]
-    last_power_state = ""
-    delta_soc = 0    
-    time_stamp = 0
-    traveled_dist_odo = 0
-    traveled_dist_odo_total = 0
-    times_spd = 0    
-    sum_spd = 0
-    avg_spd = 0
-    
-
-    # Local arrays to store logging data 
-    t = []
-    veh_spd_array = []
-    soc_array = []
-    hvac_state_array = []
-    range_array = []  
-    distance_traveled_array = []
+    unix_clk_sequence = 0
+
+    # State of the app calculation and logging data
+    recorder = None
+    if RECORDER_FILE:
+        recorder = ColumnRecorder(RECORDER_FILE, LOG_COLUMNS, RECORDER_CHUNK_ROWS, RECORDER_FLUSH_INTERVAL)
+    offload = create_offload()
+    dashboard = create_dashboard()
+    calculation = RangeCalculation(report=report, recorder=recorder, window=create_window(),
+                                   time_weighted=WINDOW_TIME_WEIGHTED, offload=offload,
+                                   dashboard=dashboard, trip_store=create_trip_store())
 
     while True:
-        # Check if updated signals are available
-        tcp_signal_update.wait()
-        if not q_vehicle_speed.empty():
-            lcl_vehicle_speed = q_vehicle_speed.get(-1)
-            signal_update = True            
-        if not q_unix_clk_sec.empty():
-            lcl_unix_clk_sec = q_unix_clk_sec.get(-1)
-            time_out_start = time.time()
-            signal_update = True
-        if q_unix_clk_sec.empty():
-            time_since_last_update = time.time() - time_out_start
+        # Wait until updated signals are available. changed_signals is a bit
+        # mask of the signals updated since the previous wait, see
+        # signal_store.changed_signals(). A wake-up without changed signals
+        # (e.g. to check the timeouts) doesn't need a new copy of the signals.
+        # While samples are waiting in the buffer there is no wait
+        changed_signals = tcp_signal_update.wait(0 if len(samples) else None)
+        if changed_signals is not None:
+            metrics.wakeups.inc()
+        if changed_signals:
+            signal_store.read(signals)
+
+        # Run the calculation for the samples received since the previous
+        # wake-up, up to the capacity of the buffer at once
+        rows = samples.take()
+        for row in rows:
+            sample.values[:] = row
+            calculation.update(sample)
+        if rows:
+            metrics.sample_lag.set(signal_store.get(UNIX_CLK_SEC) - sample[UNIX_CLK_SEC])
+
+        if signals.sequence_of(UNIX_CLK_SEC) != unix_clk_sequence:
+            unix_clk_sequence = signals.sequence_of(UNIX_CLK_SEC)
+            time_out_start = clock.time()
+        else:
+            time_since_last_update = clock.time() - time_out_start
             # Addition for log files with only one drive cycle. When log file completes
             # after 45 seconds of not receiving data the driving cycle will finish
-            if ((time_since_last_update > 45) & (last_power_state == "VEHICLE_POWER_STATE_DRIVE")) | moco_engine_stopped.is_set():
-                drive_cycle = False
+            # Samples still waiting in the buffer are processed first
+            if (((time_since_last_update > 45) & (calculation.last_power_state == POWER_STATE_DRIVE)) | moco_engine_stopped.is_set()) and not len(samples):
                 # Populate queues with logged data allowing for post processing
+                t, veh_spd_array, soc_array, hvac_state_array, range_array, distance_traveled_array = calculation.axes()
+                calculation.close()
+                if offload is not None:
+                    offload.close()
+                if dashboard is not None:
+                    # The dashboard saves the final graphs
+                    dashboard.close(graph_filename())
+                # Releases the subscriber when it waits for room in the buffer
+                samples.close()
                 q_t_axis.put(t)
                 q_veh_spd_axis.put(veh_spd_array)
-                q_soc_axis.put(soc_array)  
+                q_soc_axis.put(soc_array)
                 q_hvac_state_axis.put(hvac_state_array)
                 q_range_axis.put(range_array)
                 q_traveled_distance_axis.put(distance_traveled_array)
+                signals_consumed.set()
                 # Exit this thread
                 break
-        if not q_soc.empty():
-            lcl_soc = q_soc.get(-1)            
-            signal_update = True
-        if not q_odo.empty():
-            lcl_odo = q_odo.get(-1)
-            signal_update = True
-        if not q_power_state.empty():
-            lcl_power_state = q_power_state.get(-1)
-            signal_update = True
-        if not q_range.empty():
-            lcl_range = q_range.get(-1)
-            signal_update = True
-        if not q_hvac_state.empty:
-            lcl_hvac_state = q_hvac_state(-1)
-            signal_update = True
-
-        # If new signals were received from the subrsciber thread
-        # signal_update will be True. Only run calculations when new
-        # data was received
-        if signal_update:
-            signal_update = False
-            # Data collection
-            if len(seconds_list) < 11:
-                head_sec = seconds_list[-1]
-                
-                if head_sec != lcl_unix_clk_sec:
-                    seconds_list.append(lcl_unix_clk_sec)    
-                    # Create an array of time stamps that can be used to plot results over time
-                    if('t_previous' in locals()):
-                        time_stamp += lcl_unix_clk_sec - t_previous
-                        t.append(time_stamp)
-                    else:
-                        t.append(0)
-                    t_previous = lcl_unix_clk_sec
-                    veh_spd_array.append(lcl_vehicle_speed)
-                    soc_array.append(lcl_soc)
-                    hvac_state_array.append(lcl_hvac_state)
-                    range_array.append((round(lcl_range/1000,3)))
-                    if (not 'previous_odo' in locals()):
-                        previous_odo = lcl_odo
-                        traveled_distance = 0
-                    else:
-                        if previous_odo > 0:
-                            traveled_distance += lcl_odo - previous_odo
-                        else:
-                            traveled_distance = 0
-                        previous_odo = lcl_odo
-                    distance_traveled_array.append(traveled_distance)
-                    
-
-                    # Speed summed up for average speed calculation
-                    sum_spd = sum_spd + lcl_vehicle_speed
-                    times_spd += 1                                        
-            else:
-                # Data collection done
-
-                # Calculate time between last and first sample in this period
-                actual_time = seconds_list[-1] - seconds_list[1]
-                hours = actual_time/3600.00
-
-                # State of charge change
-                if 'lcl_soc' in locals():
-                    if not 'start_soc' in locals():
-                        start_soc = lcl_soc                        
-                    if ('last_soc' in locals()) and ('start_soc' in locals()):
-                        delta_soc = last_soc - lcl_soc
-                        # Calculate the change of state of charge from start to end of log/simulation
-                        if start_soc > 0:
-                            delta_soc_since_start = start_soc - delta_soc
-                        else:
-                            delta_soc_since_start = 0
-                    last_soc = lcl_soc    
-
-                # Calculate average speed over sample period
-                if times_spd>0:
-                    avg_spd = sum_spd / times_spd
-
-                # Calculate distance traveled, since start of simulation, based on average speed
-                traveled_dist_calc = hours * avg_spd
-                if 'traveled_dist_calc_total' in locals():
-                    traveled_dist_calc_total += traveled_dist_calc
-                else:
-                    traveled_dist_calc_total = traveled_dist_calc
-                # Calculate distance traveled since start of simulation, based on odometer signal
-                if 'last_odo' in locals():
-                    if last_odo > 0:
-                        traveled_dist_odo = lcl_odo - last_odo
-                        last_odo = lcl_odo
-                    else:      
-                        traveled_dist_odo = 0               
-                        last_odo = lcl_odo
-                else:
-                    traveled_dist_odo = 0               
-                    last_odo = lcl_odo
-                traveled_dist_odo_total += traveled_dist_odo
-
-                # Calculate difference in estimated range during this period
-                if 'prev_range' in locals():
-                    delta_range = prev_range - lcl_range
-                    prev_range = lcl_range
-                else:
-                    delta_range = 0
-                    prev_range = lcl_range
-
-                # Compare to distance traveled
-                if delta_range > traveled_dist_odo:
-                    message = (f"Simulator Time: {time_stamp} : Range drop higher than prediction. Current range: {round(lcl_range/1000,3)} km")
-                    logger.info(message)
-                    print(message)
-                else:
-                    if traveled_dist_odo > delta_range:
-                        message = (f"Simulator Time: {time_stamp} seconds - Range drop lower than prediction. Current range: {round(lcl_range/1000,3)} km")
-                        logger.info(message)
-                        print(message)
-                    else:
-                        message = (f"Simulator Time: {time_stamp} seconds - Range drop matched prediction. Current range: {round(lcl_range/1000,3)} km")
-                        logger.info(message)
-                        print(message)
-
 
-                # Calculate number of drive cycles during simulation
-                if (not 'drive_cycle_count' in locals()):
-                    drive_cycle_count = 0
-                if (lcl_power_state == "VEHICLE_POWER_STATE_DRIVE"):
-                    last_power_state = lcl_power_state
-                if (lcl_power_state != "VEHICLE_POWER_STATE_DRIVE") & (last_power_state == "VEHICLE_POWER_STATE_DRIVE"):
-                    last_power_state = lcl_power_state                    
-                    drive_cycle_count += 1
+        signals_consumed.set()
 
-                seconds_length = len(seconds_list)-1
 
-                message = (f"Average speed {round(avg_spd,5)} (km/h), \
-calculated distance traveled {round(traveled_dist_calc_total,3)} (km), \
-distance traveled odometer {round(traveled_dist_odo_total,3)} (km), State of charge \
-change in sample: {delta_soc} (%), Current state of charge {lcl_soc}")
-
-                logger.info(message)
-                print(message)
-
-
-                sum_spd = 0
-                avg_spd = 0
-                last_speed = 0
-                times_spd = 0
-                seconds_list.clear()
-                seconds_list.append(0)
-
-        # Reset thread event
-        tcp_signal_update.clear()
+def plot_graphs(time_axis, veh_spd_axis, soc_axis, range_axis, distance_traveled_axis):
+    """ Save the graphs of the logged data as graph_<time>.jpg and show them
+        when configured. matplotlib is only imported here, it is not
+        installed in the Alpine image and importing it takes long. Without
+        show the non-interactive Agg backend is used, no display is needed
+    """
+    try:
+        import matplotlib
+        if not PLOT_SHOW:
+            matplotlib.use("Agg")
+        import matplotlib.pyplot as plt
+    except ImportError:
+        return
+    figure, subplot = plt.subplots(2, 2)
+    subplot[1 ,0].plot(time_axis, veh_spd_axis)
+    subplot[1, 0].set_title("Vehicle speed")
+    subplot[0, 0].plot(time_axis, soc_axis)
+    subplot[0, 0].set_title("State of charge")
+    subplot[0, 1].plot(time_axis, range_axis, 'b-', label="Range")
+    subplot[0, 1].set_title("Range vs Distance traveled")
+    subplot2 = subplot[0, 1].twinx()
+    subplot2.invert_yaxis()
+    subplot2.plot(time_axis, distance_traveled_axis, 'r-', label="Distance traveled")
+    subplot[1, 1].plot(time_axis, distance_traveled_axis)
+    subplot[1, 1].set_title("Distance traveled")
+    # Saved before showing, show() blocks until the window is closed
+    figure.savefig(graph_filename(), format='jpeg', dpi=100)
+    if PLOT_SHOW:
+        plt.show()
+    plt.close(figure)
 
 
-def main():
+def main(config_file='cfg.ini', argv=None):
     """_summary_
     Main function setting up and starting subscriber and application thread
+
+    Args:
+        config_file : Configuration file
+        argv : Command line arguments, by default sys.argv
     """
+    configure(config_file, argv)
     logger.info('-------------- (Re-)started APP --------------')
-    subscriber_thread = Thread(target=get_signals, args=(TCP_HOST, TCP_PORT, subscription_list))
-    calculation_thread = Thread(target=app_calculations)
+    if METRICS_PORT:
+        MetricsServer(metrics.registry, METRICS_PORT, METRICS_ADDRESS).start()
+    if METRICS_SUMMARY_INTERVAL > 0:
+        SummaryLogger(metrics, logger.info, METRICS_SUMMARY_INTERVAL).start()
+    if FLEET_ENDPOINTS:
+        # Fleet mode, all vehicles are handled in one event loop and the
+        # logged signals are written to one file per vehicle
+        from moco_fleet import run_fleet
+        run_fleet(FLEET_ENDPOINTS, context, subscription_list, create_signal_store, report,
+                  record=bool(RECORDER_FILE), create_window=create_window,
+                  time_weighted=WINDOW_TIME_WEIGHTED)
+        return
+
+    if REPLAY_FILE:
+        # The replay ends with the application thread, also when the
+        # application stops before the end of the capture
+        subscriber_thread = Thread(target=replay_signals, args=(REPLAY_FILE, REPLAY_SPEED), daemon=True)
+    else:
+        if SUBSCRIBER_MODE == 'asyncio':
+            subscriber = get_signals_async
+        else:
+            subscriber = get_signals
+        subscriber_thread = Thread(target=subscriber, args=(TCP_HOST, TCP_PORT, subscription_list))
+    calculation_thread = Thread(target=app_calculations, args=(create_sample_buffer(),))
     subscriber_thread.start()
     calculation_thread.start()
     
@@ -576,24 +984,9 @@ def main():
     distance_traveled_axis = q_traveled_distance_axis.get()
 
     # Create graph using the data received from the vehicle
-    if not ALPINE_BUILD:
-        figure, subplot = plt.subplots(2, 2)    
-        subplot[1 ,0].plot(time_axis, veh_spd_axis)
-        subplot[1, 0].set_title("Vehicle speed")
-        subplot[0, 0].plot(time_axis, soc_axis)
-        subplot[0, 0].set_title("State of charge")
-        subplot[0, 1].plot(time_axis, range_axis, 'b-', label="Range")
-        subplot[0, 1].set_title("Range vs Distance traveled")
-        subplot2 = subplot[0, 1].twinx()
-        subplot2.invert_yaxis()
-        subplot2.plot(time_axis, distance_traveled_axis, 'r-', label="Distance traveled")
-        subplot[1, 1].plot(time_axis, distance_traveled_axis)
-        subplot[1, 1].set_title("Distance traveled")
-        plt.show()
-        file_name_time = str(time.time())
-        filename = "graph_"+file_name_time+".jpg"
-        figure.savefig(filename, format='jpeg', dpi=100)
-    
+    if PLOT_GRAPHS and not PLOT_LIVE:
+        plot_graphs(time_axis, veh_spd_axis, soc_axis, range_axis, distance_traveled_axis)
+
     # Write logged signals to CSV file
     with open('logged_signals.csv', 'w') as output_file:        
         csv_writer = csv.writer(output_file)
@@ -0,0 +1,9 @@
+"""conftest summary
+The modules of the sample application are imported from src, as when the
+application is started from that directory.
+"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
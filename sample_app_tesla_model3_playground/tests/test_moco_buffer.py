@@ -0,0 +1,139 @@
+"""test_moco_buffer summary
+Overflow policies of the bounded buffer between the subscriber and the
+application thread (moco_buffer.py).
+"""
+
+import os
+import threading
+import time
+
+import pytest
+
+from moco_buffer import BLOCK, DROP_OLDEST, KEEP_LATEST, SPILL, SignalBuffer
+from moco_metrics import SubscriberMetrics
+
+
+def fill(buffer, count):
+    for item in range(count):
+        buffer.put(item)
+
+
+def test_unknown_policy():
+    with pytest.raises(ValueError):
+        SignalBuffer("drop_newest")
+
+
+def test_keep_latest():
+    metrics = SubscriberMetrics()
+    buffer = SignalBuffer(KEEP_LATEST, capacity=100, metrics=metrics)
+    assert buffer.capacity == 1
+    fill(buffer, 10)
+    assert len(buffer) == 1
+    assert metrics.samples_dropped.value == 9
+    assert buffer.take() == [9]
+    assert buffer.take() == []
+
+
+def test_drop_oldest():
+    metrics = SubscriberMetrics()
+    buffer = SignalBuffer(DROP_OLDEST, capacity=5, metrics=metrics)
+    fill(buffer, 12)
+    assert len(buffer) == 5
+    assert metrics.samples_dropped.value == 7
+    assert buffer.take() == [7, 8, 9, 10, 11]
+
+
+def test_no_drop_below_capacity():
+    metrics = SubscriberMetrics()
+    buffer = SignalBuffer(DROP_OLDEST, capacity=5, metrics=metrics)
+    fill(buffer, 5)
+    assert buffer.take(limit=2) == [0, 1]
+    buffer.put(5)
+    buffer.put(6)
+    assert metrics.samples_dropped.value == 0
+    assert buffer.take() == [2, 3, 4, 5, 6]
+
+
+def put_in_thread(buffer, item):
+    thread = threading.Thread(target=buffer.put, args=(item,), daemon=True)
+    thread.start()
+    return thread
+
+
+def test_block_waits_for_take():
+    metrics = SubscriberMetrics()
+    buffer = SignalBuffer(BLOCK, capacity=2, metrics=metrics)
+    fill(buffer, 2)
+    thread = put_in_thread(buffer, 2)
+    thread.join(0.2)
+    # The subscriber waits, nothing is dropped
+    assert thread.is_alive()
+    assert len(buffer) == 2
+    assert buffer.take(limit=1) == [0]
+    thread.join(2)
+    assert not thread.is_alive()
+    assert buffer.take() == [1, 2]
+    assert metrics.samples_dropped.value == 0
+    assert metrics.subscriber_blocked.value >= 0.15
+
+
+def test_block_released_by_close():
+    buffer = SignalBuffer(BLOCK, capacity=1)
+    buffer.put(0)
+    thread = put_in_thread(buffer, 1)
+    thread.join(0.1)
+    assert thread.is_alive()
+    buffer.close()
+    thread.join(2)
+    assert not thread.is_alive()
+    # Items put after closing don't block, the oldest item is dropped
+    start = time.perf_counter()
+    buffer.put(2)
+    assert time.perf_counter() - start < 1
+    assert buffer.take(limit=10) == [1, 2]
+
+
+@pytest.mark.parametrize("spill_chunk", [1, 4, 256])
+def test_spill_keeps_order(tmp_path, spill_chunk):
+    metrics = SubscriberMetrics()
+    buffer = SignalBuffer(SPILL, capacity=10, spill_directory=str(tmp_path), spill_chunk=spill_chunk,
+                          metrics=metrics)
+    items = [(index, float(index), "VEHICLE_POWER_STATE_DRIVE") for index in range(1000)]
+    for item in items:
+        buffer.put(item)
+    assert len(buffer) == 1000
+    assert metrics.samples_spilled.value == 990
+    assert metrics.samples_dropped.value == 0
+    if spill_chunk < 990:
+        assert buffer.spill_bytes > 0
+    taken = []
+    while len(taken) < 500:
+        taken.extend(buffer.take(limit=7))
+    # Items put while spilled items are waiting follow the spilled items
+    more = [(index, float(index), "") for index in range(1000, 1100)]
+    for item in more:
+        buffer.put(item)
+    while True:
+        chunk = buffer.take()
+        if not chunk:
+            break
+        taken.extend(chunk)
+    assert taken == items + more
+    assert len(buffer) == 0
+
+
+def test_spill_file_reused_and_removed(tmp_path):
+    buffer = SignalBuffer(SPILL, capacity=2, spill_directory=str(tmp_path), spill_chunk=2)
+    fill(buffer, 20)
+    spill_file = buffer._file
+    assert spill_file is not None
+    # The temporary file has no name in the directory
+    assert os.listdir(tmp_path) == []
+    assert buffer.take(limit=100) == list(range(20))
+    # All spilled items read, the file is truncated for reuse
+    assert buffer.spill_bytes == 0
+    fill(buffer, 10)
+    buffer.close()
+    assert spill_file.closed
+    assert buffer.spill_bytes == 0
+    assert os.listdir(tmp_path) == []
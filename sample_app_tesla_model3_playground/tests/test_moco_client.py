@@ -0,0 +1,112 @@
+"""test_moco_client summary
+Reconnects of the asyncio client (moco_client.py) against a local engine
+without TLS: connections lost before or shortly after the first signal are
+failed attempts with back-off, only a connection that streamed signals for
+min_streaming seconds is reconnected at once.
+"""
+
+import asyncio
+import json
+
+from moco_client import STATE_BACKOFF, STATE_STOPPED, STATE_STREAMING, MocoEngineClient
+from moco_signals import SignalDispatcher
+
+
+SUBSCRIPTION = {"CMD": "vss", "D": "Vehicle.Speed"}
+CATALOGUE = json.dumps({"REP": "VSS_catalogue", "D": ["Vehicle.Speed"]}).encode() + b"\n"
+SIGNAL = json.dumps({"N": "Vehicle.Speed", "V": 50.0}).encode() + b"\n"
+
+
+def run_client(serve, seconds=None, connections_accepted=None, **options):
+    """Run a client against a local engine calling serve(reader, writer) for
+    every connection, the engine stops listening after connections_accepted
+    connections (None to keep listening). Returns the client, its states and
+    the connections
+    """
+    connections = []
+    states = []
+
+    async def handle(reader, writer):
+        connections.append(writer)
+        await reader.read(4096)
+        if connections_accepted is not None and len(connections) >= connections_accepted:
+            server.close()
+        await serve(reader, writer)
+        writer.close()
+
+    server = None
+
+    async def main():
+        nonlocal server
+        server = await asyncio.start_server(handle, "127.0.0.1", 0)
+        port = server.sockets[0].getsockname()[1]
+        client = MocoEngineClient("127.0.0.1", port, None, SUBSCRIPTION, SignalDispatcher(["Vehicle.Speed"]),
+                                  reconnect_delay=0.01, reconnect_max_delay=0.02, **options)
+        client.on_state = states.append
+        try:
+            await asyncio.wait_for(client.run(), seconds)
+        except asyncio.TimeoutError:
+            pass
+        server.close()
+        await server.wait_closed()
+        return client
+
+    return asyncio.run(main()), states, connections
+
+
+def test_catalogue_only_is_failed_attempt():
+    async def serve(reader, writer):
+        writer.write(CATALOGUE)
+        await writer.drain()
+
+    client, states, connections = run_client(serve, seconds=10, max_reconnects=3)
+    # Stopped after the maximum number of failed attempts, with back-off
+    assert len(connections) == 4
+    assert STATE_STREAMING not in states
+    assert states.count(STATE_BACKOFF) == 3
+    assert client.reconnect_count == 3
+
+
+def test_short_stream_is_failed_attempt():
+    async def serve(reader, writer):
+        writer.write(CATALOGUE + SIGNAL)
+        await writer.drain()
+
+    client, states, connections = run_client(serve, seconds=10, max_reconnects=3, min_streaming=5.0)
+    assert len(connections) == 4
+    assert states.count(STATE_STREAMING) == 4
+    assert states.count(STATE_BACKOFF) == 3
+
+
+def test_stable_stream_reconnects_at_once():
+    async def serve(reader, writer):
+        writer.write(CATALOGUE)
+        for _ in range(5):
+            writer.write(SIGNAL)
+            await writer.drain()
+            await asyncio.sleep(0.02)
+
+    client, states, connections = run_client(serve, seconds=1.0, max_reconnects=1, min_streaming=0.05)
+    # Never stopped, the connections streamed long enough to not count as
+    # failed attempts
+    assert len(connections) >= 3
+    assert client.reconnect_count >= 2
+    assert STATE_BACKOFF not in states
+
+
+def test_engine_down_after_stable_stream():
+    async def serve(reader, writer):
+        writer.write(CATALOGUE)
+        for _ in range(5):
+            writer.write(SIGNAL)
+            await writer.drain()
+            await asyncio.sleep(0.02)
+
+    client, states, connections = run_client(serve, seconds=10, connections_accepted=1, max_reconnects=3,
+                                             min_streaming=0.05)
+    # The stable connection is reconnected at once, the refused connections
+    # are failed attempts with back-off until the client stops
+    assert len(connections) == 1
+    assert states.count(STATE_BACKOFF) == 3
+    assert client.reconnect_count == 4
+    assert states[-1] == STATE_STOPPED
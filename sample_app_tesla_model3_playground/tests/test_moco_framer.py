@@ -0,0 +1,115 @@
+"""test_moco_framer summary
+Frames split by FrameBuffer must be the same however the stream of Moco
+engine is divided into reads.
+"""
+
+import json
+
+import pytest
+
+from moco_framer import FrameBuffer
+
+
+MESSAGES = [
+    {"REP": "VSS_catalogue", "D": ["Vehicle.Speed", ["Vehicle.Powertrain.Range"]]},
+    {"N": "Vehicle.Speed", "V": 50.5},
+    {"N": "Vehicle.Private.UnixTime.Seconds", "V": 1700000000},
+    {"N": "Vehicle.Cabin.HVAC.IsAirConditioningActive", "V": "false"},
+    {"REP": "sync"},
+]
+FRAMES = [json.dumps(message).encode("utf-8") for message in MESSAGES]
+STREAM = b"\n".join(FRAMES) + b"\n"
+
+
+def receive(reads, capacity=16, into=False):
+    """Feed the reads into a FrameBuffer, return all frames taken out after
+    every read and the buffer
+    """
+    frame_buffer = FrameBuffer(capacity)
+    frames = []
+    for data in reads:
+        if into:
+            frame_buffer.writable(len(data))[:len(data)] = data
+            frame_buffer.commit(len(data))
+        else:
+            frame_buffer.feed(data)
+        frames.extend(frame_buffer.frames())
+    return frames, frame_buffer
+
+
+@pytest.mark.parametrize("into", [False, True], ids=["feed", "recv_into"])
+def test_split_at_every_offset(into):
+    for offset in range(len(STREAM) + 1):
+        frames, frame_buffer = receive([STREAM[:offset], STREAM[offset:]], into=into)
+        assert frames == FRAMES, f"split at {offset}"
+        assert len(frame_buffer) == 0
+
+
+@pytest.mark.parametrize("into", [False, True], ids=["feed", "recv_into"])
+def test_split_at_every_pair_of_offsets(into):
+    for first in range(0, len(STREAM) + 1, 3):
+        for second in range(first, len(STREAM) + 1, 5):
+            reads = [STREAM[:first], STREAM[first:second], STREAM[second:]]
+            frames, _ = receive(reads, into=into)
+            assert frames == FRAMES, f"split at {first} and {second}"
+
+
+def test_single_byte_reads():
+    frames, _ = receive([STREAM[i:i + 1] for i in range(len(STREAM))])
+    assert frames == FRAMES
+
+
+def test_partial_trailing_frame_kept():
+    partial = b'{"N": "Vehicle.Speed", "V": 6'
+    frame_buffer = FrameBuffer()
+    frame_buffer.feed(STREAM + partial)
+    assert frame_buffer.frames() == FRAMES
+    assert len(frame_buffer) == len(partial)
+    # No newline, the partial frame stays pending
+    assert frame_buffer.frames() == []
+    frame_buffer.feed(b'1.5}\n')
+    assert frame_buffer.frames() == [partial + b"1.5}"]
+    assert len(frame_buffer) == 0
+
+
+def test_empty_lines_skipped():
+    stream = b"\n\n" + b"\n\n".join(FRAMES) + b"\n\n\n"
+    for offset in range(len(stream) + 1):
+        frames, _ = receive([stream[:offset], stream[offset:]])
+        assert frames == FRAMES, f"split at {offset}"
+
+
+def test_only_newlines():
+    frame_buffer = FrameBuffer()
+    frame_buffer.feed(b"\n\n\n")
+    assert frame_buffer.frames() == []
+    assert len(frame_buffer) == 0
+
+
+def test_buffer_grows_for_large_frame():
+    large = json.dumps({"REP": "VSS_catalogue", "D": [f"Vehicle.Signal{i}" for i in range(500)]}).encode("utf-8")
+    stream = FRAMES[1] + b"\n" + large + b"\n" + FRAMES[2] + b"\n"
+    for into in (False, True):
+        frames, frame_buffer = receive([stream[i:i + 100] for i in range(0, len(stream), 100)],
+                                       capacity=8, into=into)
+        assert frames == [FRAMES[1], large, FRAMES[2]]
+        assert frame_buffer.capacity >= len(large)
+
+
+def test_pending_bytes_moved_without_growing():
+    frame_buffer = FrameBuffer(64)
+    frame_buffer.feed(b"a" * 40 + b"\n" + b"b" * 10)
+    assert frame_buffer.frames() == [b"a" * 40]
+    # 10 pending bytes plus 30 new bytes fit when moved to the start
+    frame_buffer.feed(b"c" * 29 + b"\n")
+    assert frame_buffer.frames() == [b"b" * 10 + b"c" * 29]
+    assert frame_buffer.capacity == 64
+
+
+def test_clear_discards_pending():
+    frame_buffer = FrameBuffer()
+    frame_buffer.feed(b'{"N": "Vehicle.Sp')
+    frame_buffer.clear()
+    assert len(frame_buffer) == 0
+    frame_buffer.feed(FRAMES[1] + b"\n")
+    assert frame_buffer.frames() == [FRAMES[1]]
@@ -0,0 +1,170 @@
+"""test_range_batch summary
+The batch calculation (range_batch.py) must give the same window results as
+the streaming calculation (RangeCalculation), for generated updates and for
+a capture replayed as by the sample application.
+"""
+
+import json
+import random
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from moco_decoder import FrameDecoder
+from moco_framer import FrameBuffer
+from moco_replay import ReplayClock, StreamCapture, StreamReplay
+from moco_resampler import HOLD, LINEAR, Resampler
+from moco_signals import SignalFilter
+from range_batch import analyze_capture, analyze_updates, window_results
+from range_calculation import (HVAC_STATE, ODO, POWER_STATE, POWER_STATE_DRIVE, RANGE, SOC, UNIX_CLK_SEC,
+                               VEHICLE_SPEED, RangeCalculation, create_signal_store, register_samples)
+
+
+SUBSCRIPTION = {"CMD": "vss", "D": ",".join([POWER_STATE, SOC, RANGE, UNIX_CLK_SEC, VEHICLE_SPEED, ODO,
+                                             HVAC_STATE])}
+# Filters as in the sample application
+SIGNAL_FILTERS = {name: (0, 10) for name in (POWER_STATE, SOC, RANGE, VEHICLE_SPEED, ODO, HVAC_STATE)}
+PARKED = "VEHICLE_POWER_STATE_PARKED"
+
+
+def generate_updates(seed, updates):
+    """Arrays with the signal values of each update of a random trip, with
+    repeated time signals, updates before the first time signal, odometer
+    values of 0 and changes of the power state
+    """
+    rnd = random.Random(seed)
+    clock = 0.0
+    odo = rnd.choice([0.0, 1000.0])
+    soc = 80.0
+    remaining = 300000.0
+    trip = {"unix_time": [], "speed": [], "soc": [], "range": [], "odo": [], "drive": []}
+    start = rnd.randint(0, 5)
+    for update in range(updates):
+        if update > start and rnd.random() < 0.6:
+            clock += rnd.choice([0.1, 0.7, 1.0, 1.3])
+        odo += rnd.random() * 0.02
+        soc -= rnd.random() * 0.01
+        remaining -= rnd.random() * 20
+        trip["unix_time"].append(clock)
+        trip["speed"].append(rnd.uniform(0, 120))
+        trip["soc"].append(soc)
+        trip["range"].append(remaining)
+        trip["odo"].append(odo)
+        trip["drive"].append(rnd.random() < 0.7)
+    return trip
+
+
+def stream_updates(trip):
+    calculation = RangeCalculation(report=lambda message: None)
+    results = []
+    for unix_time, speed, soc, remaining, odo, drive in zip(
+            *(trip[column] for column in ("unix_time", "speed", "soc", "range", "odo", "drive"))):
+        result = calculation.update({
+            UNIX_CLK_SEC: unix_time, VEHICLE_SPEED: speed, SOC: soc, RANGE: remaining, ODO: odo,
+            HVAC_STATE: "false", POWER_STATE: POWER_STATE_DRIVE if drive else PARKED})
+        if result is not None:
+            results.append(result)
+    return results
+
+
+def test_generated_updates():
+    for seed in range(200):
+        trip = generate_updates(seed, random.Random(seed).randint(0, 500))
+        assert window_results(analyze_updates(**trip)) == stream_updates(trip), f"trip {seed}"
+
+
+def write_capture(filename, seed, duration=120.0):
+    """Capture of a drive sent as by Moco engine: the changed signals of an
+    update followed by the time signal, with jitter of the update times,
+    repeated values, time signals without other signals, parked periods and
+    sync replies, split into receives at random positions
+    """
+    rnd = random.Random(seed)
+    clock = ReplayClock(1700000000.0)
+    engine_time = 1700000000.0
+    distance = 0.0
+    pending = b""
+    with StreamCapture(filename, clock) as capture:
+        capture.write(json.dumps({"REP": "VSS_catalogue", "D": SUBSCRIPTION["D"].split(",")}).encode() + b"\n")
+        while engine_time < 1700000000.0 + duration:
+            seconds = engine_time - 1700000000.0
+            parked = 40 <= seconds < 55
+            speed = 0.0 if parked else round(50 + 30 * rnd.random(), 1)
+            distance += speed * 0.1 / 3600
+            update = {
+                POWER_STATE: PARKED if parked else POWER_STATE_DRIVE,
+                SOC: round(80 - distance * 0.15, 1),
+                RANGE: round(300000 - distance * 1100, 0),
+                VEHICLE_SPEED: speed,
+                ODO: round(1000 + distance, 2),
+                HVAC_STATE: rnd.choice(["false", "true"]) if seconds > 100 else "false",
+            }
+            messages = [{"N": name, "V": value} for name, value in update.items() if rnd.random() < 0.8]
+            messages.append({"N": UNIX_CLK_SEC, "V": round(engine_time, 3)})
+            if rnd.random() < 0.05:
+                messages.append({"REP": "sync"})
+            pending += b"".join(json.dumps(message).encode() + b"\n" for message in messages)
+            if rnd.random() < 0.5:
+                split = rnd.randint(0, len(pending))
+                clock.now = engine_time + 0.05
+                capture.write(pending[:split])
+                pending = pending[split:]
+            if rnd.random() < 0.01:
+                capture.write(pending)
+                pending = b""
+                capture.mark_reconnect()
+            engine_time += 0.1 + rnd.uniform(-0.03, 0.03)
+        capture.write(pending)
+
+
+def stream_capture(filename, signal_filters, resampler):
+    """Window results of the streaming calculation for a capture, with the
+    samples taken as by replay_signals() and app_calculations() of the
+    sample application
+    """
+    dispatcher, store = create_signal_store(SUBSCRIPTION)
+    clock = ReplayClock()
+    for signal_name, (deadband, heartbeat) in (signal_filters or {}).items():
+        dispatcher.set_filter(signal_name, SignalFilter(deadband, heartbeat, clock.time))
+    rows = []
+    register_samples(dispatcher, store, rows.append,
+                     resampler(store.signals(), store.values()) if resampler is not None else None)
+    decoder = FrameDecoder()
+    frame_buffer = FrameBuffer()
+    calculation = RangeCalculation(report=lambda message: None)
+    sample = store.snapshot()
+    results = []
+    for receive_time, data in StreamReplay(filename).records():
+        if not data:
+            frame_buffer.clear()
+            continue
+        clock.now = receive_time
+        frame_buffer.feed(data)
+        for frame in frame_buffer.frames():
+            name, value = decoder.decode(frame)
+            if name is not None:
+                dispatcher.dispatch(name, value)
+        for row in rows:
+            sample.values[:] = row
+            result = calculation.update(sample)
+            if result is not None:
+                results.append(result)
+        del rows[:]
+    return results
+
+
+@pytest.mark.parametrize("signal_filters", [None, SIGNAL_FILTERS], ids=["unfiltered", "filtered"])
+@pytest.mark.parametrize("interpolation", [None, HOLD, LINEAR])
+def test_capture(tmp_path, signal_filters, interpolation):
+    resampler = None
+    if interpolation is not None:
+        def resampler(signals, defaults):
+            return Resampler(signals, UNIX_CLK_SEC, 0.1, interpolation, defaults=defaults)
+    for seed in range(3):
+        filename = str(tmp_path / f"trip{seed}.cap")
+        write_capture(filename, seed)
+        streaming = stream_capture(filename, signal_filters, resampler)
+        batch = window_results(analyze_capture(filename, SUBSCRIPTION, signal_filters, resampler))
+        assert len(streaming) > 50
+        assert batch == streaming, f"capture {seed}"